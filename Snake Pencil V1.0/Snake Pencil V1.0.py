@@ -16,7 +16,7 @@
 import math 
 from kivy.app import App
 from kivy.uix.widget import Widget
-from kivy.graphics import Color, Line
+from kivy.graphics import Color, InstructionGroup, Line
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
@@ -45,6 +45,44 @@ COLOR_OPTIONS = {
     9: (1, 0, 1)       # Magenta
 }
 
+class ChunkedStroke:
+    # Draws a growing path as frozen Line chunks plus one small active tail,
+    # so each new point only re-uploads the tail instead of the whole path
+    def __init__(self, color, width=2, chunk_points=256):
+        self.width = width
+        self.chunk_size = chunk_points * 2  # Floats per chunk (flat x, y pairs)
+        # Everything lives in one group so new chunks keep the stroke's color
+        self.group = InstructionGroup()
+        self.color = Color(*color)
+        self.group.add(self.color)
+        self.chunks = []  # Frozen Line instructions, oldest first
+        self.tail_points = []
+        self.tail = self._new_line()
+
+    def _new_line(self):
+        line = Line(points=[], width=self.width)
+        self.group.add(line)
+        return line
+
+    def extend(self, points):
+        points = self.tail_points + list(points)
+        start = 0
+        while len(points) - start >= self.chunk_size + 2:
+            # Freeze the next chunk; the one after starts at its last point
+            self.tail.points = points[start:start + self.chunk_size]
+            self.chunks.append(self.tail)
+            start += self.chunk_size - 2
+            self.tail = self._new_line()
+        self.tail_points = points[start:]
+        self.tail.points = self.tail_points
+
+    def set_points(self, points):
+        for line in self.chunks:
+            self.group.remove(line)
+        self.chunks = []
+        self.tail_points = []
+        self.extend(points)
+
 class DrawingPad(Widget):
     fast_mode = BooleanProperty(False)
     paused = BooleanProperty(False)
@@ -77,9 +115,10 @@ class DrawingPad(Widget):
             '9': self.generate_octagon()
         }
 
-        with self.canvas:
-            self.color_instruction = Color(*self.current_color)
-            self.line = Line(points=self.snake_path, width=2)
+        self.line = ChunkedStroke(self.current_color)
+        self.line.extend(self.snake_pos)
+        self.color_instruction = self.line.color
+        self.canvas.add(self.line.group)
 
         # Schedule the update method at 60 FPS
         Clock.schedule_interval(self.update, 1 / 60)
@@ -289,7 +328,7 @@ class DrawingPad(Widget):
         self.snake_path.append(tuple(self.snake_pos))
 
         # Update the Line's points
-        self.line.points += [new_x, new_y]
+        self.line.extend([new_x, new_y])
 
     def change_color(self, color_index):
         if color_index in COLOR_OPTIONS:
@@ -359,7 +398,7 @@ class DrawingPad(Widget):
             new_points += [new_x, new_y]
 
         # Append the new points to the snake path
-        self.line.points += new_points
+        self.line.extend(new_points)
 
         Logger.info(f"Added template from key '{key_char}' to the drawing.")
 
@@ -370,7 +409,7 @@ class DrawingPad(Widget):
         self.snake_pos = [Window.width // 2, Window.height // 2]
         self.snake_path.append(tuple(self.snake_pos))
         # Reset the Line's points
-        self.line.points = list(self.snake_pos)
+        self.line.set_points(self.snake_pos)
         Logger.info("Drawing area cleared.")
 
 class MainMenu(Screen):
@@ -9,15 +9,26 @@
 # Shift: Hold to move the snake faster.
 # C: Open the color menu to change the snake’s drawing color.
 # P: Save the current drawing as an image file.
+# V: Export the current drawing as an SVG vector file.
 # M: Return to the main menu from the pause menu.
-# 1-9: Add predefined template drawings.
+# 1-9: Add predefined template drawings (rebind or add keys in templates/keys.json).
 # X: Clear the current drawing.
+# Z: Undo the last stroke, template or color change.
+# Y: Redo the last undone step.
+# R: Start or stop recording the session (replay it with snake_replay.py).
+# F: Show or hide the frame-time overlay (turns instrumentation on or off).
+# K: Dump the frame-time histograms to JSON and CSV files.
+# L: Run cProfile over the next 300 frames.
+# N: Start or remove a swarm of automatic snakes (needs numpy).
+# G: Toggle game mode: crossing your own trail ends the run (X starts again).
+# B: Toggle the eraser: drag with the mouse to erase, Z undoes each drag.
+# H: Cycle the symmetry: off, vertical (mirror), horizontal, four-way, radial and kaleidoscope.
+# J: Save the drawing as an editable project file (.snkp).
+# O: Open the newest saved project file.
 # Auto Mode Toggle and Pattern Selection
 
-import math  # For movement patterns
 from kivy.app import App
 from kivy.uix.widget import Widget
-from kivy.graphics import Color, Line
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
@@ -25,16 +36,33 @@ from kivy.uix.spinner import Spinner
 from kivy.clock import Clock
 from kivy.core.window import Window
 from kivy.uix.screenmanager import ScreenManager, Screen
-from kivy.properties import BooleanProperty, ListProperty, StringProperty
+from kivy.graphics import Color, Ellipse, Line
+from kivy.properties import BooleanProperty, ListProperty, NumericProperty, StringProperty
 from kivy.logger import Logger
-from collections import deque
 from kivy.uix.popup import Popup
+import glob
+import math
+import os
 import time
-import random  # For random movement
+from snake_engine import PATH_MAXLEN, SNAKE_SIZE, EngineListener, SnakeEngine  # Headless drawing logic
+from snake_export import export_drawing, save_png_async  # Background PNG encoding and vector export
+from snake_render import (ChunkedStroke, MeshStroke, StrokeBacking, StrokeSet, SwarmMesh,  # Chunked strokes batched by color
+                          SymmetricDrawing)
+from snake_catalog import TemplateCatalog  # User templates imported from SVG/JSON
+from snake_replay import SessionRecorder  # Compact input logs for deterministic replay
+from snake_project import load_project, save_project  # Editable drawings in compressed project files
+from snake_profile import FrameProfiler  # Optional frame-time instrumentation
+from snake_swarm import Swarm  # Many automatic snakes moved in vectorized steps
+from snake_symmetry import DEFAULT_FOLDS, DEFAULT_SYMMETRY, SYMMETRY_MODES  # Rotated and mirrored copies
 
 # Setting window size (optional: make responsive)
 Window.size = (1000, 800)  # Increased size for better layout
 
+# User templates (.svg/.json) live next to this script; only their index is read at startup
+TEMPLATE_CATALOG = TemplateCatalog(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'))
+
+PROFILE_FRAMES = 300  # Frames covered by a cProfile run (L key)
+
 # Color options (RGB tuples)
 COLOR_OPTIONS = {
     1: (1, 0, 0),      # Red
@@ -48,188 +76,293 @@ COLOR_OPTIONS = {
     9: (1, 0, 1)       # Magenta
 }
 
-class DrawingPad(Widget):
+class DrawingPad(Widget, EngineListener):
+    """View over a SnakeEngine: handles input and draws the engine's paths."""
     fast_mode = BooleanProperty(False)
     paused = BooleanProperty(False)
     automatic_mode = BooleanProperty(False)  # Track automatic mode
     selected_pattern = StringProperty('circle')  # Default movement pattern
+    history_mode = BooleanProperty(True)  # Keep the whole drawing instead of the last PATH_MAXLEN floats
+    tick_rate = NumericProperty(60)  # Simulation ticks per second, independent of the frame rate
+    simplify_tolerance = NumericProperty(0)  # RDP tolerance in pixels for finished strokes, 0 keeps every corner
+    swarm_size = NumericProperty(500)  # Automatic snakes started by the N key
+    stroke_renderer = StringProperty('line')  # 'mesh' draws triangle strips, for drawings of 100k+ segments
+    eraser_mode = BooleanProperty(False)  # Mouse drags erase instead of doing nothing
+    eraser_size = NumericProperty(12)  # Eraser brush radius in pixels
+    symmetry = StringProperty(DEFAULT_SYMMETRY)  # One of SYMMETRY_MODES; the H key cycles them
+    symmetry_folds = NumericProperty(DEFAULT_FOLDS)  # Copies around the center in radial and kaleidoscope modes
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        # Initial position at the center of the window
-        self.snake_pos = [Window.width // 2, Window.height // 2]
-        # Using deque for efficient path management as a flat list
-        self.snake_path = deque([self.snake_pos[0], self.snake_pos[1]], maxlen=5000)
-        self.auto_path = deque(maxlen=5000)  # For automatic patterns
-        self.mirror_path = deque(maxlen=5000)  # For mirrored drawing
-
         # Get the initial color from the App's selected_color property
         app = App.get_running_app()
         self.current_color = app.selected_color if hasattr(app, 'selected_color') else COLOR_OPTIONS[2]  # Default Green
-        self.snake_speed = 5
-        self.fast_speed = 10
-        self.key_pressed = {}
-        self.shift_held = False  # Track the state of the shift key
 
-        # Define templates for keys 1-9
-        self.templates = {
-            '1': self.generate_heart(),
-            '2': self.generate_cube(),
-            '3': self.generate_smiley(),
-            '4': self.generate_star(),
-            '5': self.generate_triangle(),
-            '6': self.generate_square(),
-            '7': self.generate_pentagon(),
-            '8': self.generate_hexagon(),
-            '9': self.generate_octagon()
-        }
+        # The engine owns position, paths, templates and patterns; this widget draws them
+        self.engine = SnakeEngine(Window.width, Window.height, history_mode=self.history_mode,
+                                  tick_rate=self.tick_rate, color=self.current_color)
+        self.engine.automatic_mode = self.automatic_mode
+        self.engine.selected_pattern = self.selected_pattern
+        self.engine.simplify_tolerance = self.simplify_tolerance
+        self.engine.set_symmetry(self.symmetry, self.symmetry_folds)
+        self.engine.templates = TEMPLATE_CATALOG.bindings()  # Keys 1-9 plus any keys.json bindings
+        self.engine.add_listener(self)
+        self.bind(automatic_mode=self._on_automatic_mode,
+                  selected_pattern=self._on_selected_pattern,
+                  fast_mode=self._on_fast_mode,
+                  simplify_tolerance=self._on_simplify_tolerance,
+                  symmetry=self._on_symmetry,
+                  symmetry_folds=self._on_symmetry)
 
+        self.key_pressed = {}
+        self.shift_held = False  # Track the state of the shift key
+        self.recorder = None  # SessionRecorder while the R key is recording
+
+        # The drawing is held once and shown in every symmetry copy through canvas transforms
+        self.drawing = SymmetricDrawing()
+        self.canvas.add(self.drawing.group)
+        self.update_symmetry()
+
+        # In history mode old chunks are baked into a texture under the strokes
+        self.stroke_backing = StrokeBacking(Window.size) if self.history_mode else None
+        if self.stroke_backing:
+            self.drawing.content.add(self.stroke_backing.group)
+
+        # Chunked strokes only re-upload their small active tail each frame;
+        # each color change starts a new stroke in that color's batch
+        colors = self.engine.stroke_colors()
+        self.snake_line = self.new_strokes(colors['snake'])  # Manual drawing
+        self.auto_line = self.new_strokes(colors['auto'])  # Automatic patterns in white
+        self.strokes = {'snake': self.snake_line, 'auto': self.auto_line}
+        for name, strokes in self.strokes.items():
+            self.set_runs(name)
+            self.drawing.content.add(strokes.group)
+
+        # Snake head, drawn between ticks at the interpolated position
         with self.canvas:
-            # Color for manual drawing
-            self.color_instruction = Color(*self.current_color)
-            self.snake_line = Line(points=list(self.snake_path), width=2)
-            # Calculate contrasting color
-            contrasting_color = self.get_contrasting_color(self.current_color)
-            self.mirror_color_instruction = Color(*contrasting_color)
-            self.mirror_line = Line(points=list(self.mirror_path), width=2)
-            # Color for automatic drawing (different color for distinction)
-            self.auto_color_instruction = Color(1, 1, 1)  # White color
-            self.auto_line = Line(points=[], width=2)
-
-        # Schedule the update method at 60 FPS
-        Clock.schedule_interval(self.update, 1 / 60)
+            self.head_color_instruction = Color(*self.current_color)
+            self.head_marker = Ellipse(size=(SNAKE_SIZE, SNAKE_SIZE))
+            # Eraser brush outline, shown while the eraser is on
+            Color(1, 1, 1, 0.6)
+            self.brush_marker = Line(rectangle=(0, 0, 0, 0), width=1)
+        self.update_head()
+        self.erase_from = None  # Brush position the current drag last erased at
+        self.brushing = False  # Set while the brush erases; it clears baked pixels itself
+        self.repaint_box = None  # Baked region waiting for a repaint on the next frame
+
+        # Swarm of automatic snakes, drawn from one shared vertex buffer while the N key has it on
+        self.swarm = None
+        self.swarm_mesh = None
+
+        # Non-blocking status line for background saves
+        self.status_label = Label(text='', size_hint=(None, None),
+                                  size=(Window.width, 30), pos=(0, Window.height - 40))
+        self.add_widget(self.status_label)
+
+        # Frame-time overlay, only filled in while the profiler is on
+        self.profiler = None
+        self.profile_label = Label(text='', size_hint=(None, None), halign='left', valign='top',
+                                   size=(Window.width - 20, 60), pos=(10, Window.height - 110))
+        self.profile_label.bind(size=self.profile_label.setter('text_size'))
+        self.add_widget(self.profile_label)
+
+        # The update loop only runs while the screen is shown and there is something to draw
+        self.running = False  # Set while the drawing pad screen is shown
+        self.ticking = False  # Set while update is scheduled on the Clock
 
         # Bind keyboard events
         Window.bind(on_key_down=self._on_key_down)
         Window.bind(on_key_up=self._on_key_up)
+        # Keep clamping and symmetry in step with the window
+        Window.bind(size=self._on_window_size)
+
+    def new_strokes(self, color):
+        """Create a stroke set matching the path storage mode and the stroke renderer."""
+        stroke = MeshStroke if self.stroke_renderer == 'mesh' else ChunkedStroke
+        if self.history_mode:
+            return StrokeSet(color, stroke=stroke, backing=self.stroke_backing)
+        return StrokeSet(color, stroke=stroke, max_points=PATH_MAXLEN)
+
+    # Update Scheduling
+    def start(self):
+        """Start handling input and ticking; called when the screen is entered."""
+        self.running = True
+        self.wake()
+
+    def stop(self):
+        """Stop ticking and ignore input; called when the screen is left."""
+        self.stop_recording()
+        self.running = False
+        self.key_pressed.clear()
+        self.sleep()
+
+    def wake(self):
+        """Schedule the update loop at 60 FPS if it is not already running."""
+        if self.ticking or not self.running or self.paused:
+            return
+        self.ticking = True
+        self.engine.timestep.reset()
+        Clock.schedule_interval(self.update, 1 / 60)
+
+    def sleep(self):
+        """Unschedule the update loop until the next wake."""
+        if self.ticking:
+            self.ticking = False
+            Clock.unschedule(self.update)
 
-        # Initialize pattern variables for movement patterns
-        self.pattern_angle = 0  # Separate angle for automatic patterns
-        self.pattern_radius = 100  # Radius for circular and spiral movement
-        self.pattern_radius_increment = 0.1  # For spiral
-        self.center_x = self.snake_pos[0]
-        self.center_y = self.snake_pos[1]
-
-    # Template Generation Methods (unchanged)
-    def generate_heart(self):
-        """Generate a simple heart shape as a list of relative (dx, dy) tuples."""
-        return [
-            (0, 0), (10, 20), (20, 0), (30, 20), (40, 0), (50, 20), (60, 0),
-            (50, -20), (40, 0), (30, -20), (20, 0), (10, -20), (0, 0)
-        ]
-
-    def generate_cube(self):
-        """Generate a simple cube shape as a list of relative (dx, dy) tuples."""
-        return [
-            (0, 0), (0, 50), (50, 50), (50, 0), (0, 0),
-            (25, 25), (25, 75), (75, 75), (75, 25), (25, 25)
-        ]
-
-    def generate_smiley(self):
-        """Generate a simple smiley face as a list of relative (dx, dy) tuples."""
-        points = []
-        # Outer circle
-        for angle in range(0, 360, 30):
-            radians = angle * math.pi / 180
-            x = 50 * math.cos(radians)
-            y = 50 * math.sin(radians)
-            points.append((x, y))
-        return points
-
-    def generate_star(self):
-        """Generate a simple 5-pointed star as a list of relative (dx, dy) tuples."""
-        points = []
-        for angle in range(0, 360, 72):
-            radians = angle * math.pi / 180
-            x = 50 * math.cos(radians)
-            y = 50 * math.sin(radians)
-            points.append((x, y))
-            radians = (angle + 36) * math.pi / 180
-            x = 25 * math.cos(radians)
-            y = 25 * math.sin(radians)
-            points.append((x, y))
-        return points
-
-    def generate_triangle(self):
-        """Generate a simple equilateral triangle as a list of relative (dx, dy) tuples."""
-        return [
-            (0, 0), (50, 86.6), (100, 0), (0, 0)
-        ]
-
-    def generate_square(self):
-        """Generate a simple square as a list of relative (dx, dy) tuples."""
-        return [
-            (0, 0), (0, 50), (50, 50), (50, 0), (0, 0)
-        ]
-
-    def generate_pentagon(self):
-        """Generate a simple pentagon as a list of relative (dx, dy) tuples."""
-        points = []
-        for angle in range(0, 360, 72):
-            radians = angle * math.pi / 180
-            x = 50 * math.cos(radians)
-            y = 50 * math.sin(radians)
-            points.append((x, y))
-        points.append(points[0])  # Close the pentagon
-        return points
-
-    def generate_hexagon(self):
-        """Generate a simple hexagon as a list of relative (dx, dy) tuples."""
-        points = []
-        for angle in range(0, 360, 60):
-            radians = angle * math.pi / 180
-            x = 50 * math.cos(radians)
-            y = 50 * math.sin(radians)
-            points.append((x, y))
-        points.append(points[0])  # Close the hexagon
-        return points
-
-    def generate_octagon(self):
-        """Generate a simple octagon as a list of relative (dx, dy) tuples."""
-        points = []
-        for angle in range(0, 360, 45):
-            radians = angle * math.pi / 180
-            x = 50 * math.cos(radians)
-            y = 50 * math.sin(radians)
-            points.append((x, y))
-        points.append(points[0])  # Close the octagon
-        return points
-
-    # Automatic Movement Pattern Methods (unchanged)
-    def get_next_position_circle(self, dt):
-        """Calculate the next relative position in a circular path."""
-        self.pattern_angle += math.radians(1)  # Increment angle
-        rel_x = self.pattern_radius * math.cos(self.pattern_angle)
-        rel_y = self.pattern_radius * math.sin(self.pattern_angle)
-        return rel_x, rel_y
-
-    def get_next_position_figure_eight(self, dt):
-        """Calculate the next relative position in a figure-eight path."""
-        self.pattern_angle += math.radians(1)  # Increment angle
-        rel_x = self.pattern_radius * math.sin(self.pattern_angle)
-        rel_y = self.pattern_radius * math.sin(self.pattern_angle) * math.cos(self.pattern_angle)
-        return rel_x, rel_y
-
-    def get_next_position_spiral(self, dt):
-        """Calculate the next relative position in a spiral path."""
-        self.pattern_angle += math.radians(1)  # Increment angle
-        self.pattern_radius += self.pattern_radius_increment  # Gradually increase radius
-        rel_x = self.pattern_radius * math.cos(self.pattern_angle)
-        rel_y = self.pattern_radius * math.sin(self.pattern_angle)
-        return rel_x, rel_y
-
-    def get_next_position_random(self, dt):
-        """Calculate the next relative position in a random path."""
-        move_x = random.choice([-self.snake_speed, 0, self.snake_speed])
-        move_y = random.choice([-self.snake_speed, 0, self.snake_speed])
-        return move_x, move_y
+    # Engine Synchronisation
+    def _on_automatic_mode(self, instance, value):
+        self.engine.automatic_mode = value
+        if self.recorder:
+            self.recorder.automatic(value)
+        if value:
+            self.wake()
+
+    def _on_selected_pattern(self, instance, value):
+        self.engine.selected_pattern = value
+        if self.recorder:
+            self.recorder.pattern(value)
+
+    def _on_fast_mode(self, instance, value):
+        if self.recorder:
+            self.recorder.fast(value)
+
+    def _on_simplify_tolerance(self, instance, value):
+        self.engine.simplify_tolerance = value
+
+    def _on_symmetry(self, instance, value):
+        self.engine.set_symmetry(self.symmetry, self.symmetry_folds)
+
+    def _on_window_size(self, window, size):
+        self.engine.resize(*size)
+        self.update_symmetry()
+        if self.stroke_backing:
+            # The baked texture is remade at the new size once the window stops changing
+            Clock.unschedule(self._resize_backing)
+            Clock.schedule_once(self._resize_backing, 0.2)
+        if self.swarm:
+            self.swarm.resize(*size)
+        if self.recorder:
+            self.recorder.resize(*size)
+
+    def path_extended(self, name, points):
+        """Draw points the engine appended to one of its paths."""
+        self.strokes[name].extend(points)
+
+    def path_point_moved(self, name, x, y):
+        """Slide the end of a straight run forward."""
+        self.strokes[name].replace_last(x, y)
+
+    def path_truncated(self, name, count):
+        """Remove points the engine undid, redrawing if they were already baked."""
+        if not self.strokes[name].pop_tail(count):
+            self.redraw()
+
+    def color_changed(self, color):
+        """Recolor the head marker; the strokes follow through stroke_started."""
+        self.current_color = color
+        self.head_color_instruction.rgb = color
+
+    def stroke_started(self, name, color):
+        """Continue a path in a new color without touching what is already drawn."""
+        self.strokes[name].start_stroke(color)
+
+    def stroke_removed(self, name):
+        """Drop a path's newest color stroke after its color change was undone."""
+        if not self.strokes[name].remove_stroke():
+            self.set_runs(name)
+
+    def paths_cleared(self):
+        """Redraw every stroke from the engine's freshly cleared paths."""
+        self.redraw()
+
+    def segments_erased(self, name, erased):
+        """Cut gaps into the chunks holding erased segments, repainting any that were baked."""
+        starts = [start for start, color in self.engine.color_runs[name]]
+        baked = self.strokes[name].erase_segments(erased, starts)
+        if baked and self.stroke_backing and not self.brushing:
+            box = self.engine.segment_bounds(name, baked)
+            if box:
+                # Brush stamps within one frame share a single repaint before it is drawn
+                if self.repaint_box is None:
+                    self.repaint_box = box
+                    Clock.schedule_once(self._repaint_dirty)
+                else:
+                    old = self.repaint_box
+                    self.repaint_box = (min(old[0], box[0]), min(old[1], box[1]),
+                                        max(old[2], box[2]), max(old[3], box[3]))
+
+    def _resize_backing(self, dt):
+        self.stroke_backing.resize(Window.size)
+        self.redraw()
+
+    def _repaint_dirty(self, dt):
+        box, self.repaint_box = self.repaint_box, None
+        if box and self.stroke_backing:
+            self.repaint_baked(box)
+
+    def repaint_baked(self, box):
+        """Redraw the baked texture inside a box from the engine's segments there."""
+        # Clear what the box's lines covered, then redraw every baked line reaching into that
+        width = self.snake_line.strokes[-1].width
+        x0, y0, x1, y1 = box[0] - width, box[1] - width, box[2] + width, box[3] + width
+        lines = []
+        for name, strokes in self.strokes.items():
+            starts = [start for start, color in self.engine.color_runs[name]]
+            nearby = self.engine.segments_in(name, x0 - width, y0 - width, x1 + width, y1 + width)
+            for color, points in self.engine.visible_segments(name, strokes.baked_segments(nearby, starts)):
+                lines.append((color, Line(points=points, width=width)))
+        self.stroke_backing.repaint((x0, y0, x1, y1), lines)
+
+    def symmetry_changed(self, mode, folds):
+        """Show the drawing in the engine's new symmetry copies."""
+        self.symmetry = mode
+        self.symmetry_folds = folds
+        self.update_symmetry()
+        if self.recorder:
+            self.recorder.symmetry(mode, folds)
+
+    def update_symmetry(self):
+        self.drawing.set_copies(self.engine.symmetry_copies(), self.engine.symmetry_center())
+
+    def snake_crashed(self, x, y):
+        """End the run when the snake hits its own trail in game mode."""
+        Logger.info(f"Snake crashed at ({x:.0f}, {y:.0f})")
+        self.show_status('Crashed into your trail! Press X to start again', duration=5)
+
+    def redraw(self):
+        """Rebuild every stroke from the engine's paths."""
+        self.repaint_box = None
+        if self.stroke_backing:
+            self.stroke_backing.clear()
+            # A loaded drawing bakes thousands of chunks; draw them into the texture in batches
+            with self.stroke_backing.batch():
+                for name in self.strokes:
+                    self.set_runs(name)
+        else:
+            for name in self.strokes:
+                self.set_runs(name)
+        self.update_head()
+
+    def set_runs(self, name):
+        """Rebuild one path's strokes from the engine, with the eraser's gaps."""
+        self.strokes[name].set_runs(((color, points.view()) for color, points in self.engine.iter_runs(name)),
+                                    self.engine.erased[name],
+                                    [start for start, color in self.engine.color_runs[name]])
 
     # Keyboard Event Handlers (unchanged)
     def _on_key_down(self, window, key, scancode, codepoint, modifier):
         """Handle key press events."""
+        # Keys only drive the pad while its screen is shown
+        if not self.running:
+            return
+
         if codepoint:
             key_char = codepoint.lower()
             self.key_pressed[key_char] = True  # Track key press
+            if self.recorder:
+                self.recorder.key_down(key_char)
+            self.wake()
 
         # Check if shift key is in modifiers
         if 'shift' in modifier:
@@ -245,12 +378,38 @@ class DrawingPad(Widget):
                 self.open_color_menu()
             elif key_char == 'p':
                 self.save_drawing()
+            elif key_char == 'v':
+                self.save_vector()
             elif key_char == 'm':
                 self.return_to_main_menu()
-            elif key_char in self.templates:
+            elif key_char in self.engine.templates:
                 self.add_template(key_char)
             elif key_char == 'x':
                 self.clear_drawing()
+            elif key_char == 'z':
+                self.undo()
+            elif key_char == 'y':
+                self.redo()
+            elif key_char == 'r':
+                self.toggle_recording()
+            elif key_char == 'f':
+                self.toggle_profiler()
+            elif key_char == 'k':
+                self.dump_profile()
+            elif key_char == 'l':
+                self.start_cprofile()
+            elif key_char == 'n':
+                self.toggle_swarm()
+            elif key_char == 'g':
+                self.toggle_game_mode()
+            elif key_char == 'b':
+                self.toggle_eraser()
+            elif key_char == 'h':
+                self.cycle_symmetry()
+            elif key_char == 'j':
+                self.save_project_file()
+            elif key_char == 'o':
+                self.open_latest_project()
 
     def _on_key_up(self, window, key, scancode):
         """Handle key release events."""
@@ -265,13 +424,30 @@ class DrawingPad(Widget):
             32: ' ',   # space
             99: 'c',   # 'c'
             112: 'p',  # 'p'
+            118: 'v',  # 'v'
             109: 'm',  # 'm'
-            120: 'x'    # 'x'
+            120: 'x',   # 'x'
+            122: 'z',   # 'z'
+            121: 'y',   # 'y'
+            114: 'r',   # 'r'
+            102: 'f',   # 'f'
+            107: 'k',   # 'k'
+            108: 'l',   # 'l'
+            110: 'n',   # 'n'
+            103: 'g',   # 'g'
+            98: 'b',    # 'b'
+            104: 'h',   # 'h'
+            106: 'j',   # 'j'
+            111: 'o'    # 'o'
         }
 
         key_char = key_mapping.get(key)
         if key_char and key_char in self.key_pressed:
             del self.key_pressed[key_char]
+            if self.recorder:
+                self.recorder.key_up(key_char)
+            # Releasing a key ends the stroke, so it is undone on its own
+            self.engine.end_stroke()
 
         # If shift key is released, turn off fast mode
         if key in (304, 303):  # Kivy keycodes for left and right Shift
@@ -283,7 +459,7 @@ class DrawingPad(Widget):
         """Toggle between paused and active states."""
         self.paused = not self.paused
         if self.paused:
-            Clock.unschedule(self.update)
+            self.sleep()
             Logger.info("Game Paused")
             # Display a pause overlay
             popup = Popup(title='Paused',
@@ -291,111 +467,52 @@ class DrawingPad(Widget):
                           size_hint=(0.5, 0.3))
             popup.open()
         else:
-            Clock.schedule_interval(self.update, 1 / 60)
+            self.wake()
             Logger.info("Game Resumed")
             # Optionally, close the pause overlay if implemented
 
-    # Main Update Loop (Ensuring this method is correctly defined)
+    # Main Update Loop
     def update(self, dt):
-        """Update the snake's position and drawing based on the current mode."""
+        """Run the fixed ticks this frame's dt covers; the strokes follow through path_extended."""
         if self.paused:
             return
 
-        if self.automatic_mode:
-            # Handle automatic movement based on selected pattern
-            if self.selected_pattern == 'circle':
-                rel_x, rel_y = self.get_next_position_circle(dt)
-            elif self.selected_pattern == 'figure_eight':
-                rel_x, rel_y = self.get_next_position_figure_eight(dt)
-            elif self.selected_pattern == 'spiral':
-                rel_x, rel_y = self.get_next_position_spiral(dt)
-            elif self.selected_pattern == 'random':
-                rel_x, rel_y = self.get_next_position_random(dt)
-            else:
-                # Default to circular movement
-                rel_x, rel_y = self.get_next_position_circle(dt)
+        profiler = self.profiler
+        if profiler:
+            profiler.begin_frame()
+        try:
+            steps = self.engine.advance(dt, self.key_pressed, self.fast_mode)
+            self.update_head()
+            if self.swarm:
+                # The swarm ticks with the engine, then uploads once per frame
+                for _ in range(steps):
+                    self.swarm.step()
+                self.swarm_mesh.update()
+            # Nothing to draw until a key is pressed or auto mode is turned on
+            elif self.engine.is_idle(self.key_pressed):
+                self.sleep()
+        except Exception as e:
+            Logger.error(f"Error during update: {str(e)}")
+        if profiler:
+            profiler.end_frame(dt)
 
-            # Compute absolute positions based on snake_pos
-            new_x = self.snake_pos[0] + rel_x
-            new_y = self.snake_pos[1] + rel_y
-
-            # Append to automatic path
-            self.auto_path.extend([new_x, new_y])
-            self.auto_line.points = list(self.auto_path)
-        else:
-            # Handle manual movement
-            move_x, move_y = 0, 0
-            speed = self.fast_speed if self.fast_mode else self.snake_speed
-
-            try:
-                # Diagonal movements using 'q' and 'e'
-                if self.key_pressed.get('w') and self.key_pressed.get('q'):
-                    move_x, move_y = -speed, speed  # Up-Left
-                elif self.key_pressed.get('w') and self.key_pressed.get('e'):
-                    move_x, move_y = speed, speed   # Up-Right
-                elif self.key_pressed.get('s') and self.key_pressed.get('q'):
-                    move_x, move_y = -speed, -speed # Down-Left
-                elif self.key_pressed.get('s') and self.key_pressed.get('e'):
-                    move_x, move_y = speed, -speed  # Down-Right
-                # Cardinal directions
-                elif self.key_pressed.get('w'):
-                    move_y = speed    # Move Up
-                elif self.key_pressed.get('s'):
-                    move_y = -speed   # Move Down
-                elif self.key_pressed.get('a'):
-                    move_x = -speed   # Move Left
-                elif self.key_pressed.get('d'):
-                    move_x = speed    # Move Right
-
-                # Move the snake only if there's input
-                if move_x != 0 or move_y != 0:
-                    self.move_snake(move_x, move_y)
-            except Exception as e:
-                Logger.error(f"Error during update: {str(e)}")
-
-    # Movement Handling (unchanged)
-    def move_snake(self, move_x, move_y):
-        """Move the snake by (move_x, move_y) and update the drawing."""
-        snake_size = 10  # Define snake size or retrieve dynamically
-
-        # Calculate new position
-        new_x = self.snake_pos[0] + move_x
-        new_y = self.snake_pos[1] + move_y
-
-        # Clamp within window boundaries considering snake size
-        new_x = max(snake_size, min(new_x, Window.width - snake_size))
-        new_y = max(snake_size, min(new_y, Window.height - snake_size))
-
-        # Update the snake's position
-        self.snake_pos = [new_x, new_y]
-        self.snake_path.extend([new_x, new_y])
-
-        # Update the Line's points
-        self.snake_line.points = list(self.snake_path)
-
-        # Update the mirrored path
-        mirrored_x = Window.width - new_x
-        mirrored_y = new_y  # Vertical mirroring; change to (Window.height - new_y) for horizontal
-        self.mirror_path.extend([mirrored_x, mirrored_y])
-        self.mirror_line.points = list(self.mirror_path)
+    def update_head(self):
+        """Place the head marker between the last two ticks."""
+        x, y = self.engine.interpolated_head()
+        self.head_marker.pos = (x - SNAKE_SIZE / 2, y - SNAKE_SIZE / 2)
 
     # Color Management (unchanged)
     def change_color(self, color_index):
         """Change the snake's drawing color based on the selected index."""
         if color_index in COLOR_OPTIONS:
-            self.current_color = COLOR_OPTIONS[color_index]
-            self.color_instruction.rgb = self.current_color
-            # Update contrasting color
-            contrasting_color = self.get_contrasting_color(self.current_color)
-            self.mirror_color_instruction.rgb = contrasting_color
+            # The engine journals the change and calls color_changed
+            self.engine.set_color(COLOR_OPTIONS[color_index])
+            if self.recorder:
+                self.recorder.color(COLOR_OPTIONS[color_index])
             Logger.info(f"Color changed to index {color_index}")
         else:
             Logger.warning("Invalid color index.")
 
-    def get_contrasting_color(self, color):
-        """Calculate a contrasting color by inverting the original color."""
-        return tuple(1 - c for c in color)
-
     def open_color_menu(self):
         """Open a popup menu for color selection."""
         layout = BoxLayout(orientation='vertical', spacing=10, padding=10)
@@ -409,28 +526,93 @@ class DrawingPad(Widget):
                       size_hint=(0.3, 0.5))
         popup.open()
 
-    # Saving Drawings (unchanged)
+    # Saving Drawings
     def save_drawing(self):
-        """Save the current drawing as a PNG image capturing the full screen."""
+        """Save the current drawing as a PNG image capturing the full screen.
+
+        The framebuffer is grabbed once here; PNG encoding and the disk write
+        run on a worker thread so drawing carries on while the file is saved.
+        """
         image_path = f"snake_drawing_{int(time.time())}.png"
         try:
-            # Capture the entire window by exporting the root widget
-            App.get_running_app().root.export_to_png(image_path)
-            Logger.info(f"Drawing saved as {image_path}")
-
-            # Show a popup to inform the user
-            popup = Popup(title='Save Drawing',
-                          content=Label(text=f'Drawing saved as {image_path}'),
-                          size_hint=(0.4, 0.3))
-            popup.open()
+            # Capture the entire window by rendering the root widget offscreen
+            texture = App.get_running_app().root.export_as_image().texture
+            width, height = texture.size
+            pixels = texture.pixels
         except Exception as e:
             Logger.error(f"Failed to save drawing: {str(e)}")
+            self.show_status('Failed to save drawing.')
+            return
 
-            # Show a popup to inform the user of the error
-            popup = Popup(title='Save Error',
-                          content=Label(text='Failed to save drawing.'),
-                          size_hint=(0.4, 0.3))
-            popup.open()
+        self.show_status(f'Saving {image_path}...')
+        save_png_async(image_path, width, height, pixels, callback=self._on_drawing_saved)
+
+    def _on_drawing_saved(self, image_path, error):
+        """Report a finished background save back on the UI thread."""
+        def report(dt):
+            if error:
+                Logger.error(f"Failed to save drawing: {str(error)}")
+                self.show_status('Failed to save drawing.')
+            else:
+                Logger.info(f"Drawing saved as {image_path}")
+                self.show_status(f'Drawing saved as {image_path}')
+        Clock.schedule_once(report)
+
+    def save_vector(self, extension='svg'):
+        """Export the stored paths as an SVG (or PDF) file, straight from the path buffers."""
+        vector_path = f"snake_drawing_{int(time.time())}.{extension}"
+        try:
+            export_drawing(vector_path, self.engine, stroke_width=self.snake_line.strokes[-1].width)
+            Logger.info(f"Drawing exported as {vector_path}")
+            self.show_status(f'Drawing exported as {vector_path}')
+        except Exception as e:
+            Logger.error(f"Failed to export drawing: {str(e)}")
+            self.show_status('Failed to export drawing.')
+
+    def save_project_file(self):
+        """Save the drawing as a project file that can be opened and edited again."""
+        project_path = f"snake_drawing_{int(time.time())}.snkp"
+        try:
+            start = time.perf_counter()
+            size = save_project(project_path, self.engine)
+            Logger.info(f"Project saved as {project_path} ({size} bytes, "
+                        f"{time.perf_counter() - start:.2f}s)")
+            self.show_status(f'Project saved as {project_path}')
+        except Exception as e:
+            Logger.error(f"Failed to save project: {str(e)}")
+            self.show_status('Failed to save project.')
+
+    def open_latest_project(self):
+        """Replace the drawing with the newest project file in the working folder."""
+        projects = glob.glob('snake_drawing_*.snkp')
+        if not projects:
+            self.show_status('No project file to open.')
+            return
+        project_path = max(projects, key=os.path.getmtime)
+        # A session log cannot replay a drawing that appears out of nowhere
+        self.stop_recording()
+        try:
+            start = time.perf_counter()
+            load_project(project_path, self.engine)
+        except Exception as e:
+            Logger.error(f"Failed to open project: {str(e)}")
+            self.show_status('Failed to open project.')
+            # Whatever was read before the error is shown rather than left half-drawn
+            self.redraw()
+            return
+        self.automatic_mode = self.engine.automatic_mode
+        self.selected_pattern = self.engine.selected_pattern
+        Logger.info(f"Opened {project_path} in {time.perf_counter() - start:.2f}s")
+        self.show_status(f'Opened {project_path}')
+
+    def show_status(self, text, duration=3):
+        """Show a short message at the top of the pad, then clear it."""
+        self.status_label.text = text
+        Clock.unschedule(self._clear_status)
+        Clock.schedule_once(self._clear_status, duration)
+
+    def _clear_status(self, dt):
+        self.status_label.text = ''
 
     # Returning to Main Menu (unchanged)
     def return_to_main_menu(self):
@@ -441,68 +623,221 @@ class DrawingPad(Widget):
             Logger.info("Returned to Main Menu")
             # Optionally, reset the drawing pad state here
 
-    # Adding Templates to Drawing (unchanged)
+    # Adding Templates to Drawing
     def add_template(self, key_char):
         """Add a predefined template to the drawing based on the pressed key."""
-        # Get the template corresponding to the pressed key
-        shape = self.templates.get(key_char, [])
-
-        if not shape:
+        if self.recorder:
+            self.recorder.template(key_char)
+        if not self.engine.add_template(key_char):
             Logger.warning(f"No template found for key '{key_char}'.")
             return
+        self.update_head()
+        Logger.info(f"Added template from key '{key_char}' to the drawing.")
 
-        # Calculate absolute positions based on current snake position
-        base_x, base_y = self.snake_pos
-        new_points = []
-
-        # If the first point is (0,0), skip it to avoid duplicating the current position
-        start_index = 1 if shape and shape[0] == (0, 0) else 0
-
-        for point in shape[start_index:]:
-            dx, dy = point  # Relative movement
-            new_x = base_x + dx
-            new_y = base_y + dy
-            # Clamp within window boundaries
-            new_x = max(10, min(new_x, Window.width - 10))
-            new_y = max(10, min(new_y, Window.height - 10))
-            new_points += [new_x, new_y]
-
-        # Append the new points to the snake path as floats
-        self.snake_path.extend(new_points)
-
-        # Update the Line's points
-        self.snake_line.points = list(self.snake_path)
-
-        # Update mirrored path
-        for i in range(start_index, len(shape)):
-            dx, dy = shape[i]
-            mirrored_x = Window.width - (base_x + dx)
-            mirrored_y = base_y + dy
-            self.mirror_path.extend([mirrored_x, mirrored_y])
+    # Undo and Redo
+    def undo(self):
+        """Undo the last stroke, template or color change."""
+        if self.recorder:
+            self.recorder.undo()
+        if self.engine.undo():
+            self.update_head()
+            Logger.info("Undid the last step.")
+        else:
+            self.show_status('Nothing to undo.')
+
+    def redo(self):
+        """Redo the last undone step."""
+        if self.recorder:
+            self.recorder.redo()
+        if self.engine.redo():
+            self.update_head()
+            Logger.info("Redid the last step.")
+        else:
+            self.show_status('Nothing to redo.')
 
-        self.mirror_line.points = list(self.mirror_path)
+    # Session Recording
+    def toggle_recording(self):
+        """Start recording from a blank pad, or finish the current recording."""
+        if self.recorder:
+            self.stop_recording()
+            return
+        log_path = f"snake_session_{int(time.time())}.snkr"
+        try:
+            self.recorder = SessionRecorder(self.engine, log_path)
+        except OSError as e:
+            Logger.error(f"Failed to start recording: {str(e)}")
+            self.show_status('Failed to start recording.')
+            return
+        # Keys already held are part of the recording from its first tick
+        for key_char in self.key_pressed:
+            self.recorder.key_down(key_char)
+        if self.fast_mode:
+            self.recorder.fast(True)
+        Logger.info(f"Recording session to {log_path}")
+        self.show_status(f'Recording to {log_path}')
+
+    def stop_recording(self):
+        """Finish the session log, if one is being recorded."""
+        if self.recorder:
+            self.recorder.close()
+            Logger.info(f"Session saved as {self.recorder.path}")
+            self.show_status(f'Session saved as {self.recorder.path}')
+            self.recorder = None
+
+    # Frame-Time Instrumentation
+    def toggle_profiler(self):
+        """Turn phase timing and the overlay on or off."""
+        if self.profiler:
+            self.profiler = self.engine.profiler = None
+            Clock.unschedule(self._refresh_overlay)
+            self.profile_label.text = ''
+            Logger.info("Profiler off")
+        else:
+            self.profiler = self.engine.profiler = FrameProfiler()
+            Clock.schedule_interval(self._refresh_overlay, 0.25)
+            Logger.info("Profiler on")
 
-        # Update snake_pos to the last point of the template
-        if new_points:
-            self.snake_pos = [new_points[-2], new_points[-1]]
+    def _refresh_overlay(self, dt):
+        self.profile_label.text = self.profiler.overlay_text(self.engine)
 
-        Logger.info(f"Added template from key '{key_char}' to the drawing.")
+    def dump_profile(self):
+        """Write the rolling histograms and raw frame times to JSON and CSV."""
+        if not self.profiler:
+            self.show_status('Press F to start the profiler first.')
+            return
+        try:
+            json_path, csv_path = self.profiler.dump(f"snake_profile_{int(time.time())}")
+        except OSError as e:
+            Logger.error(f"Failed to dump profile: {str(e)}")
+            self.show_status('Failed to dump profile.')
+            return
+        Logger.info(f"Profile dumped to {json_path} and {csv_path}")
+        self.show_status(f'Profile dumped to {json_path}')
+
+    def start_cprofile(self):
+        """Profile the next PROFILE_FRAMES updates with cProfile."""
+        if not self.profiler:
+            self.toggle_profiler()
+        if self.profiler.cprofile:
+            return
+        self.profiler.start_cprofile(PROFILE_FRAMES, f"snake_profile_{int(time.time())}.prof",
+                                     callback=self._on_cprofile_done)
+        self.show_status(f'Profiling {PROFILE_FRAMES} frames...')
+
+    def _on_cprofile_done(self, path, report):
+        Logger.info(f"cProfile stats saved as {path}\n{report}")
+        self.show_status(f'cProfile stats saved as {path}')
+
+    # Game Mode
+    def toggle_game_mode(self):
+        """Turn self-collision on or off; turning it on starts from a clear pad."""
+        game_mode = not self.engine.game_mode
+        if game_mode:
+            self.clear_drawing()
+        self.engine.game_mode = game_mode
+        if self.recorder:
+            self.recorder.game(game_mode)
+        self.show_status('Game mode: avoid your own trail' if game_mode else 'Game mode off')
+
+    # Eraser
+    def toggle_eraser(self):
+        """Turn the eraser on or off; while on, mouse drags erase under the brush."""
+        self.eraser_mode = not self.eraser_mode
+        if not self.eraser_mode:
+            self.brush_marker.rectangle = (0, 0, 0, 0)
+        self.show_status('Eraser on: drag to erase' if self.eraser_mode else 'Eraser off')
+
+    def on_touch_down(self, touch):
+        if not (self.eraser_mode and self.running):
+            return super().on_touch_down(touch)
+        touch.grab(self)
+        self.erase_from = None
+        self.erase_to(*touch.pos)
+        return True
+
+    def on_touch_move(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_move(touch)
+        self.erase_to(*touch.pos)
+        return True
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is not self:
+            return super().on_touch_up(touch)
+        touch.ungrab(self)
+        self.erase_from = None
+        self.engine.end_erase()
+        if self.recorder:
+            self.recorder.end_erase()
+        return True
+
+    def erase_to(self, x, y):
+        """Erase along the drag from the last brush position to (x, y).
+
+        Brush stamps are spaced half a radius apart, so a fast drag leaves
+        no unerased gaps between touch events. Everything under a stamp is
+        erased, so baked chunks are updated by clearing the stamp's square
+        of the texture rather than by redrawing the segments around it.
+        """
+        radius = self.eraser_size
+        self.brush_marker.rectangle = (x - radius, y - radius, 2 * radius, 2 * radius)
+        if self.erase_from is None:
+            stamps = [(x, y)]
+        else:
+            x0, y0 = self.erase_from
+            count = max(1, int(math.ceil(math.hypot(x - x0, y - y0) / (radius / 2))))
+            stamps = [(x0 + (x - x0) * i / count, y0 + (y - y0) * i / count) for i in range(1, count + 1)]
+        self.erase_from = (x, y)
+        boxes = []
+        self.brushing = True
+        try:
+            for stamp_x, stamp_y in stamps:
+                if self.recorder:
+                    self.recorder.erase(stamp_x, stamp_y, radius)
+                if self.engine.erase(stamp_x, stamp_y, radius):
+                    for cx, cy in self.engine.symmetric_points(stamp_x, stamp_y):
+                        boxes.append((cx - radius, cy - radius, cx + radius, cy + radius))
+        finally:
+            self.brushing = False
+        if boxes and self.stroke_backing:
+            self.stroke_backing.clear_boxes(boxes)
+
+    # Symmetry
+    def cycle_symmetry(self):
+        """Switch to the next symmetry mode."""
+        index = SYMMETRY_MODES.index(self.symmetry) if self.symmetry in SYMMETRY_MODES else -1
+        self.symmetry = SYMMETRY_MODES[(index + 1) % len(SYMMETRY_MODES)]
+        folds = f' ({int(self.symmetry_folds)}-fold)' if self.symmetry in ('radial', 'kaleidoscope') else ''
+        self.show_status(f'Symmetry: {self.symmetry}{folds}')
+
+    # Swarm Mode
+    def toggle_swarm(self):
+        """Start swarm_size automatic snakes, or remove the running swarm."""
+        if self.swarm:
+            self.canvas.remove(self.swarm_mesh.group)
+            self.swarm = self.swarm_mesh = None
+            self.show_status('Swarm removed')
+            return
+        try:
+            self.swarm = Swarm(self.engine.width, self.engine.height, step_scale=self.engine.step_scale)
+        except RuntimeError as e:
+            Logger.warning(f"Swarm unavailable: {e}")
+            self.show_status(f'Swarm unavailable: {e}')
+            return
+        self.swarm.add_random(int(self.swarm_size), palette=tuple(COLOR_OPTIONS.values()))
+        self.swarm_mesh = SwarmMesh(self.swarm)
+        self.canvas.add(self.swarm_mesh.group)
+        self.show_status(f'Swarm of {len(self.swarm)} snakes')
+        self.wake()
 
-    # Clearing the Drawing Area (unchanged)
+    # Clearing the Drawing Area
     def clear_drawing(self):
         """Clear the current drawing and reset the snake's position."""
-        # Clear the snake path
-        self.snake_path.clear()
-        # Clear the mirrored path
-        self.mirror_path.clear()
-        # Reset the snake's position to the center
-        self.snake_pos = [Window.width // 2, Window.height // 2]
-        # Append the starting position as floats
-        self.snake_path.extend([self.snake_pos[0], self.snake_pos[1]])
-        self.mirror_path.extend([Window.width - self.snake_pos[0], self.snake_pos[1]])
-        # Reset the Line's points
-        self.snake_line.points = [self.snake_pos[0], self.snake_pos[1]]
-        self.mirror_line.points = [Window.width - self.snake_pos[0], self.snake_pos[1]]
+        if self.recorder:
+            self.recorder.clear()
+        self.engine.clear()
+        if self.swarm:
+            self.swarm.clear()
         Logger.info("Drawing area cleared.")
 
 class MainMenu(Screen):
@@ -575,6 +910,14 @@ class DrawingPadScreen(Screen):
         self.drawing_pad = DrawingPad()
         self.add_widget(self.drawing_pad)
 
+    def on_enter(self, *args):
+        """Start the drawing pad's update loop when the screen is shown."""
+        self.drawing_pad.start()
+
+    def on_leave(self, *args):
+        """Stop the drawing pad's update loop when another screen is shown."""
+        self.drawing_pad.stop()
+
 class SnakeApp(App):
     """Main application class."""
     version = '1.1'  # Updated version number
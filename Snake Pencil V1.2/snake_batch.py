@@ -0,0 +1,222 @@
+# Snake Pencil V1.2
+# Headless batch rendering of pattern and template drawings across a process pool.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+# A job file is JSON: a list of jobs, or {"defaults": {...}, "jobs": [...]}
+# where each job may set:
+#   output       PNG, SVG or PDF file to write (required; relative to the job file)
+#   pattern      automatic pattern to run, by its name in snake_patterns.PATTERNS
+#   steps        ticks of the pattern to run (default 1000)
+#   templates    template keys or names placed at the snake's position, or
+#                {"template": ..., "at": [x, y], "color": [r, g, b]} for placement and color
+#   color        snake color as 0-1 RGB (default green)
+#   background   background color as 0-1 RGB (default black)
+#   size         drawing area [width, height] (default 1000 x 800)
+#   output_size  PNG size [width, height] (default the drawing area)
+#   scale        vector output scale (default 1)
+#   seed         random seed, for the random pattern
+#   symmetry     copies the drawing is shown in, by its name in snake_symmetry.SYMMETRY_MODES
+#                (default vertical, the pad's mirror)
+#   folds        copies around the center in the radial and kaleidoscope modes (default 6)
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from snake_engine import SnakeEngine
+from snake_patterns import PATTERNS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZE = (1000, 800)  # The pad's window size
+DEFAULT_STEPS = 1000
+OUTPUT_FORMATS = ('.png', '.svg', '.pdf')
+
+
+def load_jobs(path):
+    """Read a job file and return its jobs with defaults applied and outputs made absolute."""
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, list):
+        data = {'jobs': data}
+    defaults = data.get('defaults', {})
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for number, entry in enumerate(data.get('jobs', [])):
+        job = dict(defaults)
+        job.update(entry)
+        job.setdefault('name', os.path.splitext(os.path.basename(job.get('output', '')))[0] or f'job{number}')
+        if 'output' in job:
+            job['output'] = os.path.join(base, job['output'])
+        jobs.append(job)
+    return jobs
+
+
+def resolve_templates(jobs, catalog):
+    """Return {reference: shape} for every template the jobs use.
+
+    A reference is a key bound in the catalog's keys.json or a template
+    name. Shapes are compiled once here and shipped to the workers, so
+    the workers never parse or write the template cache concurrently.
+    Unknown or broken templates are left out; their jobs fail on their own.
+    """
+    keys = catalog.bindings()
+    shapes = {}
+    for job in jobs:
+        for entry in job.get('templates', ()):
+            reference = entry['template'] if isinstance(entry, dict) else entry
+            if not isinstance(reference, str) or reference in shapes:
+                continue
+            try:
+                shapes[reference] = keys[reference] if reference in keys else catalog[reference]
+            except (KeyError, OSError, ValueError) as e:
+                logger.warning(f"Template '{reference}' unavailable: {e}")
+    return shapes
+
+
+def build_engine(job, shapes):
+    """Draw a job's templates and pattern on a fresh engine and return it."""
+    width, height = job.get('size', DEFAULT_SIZE)
+    engine = SnakeEngine(width, height, history_mode=True, seed=job.get('seed'),
+                         color=tuple(job.get('color', (0, 1, 0))))
+    engine.templates = shapes
+    engine.set_symmetry(job.get('symmetry', engine.symmetry), job.get('folds'))
+
+    for entry in job.get('templates', ()):
+        if not isinstance(entry, dict):
+            entry = {'template': entry}
+        reference = entry['template']
+        if reference not in shapes:
+            raise ValueError(f"Unknown template: {reference}")
+        if 'at' in entry:
+            engine.snake_pos = list(engine.clamp(*entry['at']))
+        if 'color' in entry:
+            engine.set_color(tuple(entry['color']))
+        engine.add_template(reference)
+
+    pattern = job.get('pattern')
+    if pattern is not None:
+        if pattern not in PATTERNS:
+            raise ValueError(f"Unknown pattern: {pattern}")
+        engine.selected_pattern = pattern
+        engine.automatic_mode = True
+        for _ in range(int(job.get('steps', DEFAULT_STEPS))):
+            engine.step({})
+    return engine
+
+
+def render_job(job, shapes):
+    """Render one job and return its status dict; never raises, so one bad job stays isolated."""
+    start = time.perf_counter()
+    status = {'name': job.get('name'), 'output': job.get('output'), 'ok': False}
+    try:
+        output = job['output']
+        extension = os.path.splitext(output)[1].lower()
+        if extension not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output}")
+        engine = build_engine(job, shapes)
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        background = tuple(job.get('background', (0, 0, 0)))
+        if extension == '.png':
+            from snake_raster import render_png
+            out_width, out_height = job.get('output_size', (engine.width, engine.height))
+            # Tiles render in this worker; the batch is already spread over the pool
+            render_png(output, engine.iter_drawing, engine.width, engine.height,
+                       int(out_width), int(out_height), background=background, workers=0)
+        else:
+            from snake_export import export_drawing
+            export_drawing(output, engine, scale=job.get('scale', 1), background=background)
+        status['points'] = sum(len(path) for path in engine.paths.values()) // 2
+        status['ok'] = True
+    except Exception as e:
+        status['error'] = f'{type(e).__name__}: {e}'
+        status['traceback'] = traceback.format_exc()
+    status['seconds'] = time.perf_counter() - start
+    return status
+
+
+def _render_isolated(job, shapes):
+    """Render a job in a worker process of its own, so a crash only fails this job."""
+    try:
+        with ProcessPoolExecutor(1) as pool:
+            return pool.submit(render_job, job, shapes).result()
+    except BrokenProcessPool:
+        return {'name': job.get('name'), 'output': job.get('output'), 'ok': False,
+                'error': 'worker process died', 'seconds': 0.0}
+
+
+def run_batch(jobs, shapes, workers=None, progress=None):
+    """Render every job across a process pool and return their statuses in job order.
+
+    Errors inside a job come back as a failed status. A worker that dies
+    outright breaks the whole pool, taking the other running jobs with it,
+    so those jobs are rerun afterwards, each in a process of its own.
+    ``workers=0`` renders every job in this process.
+    """
+    results = [None] * len(jobs)
+
+    def finish(index, status):
+        results[index] = status
+        if progress:
+            progress(status)
+
+    if workers == 0:
+        for index, job in enumerate(jobs):
+            finish(index, render_job(job, shapes))
+        return results
+
+    broken = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {pool.submit(render_job, job, shapes): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            try:
+                finish(futures[future], future.result())
+            except BrokenProcessPool:
+                broken.append(futures[future])
+
+    if broken:
+        logger.warning(f"A worker process died; rerunning {len(broken)} jobs one per process")
+        with ThreadPoolExecutor(workers or os.cpu_count()) as threads:
+            for index, status in zip(broken, threads.map(lambda index: _render_isolated(jobs[index], shapes), broken)):
+                finish(index, status)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render Snake Pencil drawings from a job file without a window.')
+    parser.add_argument('jobs', help='JSON job file')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per core, 0 for none)')
+    parser.add_argument('--templates', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'),
+                        help='template folder to resolve template keys and names in')
+    parser.add_argument('--report', help='write every job status as JSON here')
+    args = parser.parse_args(argv)
+    logging.basicConfig(format='%(levelname)s: %(message)s')
+
+    from snake_catalog import TemplateCatalog
+    jobs = load_jobs(args.jobs)
+    shapes = resolve_templates(jobs, TemplateCatalog(args.templates))
+
+    def progress(status):
+        if status['ok']:
+            print(f"ok    {status['name']} -> {status['output']} ({status['seconds']:.2f}s)")
+        else:
+            print(f"FAIL  {status['name']}: {status['error']}", file=sys.stderr)
+
+    start = time.perf_counter()
+    results = run_batch(jobs, shapes, args.workers, progress)
+    failed = sum(not status['ok'] for status in results)
+    print(f"{len(results) - failed} of {len(results)} jobs rendered in {time.perf_counter() - start:.2f}s")
+    if args.report:
+        with open(args.report, 'w') as file:
+            json.dump(results, file, indent=1)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
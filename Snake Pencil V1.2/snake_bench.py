@@ -0,0 +1,229 @@
+# Snake Pencil V1.2
+# Benchmarks for the drawing hot paths, with machine-readable results.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+from snake_engine import SnakeEngine
+from snake_patterns import PATTERNS
+from snake_export import export_svg, save_png
+
+VERSION = '1.2'
+SIZES = (1000, 10000, 100000, 1000000)  # Points already in the drawing
+WIDTH, HEIGHT = 1000, 800  # The pad's window size
+REGRESSION_THRESHOLD = 0.10  # Slowdown reported by --compare
+TURNS = ((5, 0), (0, 5), (-5, 0), (0, -5))
+ERASER_SIZE = 12  # The pad's default eraser radius
+
+
+@functools.lru_cache(maxsize=None)
+def random_walk(count, seed=0):
+    """Return ``count`` points of a random walk inside the window, as flat floats."""
+    rng = random.Random(seed)
+    x, y = WIDTH / 2, HEIGHT / 2
+    points = array('f', bytes(8 * count))
+    for i in range(0, 2 * count, 2):
+        x = min(max(x + rng.choice((-5, 0, 5)), 10), WIDTH - 10)
+        y = min(max(y + rng.choice((-5, 0, 5)), 10), HEIGHT - 10)
+        points[i] = x
+        points[i + 1] = y
+    return points
+
+
+def drawing(size, history_mode=True):
+    """Return an engine whose snake path already holds ``size`` points.
+
+    The points go in through ``restore``, like an opened project, so the
+    segment grid and color runs cover them as if they had been drawn.
+    """
+    engine = SnakeEngine(WIDTH, HEIGHT, history_mode=history_mode, seed=0)
+    points = random_walk(size)
+    engine.restore([('snake', [], {}, [points])], (points[-2], points[-1]))
+    return engine
+
+
+def zigzag(engine):
+    """One manual tick that turns every time, so each call appends a point."""
+    engine.tick_count += 1
+    engine.move_snake(*TURNS[engine.tick_count % 4])
+
+
+def probe(size):
+    """Return (engine, rng): a drawing and a seeded source of random points over it."""
+    return drawing(size), random.Random(1)
+
+
+def crossing(state):
+    """Ask the snake's grid whether a random step crosses the trail."""
+    engine, rng = state
+    x, y = rng.uniform(10, WIDTH - 10), rng.uniform(10, HEIGHT - 10)
+    dx, dy = TURNS[rng.randrange(4)]
+    engine.grids['snake'].crosses(x, y, x + dx, y + dy)
+
+
+def erasing(state):
+    """Stamp the eraser once at a random point of the drawing."""
+    engine, rng = state
+    engine.erase(rng.uniform(10, WIDTH - 10), rng.uniform(10, HEIGHT - 10), ERASER_SIZE)
+
+
+def percentiles(samples):
+    """Summarize nanosecond samples as microsecond percentiles."""
+    samples = sorted(samples)
+
+    def at(fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))] / 1000
+
+    return {
+        'p50_us': at(0.50), 'p90_us': at(0.90), 'p99_us': at(0.99),
+        'max_us': samples[-1] / 1000, 'mean_us': sum(samples) / len(samples) / 1000
+    }
+
+
+def measure(setup, operation, repeat, fresh=False):
+    """Time ``repeat`` calls of operation(state), then rerun them under tracemalloc.
+
+    Timing and memory are separate passes, so tracing does not skew the
+    latencies. ``setup`` builds the state for each pass, or for every call
+    with ``fresh`` (for operations like clearing that use their state up).
+    """
+    states = [setup() for _ in range(repeat)] if fresh else None
+    state = None if fresh else setup()
+    samples = []
+    clock = time.perf_counter_ns
+    for i in range(repeat):
+        if fresh:
+            state = states[i]
+        start = clock()
+        operation(state)
+        samples.append(clock() - start)
+    result = percentiles(samples)
+    result['ops'] = repeat
+
+    states = [setup() for _ in range(repeat)] if fresh else None
+    state = None if fresh else setup()
+    tracemalloc.start()
+    blocks = sys.getallocatedblocks()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(repeat):
+        operation(states[i] if fresh else state)
+    after, peak = tracemalloc.get_traced_memory()
+    result['alloc_blocks_per_op'] = (sys.getallocatedblocks() - blocks) / repeat
+    result['alloc_bytes_per_op'] = (after - before) / repeat
+    result['peak_bytes'] = peak - before
+    tracemalloc.stop()
+    return result
+
+
+def cases(sizes, repeat):
+    """Yield (name, size, setup, operation, repeat, fresh) for every benchmark."""
+    for size in sizes:
+        def manual(size=size):
+            return drawing(size)
+
+        yield 'move_snake', size, manual, zigzag, repeat, False
+
+        for pattern in PATTERNS:
+            def automatic(size=size, pattern=pattern):
+                engine = drawing(size)
+                engine.automatic_mode = True
+                engine.selected_pattern = pattern
+                return engine
+            yield f'auto_{pattern}', size, automatic, lambda engine: engine.step({}), repeat, False
+
+        for key in sorted(SnakeEngine(WIDTH, HEIGHT, history_mode=False).templates):
+            yield f'template_{key}', size, manual, lambda engine, key=key: engine.add_template(key), repeat, False
+
+        # Grid queries: a collision check and an eraser stamp at random points
+        yield 'collision_query', size, functools.partial(probe, size), crossing, repeat, False
+        yield 'erase', size, functools.partial(probe, size), erasing, repeat, False
+
+        # Clearing and saving are heavy: fewer calls, and a fresh drawing for every clear
+        yield 'clear_drawing', size, manual, lambda engine: engine.clear(), max(1, repeat // 100), True
+
+        def save(engine, folder=tempfile.gettempdir()):
+            export_svg(os.path.join(folder, 'snake_bench.svg'), engine.iter_drawing(), WIDTH, HEIGHT)
+        yield 'save_vector', size, manual, save, max(1, repeat // 100), False
+
+    # A full-window PNG does not depend on the path size
+    pixels = bytes(WIDTH * HEIGHT * 4)
+    yield ('save_png', None, lambda: pixels,
+           lambda pixels: save_png(os.path.join(tempfile.gettempdir(), 'snake_bench.png'), WIDTH, HEIGHT, pixels),
+           max(1, repeat // 100), False)
+
+
+def run(sizes=SIZES, repeat=1000, only=None, progress=None):
+    """Run the benchmarks and return a JSON-ready result dict."""
+    results = []
+    for name, size, setup, operation, count, fresh in cases(sizes, repeat):
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        if progress:
+            progress(f'{name} size={size}')
+        result = measure(setup, operation, count, fresh)
+        result.update(name=name, size=size)
+        results.append(result)
+    return {
+        'version': VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results
+    }
+
+
+def compare(old, new, threshold=REGRESSION_THRESHOLD):
+    """Print p50 latency changes between two result files; return the regressions."""
+    baseline = {(r['name'], r['size']): r for r in old['results']}
+    regressions = []
+    print(f"{'benchmark':<24}{'size':>9}{'old p50 us':>13}{'new p50 us':>13}{'change':>9}")
+    for result in new['results']:
+        key = (result['name'], result['size'])
+        if key not in baseline:
+            continue
+        before, after = baseline[key]['p50_us'], result['p50_us']
+        change = (after - before) / before if before else 0.0
+        flag = ' !' if change > threshold else ''
+        print(f"{key[0]:<24}{str(key[1]):>9}{before:>13.2f}{after:>13.2f}{change:>+9.0%}{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the Snake Pencil drawing hot paths.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='points already drawn')
+    parser.add_argument('--repeat', type=int, default=1000, help='calls per benchmark')
+    parser.add_argument('--only', nargs='+', help='run benchmarks whose names start with these')
+    parser.add_argument('--output', help='write the JSON results here instead of stdout')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='p50 slowdown flagged as a regression by --compare')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            regressions = compare(json.load(old), json.load(new), args.threshold)
+        return 1 if regressions else 0
+
+    report = run(args.sizes, args.repeat, args.only, progress=lambda text: print(text, file=sys.stderr))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
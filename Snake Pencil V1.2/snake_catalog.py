@@ -0,0 +1,414 @@
+# Snake Pencil V1.2
+# Template catalog: user shapes imported from SVG or JSON files, loaded on first use.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+from array import array
+from collections.abc import Mapping
+
+from snake_engine import TEMPLATES, compile_template
+
+logger = logging.getLogger(__name__)
+
+# Names of the built-in templates, by the key that inserts them
+DEFAULT_KEYS = {
+    '1': 'heart', '2': 'cube', '3': 'smiley', '4': 'star', '5': 'triangle',
+    '6': 'square', '7': 'pentagon', '8': 'hexagon', '9': 'octagon'
+}
+# Keys that already drive the pad and cannot insert templates
+RESERVED_KEYS = set('wasdqe cpvmxzyrfklngbhjo')
+TEMPLATE_SIZE = 100  # Imported SVG shapes are scaled to fit this many pixels
+FLATTEN_STEP = 4  # Roughly this many pixels per segment when flattening curves
+MAX_CURVE_SEGMENTS = 64
+KEYS_FILE = 'keys.json'  # Optional {"key": "template name"} bindings in the catalog folder
+INDEX_FILE = 'index.json'
+
+
+# SVG Import
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_PATH_TOKEN = re.compile(r'[MmLlHhVvCcSsQqTtAaZz]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_TRANSFORM = re.compile(r'(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)')
+# Numbers taken by each path command
+_ARGUMENTS = {'m': 2, 'l': 2, 'h': 1, 'v': 1, 'c': 6, 's': 4, 'q': 4, 't': 2, 'a': 7, 'z': 0}
+
+
+def _segments(length):
+    """Pick how many segments to flatten a curve of about this length into."""
+    return max(2, min(MAX_CURVE_SEGMENTS, int(math.ceil(length / FLATTEN_STEP))))
+
+
+def _cubic(p0, p1, p2, p3):
+    """Flatten a cubic Bezier into points after p0."""
+    count = _segments(math.dist(p0, p1) + math.dist(p1, p2) + math.dist(p2, p3))
+    points = []
+    for i in range(1, count + 1):
+        t = i / count
+        u = 1 - t
+        points.append((u * u * u * p0[0] + 3 * u * u * t * p1[0] + 3 * u * t * t * p2[0] + t * t * t * p3[0],
+                       u * u * u * p0[1] + 3 * u * u * t * p1[1] + 3 * u * t * t * p2[1] + t * t * t * p3[1]))
+    return points
+
+
+def _quadratic(p0, p1, p2):
+    """Flatten a quadratic Bezier into points after p0."""
+    count = _segments(math.dist(p0, p1) + math.dist(p1, p2))
+    points = []
+    for i in range(1, count + 1):
+        t = i / count
+        u = 1 - t
+        points.append((u * u * p0[0] + 2 * u * t * p1[0] + t * t * p2[0],
+                       u * u * p0[1] + 2 * u * t * p1[1] + t * t * p2[1]))
+    return points
+
+
+def _arc(p0, rx, ry, rotation, large_arc, sweep, p1):
+    """Flatten an SVG elliptical arc into points after p0 (SVG spec, appendix F.6.5)."""
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0 or p0 == p1:
+        return [p1]
+    phi = math.radians(rotation)
+    cos_phi, sin_phi = math.cos(phi), math.sin(phi)
+    dx, dy = (p0[0] - p1[0]) / 2, (p0[1] - p1[1]) / 2
+    x1 = cos_phi * dx + sin_phi * dy
+    y1 = -sin_phi * dx + cos_phi * dy
+    # Scale the radii up if the end points are too far apart
+    scale = x1 * x1 / (rx * rx) + y1 * y1 / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    numerator = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    factor = math.sqrt(max(0, numerator / (rx * rx * y1 * y1 + ry * ry * x1 * x1)))
+    if large_arc == sweep:
+        factor = -factor
+    cx1, cy1 = factor * rx * y1 / ry, -factor * ry * x1 / rx
+    cx = cos_phi * cx1 - sin_phi * cy1 + (p0[0] + p1[0]) / 2
+    cy = sin_phi * cx1 + cos_phi * cy1 + (p0[1] + p1[1]) / 2
+    start = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    delta = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx) - start
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    count = _segments(abs(delta) * max(rx, ry))
+    points = []
+    for i in range(1, count + 1):
+        angle = start + delta * i / count
+        x, y = rx * math.cos(angle), ry * math.sin(angle)
+        points.append((cos_phi * x - sin_phi * y + cx, sin_phi * x + cos_phi * y + cy))
+    return points
+
+
+def parse_path(d):
+    """Flatten SVG path data into one polyline of (x, y) points.
+
+    Subpaths are joined, since the snake draws every template without
+    lifting the pencil.
+    """
+    tokens = _PATH_TOKEN.findall(d)
+    points = []
+    current = start = (0.0, 0.0)
+    control = None  # Last control point, for S and T reflections
+    command = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+        elif command is None:
+            raise ValueError('path data must start with a command')
+        lower = command.lower()
+        count = _ARGUMENTS[lower]
+        args = [float(value) for value in tokens[i:i + count]]
+        if len(args) < count:
+            raise ValueError(f"incomplete '{command}' in path data")
+        i += count
+        relative = command.islower()
+        ox, oy = current if relative else (0.0, 0.0)
+
+        if lower == 'z':
+            points.append(start)
+            current, control = start, None
+            if i < len(tokens) and not tokens[i].isalpha():
+                raise ValueError("numbers after 'z' in path data")
+            continue
+        if lower == 'm':
+            current = start = (ox + args[0], oy + args[1])
+            points.append(current)
+            command = 'l' if relative else 'L'  # Extra pairs after a move are lines
+            control = None
+            continue
+        if lower == 'l':
+            new = [(ox + args[0], oy + args[1])]
+        elif lower == 'h':
+            new = [(ox + args[0], current[1])]
+        elif lower == 'v':
+            new = [(current[0], oy + args[0])]
+        elif lower == 'c':
+            p1, p2 = (ox + args[0], oy + args[1]), (ox + args[2], oy + args[3])
+            new = _cubic(current, p1, p2, (ox + args[4], oy + args[5]))
+            control = p2
+        elif lower == 's':
+            p1 = (2 * current[0] - control[0], 2 * current[1] - control[1]) if control else current
+            p2 = (ox + args[0], oy + args[1])
+            new = _cubic(current, p1, p2, (ox + args[2], oy + args[3]))
+            control = p2
+        elif lower == 'q':
+            p1 = (ox + args[0], oy + args[1])
+            new = _quadratic(current, p1, (ox + args[2], oy + args[3]))
+            control = p1
+        elif lower == 't':
+            p1 = (2 * current[0] - control[0], 2 * current[1] - control[1]) if control else current
+            new = _quadratic(current, p1, (ox + args[0], oy + args[1]))
+            control = p1
+        else:
+            new = _arc(current, args[0], args[1], args[2], bool(args[3]), bool(args[4]),
+                       (ox + args[5], oy + args[6]))
+        if lower not in 'cqst':
+            control = None
+        points += new
+        current = new[-1]
+    return points
+
+
+def _parse_transform(text):
+    """Turn an SVG transform attribute into an (a, b, c, d, e, f) matrix."""
+    matrix = (1, 0, 0, 1, 0, 0)
+    for name, values in _TRANSFORM.findall(text or ''):
+        v = [float(value) for value in _NUMBER.findall(values)]
+        if name == 'matrix':
+            step = tuple(v[:6])
+        elif name == 'translate':
+            step = (1, 0, 0, 1, v[0], v[1] if len(v) > 1 else 0)
+        elif name == 'scale':
+            step = (v[0], 0, 0, v[1] if len(v) > 1 else v[0], 0, 0)
+        elif name == 'rotate':
+            angle = math.radians(v[0])
+            cx, cy = (v[1], v[2]) if len(v) > 2 else (0, 0)
+            cos_a, sin_a = math.cos(angle), math.sin(angle)
+            step = (cos_a, sin_a, -sin_a, cos_a,
+                    cx - cos_a * cx + sin_a * cy, cy - sin_a * cx - cos_a * cy)
+        elif name == 'skewX':
+            step = (1, 0, math.tan(math.radians(v[0])), 1, 0, 0)
+        else:
+            step = (1, math.tan(math.radians(v[0])), 0, 1, 0, 0)
+        matrix = _multiply(matrix, step)
+    return matrix
+
+
+def _multiply(m, n):
+    """Compose two affine matrices, applying n first."""
+    a, b, c, d, e, f = m
+    return (a * n[0] + c * n[1], b * n[0] + d * n[1],
+            a * n[2] + c * n[3], b * n[2] + d * n[3],
+            a * n[4] + c * n[5] + e, b * n[4] + d * n[5] + f)
+
+
+def parse_svg(data):
+    """Return the (x, y) points of every path, polyline, polygon and line in an SVG document."""
+    points = []
+
+    def visit(element, matrix):
+        matrix = _multiply(matrix, _parse_transform(element.get('transform')))
+        tag = element.tag.rsplit('}', 1)[-1]  # Drop the XML namespace
+        shape = []
+        if tag == 'path':
+            shape = parse_path(element.get('d', ''))
+        elif tag in ('polyline', 'polygon'):
+            values = [float(value) for value in _NUMBER.findall(element.get('points', ''))]
+            shape = list(zip(values[0::2], values[1::2]))
+            if tag == 'polygon' and shape:
+                shape.append(shape[0])
+        elif tag == 'line':
+            shape = [(float(element.get('x1', 0)), float(element.get('y1', 0))),
+                     (float(element.get('x2', 0)), float(element.get('y2', 0)))]
+        a, b, c, d, e, f = matrix
+        points.extend((a * x + c * y + e, b * x + d * y + f) for x, y in shape)
+        for child in element:
+            visit(child, matrix)
+
+    visit(ElementTree.fromstring(data), (1, 0, 0, 1, 0, 0))
+    return points
+
+
+def normalize(points, size=TEMPLATE_SIZE):
+    """Make SVG points relative to the first one, flip y up and fit them in ``size`` pixels."""
+    if not points:
+        return []
+    x0, y0 = points[0]
+    width = max(x for x, _ in points) - min(x for x, _ in points)
+    height = max(y for _, y in points) - min(y for _, y in points)
+    scale = min(1, size / max(width, height, 1e-9))  # Only ever shrink
+    return [((x - x0) * scale, (y0 - y) * scale) for x, y in points]
+
+
+def import_template(data, kind):
+    """Compile the bytes of a .svg or .json template file into a flat float array.
+
+    JSON holds relative (dx, dy) pairs, y up, either as a bare list or under
+    a "points" key, exactly like the built-in shapes.
+    """
+    try:
+        if kind == '.svg':
+            shape = normalize(parse_svg(data))
+        else:
+            document = json.loads(data)
+            if isinstance(document, dict):
+                document = document['points']
+            shape = [(float(x), float(y)) for x, y in document]
+    except (ElementTree.ParseError, KeyError, TypeError) as e:
+        raise ValueError(f'not a valid template: {e}') from e
+    if len(shape) < 2:
+        raise ValueError('a template needs at least two points')
+    return compile_template(shape)
+
+
+class TemplateCatalog(Mapping):
+    """Template shapes by name: the built-ins plus every .svg/.json file in a folder.
+
+    Opening a catalog only lists the folder and reads a small index, so it
+    stays fast however many files there are. A shape is compiled on first
+    use and its float array cached on disk under the hash of the file's
+    content, so unchanged files are never parsed twice.
+    """
+
+    def __init__(self, directory=None, cache_dir=None):
+        self.directory = directory
+        self.cache_dir = cache_dir or (directory and os.path.join(directory, '.cache'))
+        self.builtins = {DEFAULT_KEYS[key]: shape for key, shape in TEMPLATES.items()}
+        self.files = {}  # Name -> (path, mtime_ns, size)
+        self.loaded = {}  # Name -> compiled array, filled on first use
+        self.index = {}  # File name -> [mtime_ns, size, content hash] from earlier runs
+        if directory and os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                name, extension = os.path.splitext(entry.name)
+                if extension.lower() in ('.svg', '.json') and entry.name != KEYS_FILE and entry.is_file():
+                    stat = entry.stat()
+                    self.files[name] = (entry.path, stat.st_mtime_ns, stat.st_size)
+            self._read_index()
+
+    def __getitem__(self, name):
+        shape = self.loaded.get(name)
+        if shape is None:
+            if name in self.files:
+                shape = self.loaded[name] = self._load(name)
+            else:
+                shape = self.builtins[name]
+        return shape
+
+    def __contains__(self, name):
+        return name in self.files or name in self.builtins
+
+    def __iter__(self):
+        yield from self.builtins
+        yield from (name for name in sorted(self.files) if name not in self.builtins)
+
+    def __len__(self):
+        return len(self.builtins) + sum(name not in self.builtins for name in self.files)
+
+    def _read_index(self):
+        """Load the content hashes recorded by earlier runs."""
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE)) as file:
+                self.index = json.load(file)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _write_index(self):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(os.path.join(self.cache_dir, INDEX_FILE), 'w') as file:
+                json.dump(self.index, file)
+        except OSError as e:
+            logger.warning(f"Could not write the template index: {e}")
+
+    def _load(self, name):
+        """Return a file's compiled shape from the cache, importing it if needed."""
+        path, mtime, size = self.files[name]
+        file_name = os.path.basename(path)
+        known = self.index.get(file_name)
+        if known and known[:2] == [mtime, size]:
+            shape = self._read_cache(known[2])
+            if shape is not None:
+                return shape
+
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest = hashlib.sha1(data).hexdigest()
+        # The same content may already be cached under another file name
+        shape = self._read_cache(digest)
+        if shape is None:
+            shape = import_template(data, os.path.splitext(path)[1].lower())
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(os.path.join(self.cache_dir, digest + '.bin'), 'wb') as file:
+                    shape.tofile(file)
+            except OSError as e:
+                logger.warning(f"Could not cache template '{name}': {e}")
+        self.index[file_name] = [mtime, size, digest]
+        self._write_index()
+        return shape
+
+    def _read_cache(self, digest):
+        """Read a compiled shape by content hash, or None if it is not cached."""
+        try:
+            with open(os.path.join(self.cache_dir, digest + '.bin'), 'rb') as file:
+                return array('d', file.read())
+        except OSError:
+            return None
+
+    def bindings(self):
+        """Return the key bindings: the defaults overridden by the folder's keys.json."""
+        keys = dict(DEFAULT_KEYS)
+        if self.directory:
+            try:
+                with open(os.path.join(self.directory, KEYS_FILE)) as file:
+                    keys.update(json.load(file))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring {KEYS_FILE}: {e}")
+        return TemplateKeys(self, keys)
+
+
+class TemplateKeys(Mapping):
+    """Key -> shape view of a catalog, used as ``SnakeEngine.templates``.
+
+    Looking a key up loads its shape; testing membership does not.
+    """
+
+    def __init__(self, catalog, keys):
+        self.catalog = catalog
+        self.keys = {}
+        for key, name in keys.items():
+            self.bind(key, name)
+
+    def bind(self, key, name):
+        """Insert the named template when ``key`` is pressed."""
+        key = str(key).lower()
+        if len(key) != 1 or key in RESERVED_KEYS:
+            logger.warning(f"Key '{key}' cannot insert templates")
+        elif name not in self.catalog:
+            logger.warning(f"No template named '{name}' for key '{key}'")
+        else:
+            self.keys[key] = name
+
+    def __getitem__(self, key):
+        try:
+            return self.catalog[self.keys[key]]
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load template '{self.keys[key]}': {e}")
+            raise KeyError(key) from e
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
@@ -0,0 +1,38 @@
+# Snake Pencil V1.2
+# Varints and length-prefixed text shared by the session log and project formats.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+
+def write_varint(file, value):
+    """Write an unsigned integer in 7-bit groups, low bits first."""
+    data = bytearray()
+    while value >= 0x80:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+    data.append(value)
+    file.write(data)
+
+
+def read_varint(file):
+    """Read an integer written by write_varint; raises EOFError if the file ends inside it."""
+    value = shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            raise EOFError(f"truncated file: {getattr(file, 'name', 'stream')}")
+        value |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return value
+        shift += 7
+
+
+def write_text(file, text):
+    """Write a string as its UTF-8 length and bytes."""
+    data = text.encode('utf-8')
+    write_varint(file, len(data))
+    file.write(data)
+
+
+def read_text(file):
+    """Read a string written by write_text."""
+    return file.read(read_varint(file)).decode('utf-8')
@@ -0,0 +1,1052 @@
+# Snake Pencil V1.2
+# Headless drawing engine: position, paths, templates, patterns and symmetry.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import math  # For template shapes
+import random  # For random movement
+from array import array
+from bisect import bisect_right
+from collections import deque
+
+try:
+    import numpy  # Optional: vectorized template placement
+except ImportError:
+    numpy = None
+
+from snake_paths import PathBuffer, PathHistory, PathPiece, PathRange, rdp_simplify
+from snake_patterns import STEP, get_pattern  # Registry of automatic movement patterns
+from snake_grid import ERASED, SegmentGrid, box_interval, erase_interval, split_visible, visible_spans  # Spatial index
+from snake_symmetry import (DEFAULT_FOLDS, DEFAULT_SYMMETRY, TransformedPath, copy_matrix,  # Mirrored copies
+                            get_contrasting_color, symmetry_copies, transform_point)
+
+# Maximum number of floats kept per path (x, y pairs) when history mode is off
+PATH_MAXLEN = 5000
+# Floats per path kept in RAM in history mode; older ones spill to a stroke file
+HISTORY_WORKING_SET = 1 << 16
+# Distance kept between the snake and the edges of the drawing area
+SNAKE_SIZE = 10
+# Simulation ticks per second; speeds and pattern steps are tuned for this rate
+REFERENCE_TICK_RATE = 60
+# Most ticks run for one frame before falling behind real time
+MAX_CATCH_UP_STEPS = 5
+# Undo steps remembered; the oldest are forgotten first
+UNDO_LIMIT = 1000
+# Relative cross product below which consecutive steps count as one straight segment
+COLLINEAR_TOLERANCE = 1e-6
+# Floats per pass when a restored path is indexed in its grid
+RESTORE_CHUNK = 1 << 18
+# Points an open stroke collects before they are decimated, so RDP never runs over a whole stroke at once
+SIMPLIFY_WINDOW = 256
+
+
+def _forget_runs(runs, path):
+    """Drop color runs a bounded path has dropped entirely, oldest first.
+
+    A run ends where the next one starts, so it is gone only once the
+    next one starts strictly inside the dropped floats.
+    """
+    while len(runs) > 1 and runs[1][0] < path.dropped:
+        runs.pop(0)
+
+
+# Template Generation Functions
+def generate_heart():
+    """Generate a simple heart shape as a list of relative (dx, dy) tuples."""
+    return [
+        (0, 0), (10, 20), (20, 0), (30, 20), (40, 0), (50, 20), (60, 0),
+        (50, -20), (40, 0), (30, -20), (20, 0), (10, -20), (0, 0)
+    ]
+
+
+def generate_cube():
+    """Generate a simple cube shape as a list of relative (dx, dy) tuples."""
+    return [
+        (0, 0), (0, 50), (50, 50), (50, 0), (0, 0),
+        (25, 25), (25, 75), (75, 75), (75, 25), (25, 25)
+    ]
+
+
+def generate_smiley():
+    """Generate a simple smiley face as a list of relative (dx, dy) tuples."""
+    points = []
+    # Outer circle
+    for angle in range(0, 360, 30):
+        radians = angle * math.pi / 180
+        x = 50 * math.cos(radians)
+        y = 50 * math.sin(radians)
+        points.append((x, y))
+    return points
+
+
+def generate_star():
+    """Generate a simple 5-pointed star as a list of relative (dx, dy) tuples."""
+    points = []
+    for angle in range(0, 360, 72):
+        radians = angle * math.pi / 180
+        x = 50 * math.cos(radians)
+        y = 50 * math.sin(radians)
+        points.append((x, y))
+        radians = (angle + 36) * math.pi / 180
+        x = 25 * math.cos(radians)
+        y = 25 * math.sin(radians)
+        points.append((x, y))
+    return points
+
+
+def generate_triangle():
+    """Generate a simple equilateral triangle as a list of relative (dx, dy) tuples."""
+    return [
+        (0, 0), (50, 86.6), (100, 0), (0, 0)
+    ]
+
+
+def generate_square():
+    """Generate a simple square as a list of relative (dx, dy) tuples."""
+    return [
+        (0, 0), (0, 50), (50, 50), (50, 0), (0, 0)
+    ]
+
+
+def generate_polygon(sides):
+    """Generate a closed regular polygon as a list of relative (dx, dy) tuples."""
+    points = []
+    for angle in range(0, 360, 360 // sides):
+        radians = angle * math.pi / 180
+        x = 50 * math.cos(radians)
+        y = 50 * math.sin(radians)
+        points.append((x, y))
+    points.append(points[0])  # Close the polygon
+    return points
+
+
+def default_templates():
+    """Return the built-in templates for keys 1-9."""
+    return {
+        '1': generate_heart(),
+        '2': generate_cube(),
+        '3': generate_smiley(),
+        '4': generate_star(),
+        '5': generate_triangle(),
+        '6': generate_square(),
+        '7': generate_polygon(5),  # Pentagon
+        '8': generate_polygon(6),  # Hexagon
+        '9': generate_polygon(8)   # Octagon
+    }
+
+
+def compile_template(shape):
+    """Pack relative (dx, dy) tuples into a flat float array.
+
+    A leading (0, 0) is dropped, since it would only repeat the snake's
+    current position.
+    """
+    if shape and tuple(shape[0]) == (0, 0):
+        shape = shape[1:]
+    return array('d', [value for point in shape for value in point])
+
+
+# Built-in templates, compiled once and shared by every engine
+TEMPLATES = {key: compile_template(shape) for key, shape in default_templates().items()}
+
+
+def place_template(shape, base_x, base_y, width, height, margin=SNAKE_SIZE):
+    """Translate a compiled template to (base_x, base_y) in one batch.
+
+    Returns a flat float32 array of the points clamped to the drawing area.
+    """
+    if numpy is not None:
+        points = numpy.frombuffer(shape, dtype=numpy.float64).reshape(-1, 2) + (base_x, base_y)
+        points = numpy.clip(points, margin, (width - margin, height - margin))
+        return array('f', points.astype(numpy.float32).tobytes())
+
+    points = array('f', bytes(4 * len(shape)))
+    points[0::2] = array('f', [max(margin, min(base_x + dx, width - margin)) for dx in shape[0::2]])
+    points[1::2] = array('f', [max(margin, min(base_y + dy, height - margin)) for dy in shape[1::2]])
+    return points
+
+
+class FixedTimestep:
+    """Accumulate frame time and hand it out as whole fixed-length ticks.
+
+    ``advance`` returns how many ticks to run for a frame, capped at
+    ``max_steps`` so a long stall drops time instead of spiralling; ``alpha``
+    is how far the leftover time is into the next tick, for interpolation.
+    """
+
+    def __init__(self, tick_rate=REFERENCE_TICK_RATE, max_steps=MAX_CATCH_UP_STEPS):
+        self.tick_rate = tick_rate
+        self.tick_length = 1 / tick_rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+
+    def advance(self, dt):
+        """Add a frame's dt and return the number of ticks to run."""
+        self.accumulator += dt
+        # The epsilon stops float error turning exactly one tick into none
+        steps = int(self.accumulator / self.tick_length + 1e-9)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            # Drop the time we cannot catch up on, keeping the fraction
+            self.accumulator = self.accumulator % self.tick_length
+        else:
+            self.accumulator = max(self.accumulator - steps * self.tick_length, 0.0)
+        return steps
+
+    @property
+    def alpha(self):
+        """Fraction of a tick left in the accumulator, between 0 and 1."""
+        return min(self.accumulator / self.tick_length, 1.0)
+
+    def reset(self):
+        """Forget accumulated time, e.g. after a pause."""
+        self.accumulator = 0.0
+
+
+class JournalEntry:
+    """One undo step: where each path ended before it, not the points themselves."""
+
+    __slots__ = ('kind', 'lengths', 'position', 'removed', 'redo_position', 'colors', 'runs', 'erased',
+                 'simplified')
+
+    def __init__(self, kind, lengths=None, position=None, colors=None):
+        self.kind = kind  # 'stroke', 'auto', 'template', 'color' or 'erase'
+        self.lengths = lengths  # Path name -> total floats appended before the step
+        self.position = position  # Snake position before the step
+        self.colors = colors  # (old, new) for color changes
+        self.runs = None  # The snake's color runs before a color change
+        self.erased = None  # Path name -> {segment id: erased intervals before the step} for erasing
+        self.simplified = {}  # Path name -> total floats already decimated while the stroke was drawn
+        # Filled in by undo so the step can be redone (erased intervals after an erase step)
+        self.removed = None
+        self.redo_position = None
+
+
+class UndoJournal:
+    """Undo and redo stacks of JournalEntry steps.
+
+    A step only records path lengths, so undoing truncates the paths in
+    place; the removed floats are kept on the entry just long enough to redo.
+    Consecutive moves of one stroke (or one automatic run) share an entry
+    until ``close`` is called.
+    """
+
+    COALESCED = ('stroke', 'auto')
+
+    def __init__(self, limit=UNDO_LIMIT):
+        self.done = deque(maxlen=limit)
+        self.undone = []
+        self.open = None  # Entry still being extended by the current stroke
+
+    def begin(self, kind, paths, position):
+        """Record the state before a step, or keep extending the open entry.
+
+        Returns True when a new entry was started.
+        """
+        if self.open is not None and self.open.kind == kind:
+            return False
+        lengths = {name: len(path) + path.dropped for name, path in paths.items()}
+        entry = JournalEntry(kind, lengths, tuple(position))
+        self.done.append(entry)
+        self.undone.clear()  # A new step forgets anything that could be redone
+        self.open = entry if kind in self.COALESCED else None
+        return True
+
+    def record_color(self, old, new, runs):
+        """Record a color change and the color runs it is made over."""
+        entry = JournalEntry('color', colors=(tuple(old), tuple(new)))
+        entry.runs = list(runs)
+        self.done.append(entry)
+        self.undone.clear()
+        self.open = None
+
+    def close(self):
+        """End the open stroke so the next move starts a new step."""
+        self.open = None
+
+    def reset(self):
+        """Forget every step, e.g. after the drawing was cleared."""
+        self.done.clear()
+        self.undone.clear()
+        self.open = None
+
+
+class EngineListener:
+    """Receives path changes from a SnakeEngine; override what you need."""
+
+    def path_extended(self, name, points):
+        """Called after flat (x, y) floats were appended to the named path."""
+
+    def stroke_started(self, name, color):
+        """Called when the named path starts a stroke in a new color at its last point."""
+
+    def stroke_removed(self, name):
+        """Called when the named path's newest color stroke was removed by an undo."""
+
+    def path_point_moved(self, name, x, y):
+        """Called after the last point of the named path was moved to (x, y)."""
+
+    def path_truncated(self, name, count):
+        """Called after the last ``count`` floats were removed from the named path."""
+
+    def color_changed(self, color):
+        """Called after the snake's color changed."""
+
+    def paths_cleared(self):
+        """Called after the drawing was cleared, or replaced as a whole by ``restore``."""
+
+    def snake_crashed(self, x, y):
+        """Called when a move in game mode would cross the snake's trail at (x, y)."""
+
+    def segments_erased(self, name, erased):
+        """Called after the eraser changed segments of the named path.
+
+        ``erased`` maps segment ids to their erased (t0, t1) intervals now,
+        or None for segments that are whole again.
+        """
+
+    def symmetry_changed(self, mode, folds):
+        """Called after the symmetry mode or its number of folds changed."""
+
+
+class SnakeEngine:
+    """Pure-Python drawing state that can be stepped without a window.
+
+    Paths are kept by name in ``paths`` ('snake' and 'auto'); views
+    subscribe with ``add_listener`` to mirror changes on screen.
+    ``step`` runs one fixed tick; ``advance`` turns frame time into ticks.
+    Strokes, templates and color changes can be undone and redone.
+
+    ``history_mode`` keeps every point, spilling old ones to a stroke file
+    (see PathHistory). It is off by default, so headless engines keep the
+    last PATH_MAXLEN floats of each path in RAM; the pad turns it on.
+
+    Straight runs are stored as one segment whose end slides forward, and
+    ``simplify_tolerance`` > 0 also decimates strokes with RDP, a window of
+    SIMPLIFY_WINDOW points at a time while they are drawn and the rest when
+    they finish, so no tick pays for a whole long stroke.
+
+    Every color change starts a new stroke: ``color_runs`` keeps, per path,
+    the float offset where each stroke begins and its color.
+
+    ``grids`` holds a SegmentGrid per indexed path (the snake's and the
+    automatic one), kept in step with every change, for collisions and
+    region queries. In ``game_mode`` a move that would cross the trail
+    crashes the snake.
+
+    ``erase`` cuts parts of segments out rather than removing points:
+    ``erased`` maps, per path, segment ids to their erased intervals.
+
+    ``symmetry`` names how the drawing is repeated (see snake_symmetry):
+    the paths are stored once and views draw every copy with transforms,
+    so more copies cost no memory and no work per tick.
+    """
+
+    def __init__(self, width, height, history_mode=False, seed=None,
+                 tick_rate=REFERENCE_TICK_RATE, max_catch_up=MAX_CATCH_UP_STEPS, color=(0, 1, 0)):
+        self.width = width
+        self.height = height
+        self.history_mode = history_mode
+        self.snake_speed = 5  # Pixels per 1/60 s, scaled to the tick rate
+        self.fast_speed = 10
+        self.timestep = FixedTimestep(tick_rate, max_catch_up)
+        # Per-tick movement and pattern progress scale so wall-clock speed is the same at any tick rate
+        self.step_scale = REFERENCE_TICK_RATE / tick_rate
+        self.tick_count = 0
+        self.automatic_mode = False
+        self._selected_pattern = 'circle'  # Default movement pattern
+        self.pattern_tick = 0  # Ticks into the selected pattern
+        self._pattern_stream = None  # Batched points of the selected pattern
+        self._pattern_key = None  # (pattern, radius) the stream was built for
+        self.current_color = tuple(color)  # Snake color
+        self.auto_color = (1, 1, 1)  # Automatic patterns are drawn in white
+        self.templates = dict(TEMPLATES)  # Compiled shapes are shared; the dict is per engine
+        self.random = random.Random(seed)  # Own generator so runs can be seeded
+        self.listeners = []
+        self.journal = UndoJournal()
+        self.profiler = None  # FrameProfiler timing the phases of each tick, when enabled
+        self.merge_collinear = True  # Extend the last segment while the direction holds
+        self.simplify_tolerance = 0  # RDP tolerance in pixels for finished strokes, 0 for off
+        self._runs = {}  # Path name -> (anchor, last point) of the straight run being extended
+        self.game_mode = False  # Classic Snake: crossing the trail ends the run
+        self.crashed = False  # Set by a crash in game mode; moves are ignored until a clear
+        self._erasing = None  # Journal entry of the erase stroke in progress
+        self.symmetry = DEFAULT_SYMMETRY  # Copies the drawing is shown in; see set_symmetry
+        self.symmetry_folds = DEFAULT_FOLDS
+
+        # Initial position at the center of the drawing area
+        self.snake_pos = [width // 2, height // 2]
+        self.paths = {
+            'snake': self.new_path(self.snake_pos),
+            'auto': self.new_path()  # For automatic patterns
+        }
+        # Path name -> segment index of that path's trail
+        self.grids = {'snake': SegmentGrid(), 'auto': SegmentGrid()}
+        for name, grid in self.grids.items():
+            grid.extend(self.paths[name].view())
+        self.erased = self._new_erased()
+        # Path name -> [(start offset, rgb)], one entry per stroke, oldest first
+        self.color_runs = {name: [(0, color)] for name, color in self.stroke_colors().items()}
+
+        # Initialize pattern variables for movement patterns
+        self.pattern_radius = 100  # Size of the automatic patterns
+        self.center_x = self.snake_pos[0]
+        self.center_y = self.snake_pos[1]
+
+        # Newest drawn point and the one before this tick, for render interpolation
+        self.head = tuple(self.snake_pos)
+        self.previous_head = self.head
+
+    @property
+    def selected_pattern(self):
+        return self._selected_pattern
+
+    @selected_pattern.setter
+    def selected_pattern(self, name):
+        """Switch automatic patterns; a new pattern starts from its beginning."""
+        if name != self._selected_pattern:
+            self._selected_pattern = name
+            self.pattern_tick = 0
+
+    @property
+    def pattern_angle(self):
+        """The selected pattern's curve parameter, in radians."""
+        return self.pattern_tick * STEP * self.step_scale
+
+    @pattern_angle.setter
+    def pattern_angle(self, angle):
+        self.pattern_tick = round(angle / (STEP * self.step_scale))
+
+    @property
+    def snake_path(self):
+        return self.paths['snake']
+
+    @property
+    def auto_path(self):
+        return self.paths['auto']
+
+    def new_path(self, points=()):
+        """Create a path buffer: unbounded with disk spill in history mode, else capped."""
+        if self.history_mode:
+            return PathHistory(points, working_set=HISTORY_WORKING_SET)
+        return PathBuffer(points, maxlen=PATH_MAXLEN)
+
+    def stroke_colors(self):
+        """Return the color new points of each path are drawn in."""
+        return {
+            'snake': tuple(self.current_color),
+            'auto': tuple(self.auto_color)
+        }
+
+    def iter_runs(self, name):
+        """Yield (rgb, PathRange) for each stroke of a path, including the current one."""
+        path = self.paths[name]
+        runs = self.color_runs[name]
+        for i, (start, color) in enumerate(runs):
+            # A stroke ends at the point the next one starts from
+            stop = runs[i + 1][0] + 2 if i + 1 < len(runs) else None
+            # Offsets count every float ever appended; bounded paths lose their oldest
+            start = max(start - path.dropped, 0)
+            if stop is not None:
+                stop = max(stop - path.dropped, 0)
+            yield color, PathRange(path, start, stop)
+
+    def iter_strokes(self):
+        """Yield (rgb, points) for every stroke with at least one segment, in drawing order.
+
+        Strokes the eraser cut into are yielded as their visible pieces.
+        """
+        for name in self.paths:
+            erased = self.erased[name]
+            for color, points in self.iter_runs(name):
+                if len(points) < 4:
+                    continue
+                if not erased:
+                    yield color, points
+                    continue
+                for piece in self._visible_pieces(name, points):
+                    yield color, piece
+
+    def iter_drawing(self):
+        """Yield (rgb, points) for every stroke of every symmetry copy, as they are shown.
+
+        Copies transform the stored points as they are read, for exporters;
+        flipped copies are in the strokes' contrasting colors.
+        """
+        cx, cy = self.symmetry_center()
+        yield from self.iter_strokes()
+        for angle, flipped in self.symmetry_copies()[1:]:
+            matrix = copy_matrix(angle, flipped, cx, cy)
+            for color, points in self.iter_strokes():
+                yield get_contrasting_color(color) if flipped else color, TransformedPath(points, matrix)
+
+    def _visible_pieces(self, name, points):
+        """Return the parts of a stroke's PathRange left by the eraser, as PathPieces."""
+        path = points.path
+        closed, (head, start) = visible_spans(points.view(), self.erased[name], (points.start + path.dropped) // 2)
+        pieces = [PathPiece([head, PathRange(path, points.start + 2 * first, points.start + 2 * end), tail])
+                  for head, first, end, tail in closed]
+        piece = PathPiece([head, PathRange(path, points.start + 2 * start, points.stop)])
+        if len(piece) >= 4:
+            pieces.append(piece)
+        return pieces
+
+    def add_listener(self, listener):
+        """Subscribe an EngineListener to path changes."""
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unsubscribe a listener added with add_listener."""
+        self.listeners.remove(listener)
+
+    def _extend(self, name, points):
+        """Append flat (x, y) floats to a path and notify the listeners."""
+        profiler = self.profiler
+        start = profiler and profiler.clock()
+        path = self.paths[name]
+        path.extend(points)
+        grid = self.grids.get(name)
+        if grid is not None:
+            grid.extend(points)
+            if path.dropped:
+                grid.forget(path.dropped // 2)
+        if profiler:
+            start = profiler.lap('append', start)
+        for listener in self.listeners:
+            listener.path_extended(name, points)
+        if profiler:
+            profiler.lap('upload', start)
+
+    def _begin(self, kind):
+        """Journal the start of a step; a new step never merges into points from an older one."""
+        if self.journal.begin(kind, self.paths, self.snake_pos):
+            self._runs.clear()
+
+    def _append_point(self, name, x, y):
+        """Append a point, or slide the last one forward while the path keeps its direction."""
+        run = self._runs.get(name)
+        if run is None:
+            anchor = self.paths[name].last_point()
+        else:
+            (ax, ay), (lx, ly) = run
+            dx0, dy0, dx1, dy1 = lx - ax, ly - ay, x - lx, y - ly
+            # Same direction: no turn (cross product) and no reversal (dot product)
+            if (dx0 * dx1 + dy0 * dy1 > 0 and abs(dx0 * dy1 - dy0 * dx1) <=
+                    COLLINEAR_TOLERANCE * (dx0 * dx0 + dy0 * dy0 + dx1 * dx1 + dy1 * dy1)):
+                profiler = self.profiler
+                start = profiler and profiler.clock()
+                self.paths[name].replace_last(x, y)
+                grid = self.grids.get(name)
+                if grid is not None:
+                    grid.replace_last(x, y)
+                self._runs[name] = (run[0], (x, y))
+                if profiler:
+                    start = profiler.lap('append', start)
+                for listener in self.listeners:
+                    listener.path_point_moved(name, x, y)
+                if profiler:
+                    profiler.lap('upload', start)
+                return
+            anchor = (lx, ly)
+        if self.merge_collinear and anchor is not None:
+            self._runs[name] = (anchor, (x, y))
+        self._extend(name, [x, y])
+        if self.simplify_tolerance > 0:
+            self._simplify_window(name)
+
+    def _simplify_window(self, name):
+        """Decimate the open stroke's newest points once a window of them has built up."""
+        entry = self.journal.open
+        if entry is None:
+            return
+        path = self.paths[name]
+        start = entry.simplified.get(name, entry.lengths[name])
+        if len(path) + path.dropped - start < 2 * SIMPLIFY_WINDOW:
+            return
+        self._simplify_since(name, start)
+        # The window's last point is the next one's fixed end; a run anchored before it may be gone
+        entry.simplified[name] = len(path) + path.dropped
+        self._runs.pop(name, None)
+
+    def _simplify_since(self, name, length):
+        """Replace the floats appended after ``length`` with their RDP decimation."""
+        path = self.paths[name]
+        start = max(length - path.dropped, 0)
+        # Include the point before the stroke as a fixed end so the join stays put
+        anchor = 2 if start >= 2 else 0
+        points = path.view(start - anchor)
+        if len(points) - anchor < 6:
+            return
+        simplified = rdp_simplify(points, self.simplify_tolerance)
+        if len(simplified) < len(points):
+            self._truncate(name, len(points) - anchor)
+            self._extend(name, simplified[anchor:])
+
+    def _truncate(self, name, count):
+        """Remove the last floats of a path, notify the listeners and return them."""
+        path = self.paths[name]
+        removed = path.pop_tail(count)
+        if removed:
+            grid = self.grids.get(name)
+            if grid is not None:
+                grid.pop(len(removed) // 2, path.last_point())
+                # Removed segments take their erased parts with them
+                erased = self.erased[name]
+                if erased:
+                    for segment_id in range(grid.end, grid.end + len(removed) // 2):
+                        erased.pop(segment_id, None)
+            for listener in self.listeners:
+                listener.path_truncated(name, len(removed))
+        return removed
+
+    def set_color(self, color):
+        """Change the snake's color as an undoable step."""
+        color = tuple(color)
+        if color == tuple(self.current_color):
+            return
+        self.end_stroke()
+        self.journal.record_color(self.current_color, color, self.color_runs['snake'])
+        self._apply_color(color)
+        self._start_strokes()
+
+    def _apply_color(self, color):
+        """Set the color and notify the listeners, without journaling."""
+        self.current_color = color
+        for listener in self.listeners:
+            listener.color_changed(color)
+
+    def _start_strokes(self):
+        """Start a new snake stroke in the current color."""
+        color = self.stroke_colors()['snake']
+        path = self.paths['snake']
+        runs = self.color_runs['snake']
+        # The new stroke begins at the last point so the line stays joined
+        runs.append((max(len(path) + path.dropped - 2, 0), color))
+        _forget_runs(runs, path)
+        for listener in self.listeners:
+            listener.stroke_started('snake', color)
+
+    def _remove_strokes(self, runs):
+        """Put back the snake's color runs from before a color change, dropping its stroke."""
+        runs = list(runs)
+        _forget_runs(runs, self.paths['snake'])
+        self.color_runs['snake'] = runs
+        for listener in self.listeners:
+            listener.stroke_removed('snake')
+
+    # Undo and Redo
+    def end_stroke(self):
+        """Finish the current stroke so the next move is undone separately.
+
+        The next move starts a new segment, and with a tolerance set the
+        points of the finished stroke not yet decimated while it was drawn
+        are decimated now that it cannot grow any more.
+        """
+        entry = self.journal.open
+        self.journal.close()
+        self._runs.clear()
+        if entry is not None and self.simplify_tolerance > 0:
+            for name, length in entry.lengths.items():
+                self._simplify_since(name, entry.simplified.get(name, length))
+
+    def undo(self):
+        """Undo the newest step; return False when there is nothing to undo."""
+        journal = self.journal
+        self.end_stroke()
+        if not journal.done:
+            return False
+        entry = journal.done.pop()
+        if entry.kind == 'color':
+            self._remove_strokes(entry.runs)
+            self._apply_color(entry.colors[0])
+        elif entry.kind == 'erase':
+            entry.removed = {name: {segment_id: self.erased[name].get(segment_id) for segment_id in before}
+                             for name, before in entry.erased.items()}
+            self._set_erased(entry.erased)
+        else:
+            # Only the floats added since the step began are touched
+            entry.removed = {}
+            for name, length in entry.lengths.items():
+                path = self.paths[name]
+                entry.removed[name] = self._truncate(name, len(path) + path.dropped - length)
+            entry.redo_position = tuple(self.snake_pos)
+            self._move_head(entry.position)
+        journal.undone.append(entry)
+        return True
+
+    def redo(self):
+        """Redo the newest undone step; return False when there is nothing to redo."""
+        journal = self.journal
+        self.end_stroke()
+        if not journal.undone:
+            return False
+        entry = journal.undone.pop()
+        if entry.kind == 'color':
+            self._apply_color(entry.colors[1])
+            self._start_strokes()
+        elif entry.kind == 'erase':
+            self._set_erased(entry.removed)
+            entry.removed = None
+        else:
+            for name, removed in entry.removed.items():
+                if removed:
+                    self._extend(name, removed)
+            entry.removed = None
+            self._move_head(entry.redo_position)
+        journal.done.append(entry)
+        return True
+
+    def _move_head(self, position):
+        """Put the snake at a position without drawing."""
+        self.snake_pos = list(position)
+        self.head = self.previous_head = tuple(position)
+
+    def resize(self, width, height):
+        """Change the drawing area used for clamping and symmetry."""
+        self.width = width
+        self.height = height
+
+    # Geometry
+    def clamp(self, x, y, margin=SNAKE_SIZE):
+        """Clamp a point within the drawing area, keeping a margin from the edges."""
+        x = max(margin, min(x, self.width - margin))
+        y = max(margin, min(y, self.height - margin))
+        return x, y
+
+    # Symmetry
+    def set_symmetry(self, mode, folds=None):
+        """Show the drawing in a mode's copies (see snake_symmetry.SYMMETRY_MODES)."""
+        folds = self.symmetry_folds if folds is None else max(1, int(folds))
+        symmetry_copies(mode, folds)  # Raises ValueError for unknown modes
+        if (mode, folds) == (self.symmetry, self.symmetry_folds):
+            return
+        self.symmetry = mode
+        self.symmetry_folds = folds
+        for listener in self.listeners:
+            listener.symmetry_changed(mode, folds)
+
+    def symmetry_copies(self):
+        """Return (angle in degrees, flipped) for every copy shown, the drawing itself first."""
+        return symmetry_copies(self.symmetry, self.symmetry_folds)
+
+    def symmetry_center(self):
+        return self.width / 2, self.height / 2
+
+    def symmetry_matrices(self):
+        """Return every copy's affine matrix about the center of the drawing area."""
+        cx, cy = self.symmetry_center()
+        return [copy_matrix(angle, flipped, cx, cy) for angle, flipped in self.symmetry_copies()]
+
+    def symmetric_points(self, x, y):
+        """Return a point and its images in every copy, the point itself first."""
+        return [transform_point(matrix, x, y) for matrix in self.symmetry_matrices()]
+
+    # Stepping
+    def resolve_move(self, key_pressed, fast_mode):
+        """Turn the held movement keys into a (move_x, move_y) step."""
+        move_x, move_y = 0, 0
+        speed = (self.fast_speed if fast_mode else self.snake_speed) * self.step_scale
+
+        # Diagonal movements using 'q' and 'e'
+        if key_pressed.get('w') and key_pressed.get('q'):
+            move_x, move_y = -speed, speed  # Up-Left
+        elif key_pressed.get('w') and key_pressed.get('e'):
+            move_x, move_y = speed, speed   # Up-Right
+        elif key_pressed.get('s') and key_pressed.get('q'):
+            move_x, move_y = -speed, -speed # Down-Left
+        elif key_pressed.get('s') and key_pressed.get('e'):
+            move_x, move_y = speed, -speed  # Down-Right
+        # Cardinal directions
+        elif key_pressed.get('w'):
+            move_y = speed    # Move Up
+        elif key_pressed.get('s'):
+            move_y = -speed   # Move Down
+        elif key_pressed.get('a'):
+            move_x = -speed   # Move Left
+        elif key_pressed.get('d'):
+            move_x = speed    # Move Right
+        return move_x, move_y
+
+    def advance(self, dt, key_pressed, fast_mode=False):
+        """Run as many fixed ticks as the frame time dt covers; return the count."""
+        steps = self.timestep.advance(dt)
+        for _ in range(steps):
+            self.step(key_pressed, fast_mode)
+        return steps
+
+    def interpolated_head(self, alpha=None):
+        """Return the head position blended between the last two ticks."""
+        if alpha is None:
+            alpha = self.timestep.alpha
+        (x0, y0), (x1, y1) = self.previous_head, self.head
+        return x0 + (x1 - x0) * alpha, y0 + (y1 - y0) * alpha
+
+    def is_idle(self, key_pressed):
+        """Return True when a tick would draw nothing: auto mode off and no movement keys held."""
+        return not self.automatic_mode and self.resolve_move(key_pressed, False) == (0, 0)
+
+    def step(self, key_pressed, fast_mode=False):
+        """Run one fixed tick, automatically or from the held keys."""
+        dt = self.timestep.tick_length
+        self.tick_count += 1
+        self.previous_head = self.head
+        if self.automatic_mode:
+            self.auto_step(dt)
+            return
+
+        profiler = self.profiler
+        start = profiler and profiler.clock()
+        move_x, move_y = self.resolve_move(key_pressed, fast_mode)
+        if profiler:
+            profiler.lap('input', start)
+        # Move the snake only if there's input
+        if move_x != 0 or move_y != 0:
+            self.move_snake(move_x, move_y)
+        else:
+            self.end_stroke()
+
+    def auto_step(self, dt=0):
+        """Add the next point of the selected automatic pattern."""
+        profiler = self.profiler
+        start = profiler and profiler.clock()
+        # Patterns are evaluated ahead in batches, so a tick is a lookup
+        key = (self._selected_pattern, self.pattern_radius)
+        if key != self._pattern_key:
+            self._pattern_stream = get_pattern(self._selected_pattern).stream(self)
+            self._pattern_key = key
+        self.pattern_tick += 1
+        rel_x, rel_y = self._pattern_stream.point(self.pattern_tick)
+        if profiler:
+            profiler.lap('pattern', start)
+
+        # Compute absolute positions based on snake_pos
+        new_x = self.snake_pos[0] + rel_x
+        new_y = self.snake_pos[1] + rel_y
+        self.head = (new_x, new_y)
+        self._begin('auto')
+        self._append_point('auto', new_x, new_y)
+
+    def move_snake(self, move_x, move_y):
+        """Move the snake by (move_x, move_y), clamped to the drawing area."""
+        new_x, new_y = self.clamp(self.snake_pos[0] + move_x, self.snake_pos[1] + move_y)
+        if [new_x, new_y] == self.snake_pos:
+            return  # Pinned against an edge; nothing new to draw
+        if self.game_mode:
+            if self.crashed:
+                return
+            if self.grids['snake'].crosses(self.snake_pos[0], self.snake_pos[1], new_x, new_y):
+                self.crashed = True
+                for listener in self.listeners:
+                    listener.snake_crashed(new_x, new_y)
+                return
+
+        # Update the snake's position
+        self._begin('stroke')
+        self.snake_pos = [new_x, new_y]
+        self.head = (new_x, new_y)
+        self._append_point('snake', new_x, new_y)
+
+    # Erasing
+    def _new_erased(self):
+        """Return empty erased-segment maps, one per path."""
+        return {name: {} for name in self.paths}
+
+    def erase(self, x, y, radius):
+        """Erase every trail in the square brush reaching ``radius`` from (x, y) along
+        each axis; return True if anything changed.
+
+        Segments under the brush are cut rather than removed, so no points
+        move and only the segments found in the grids are touched. Calls
+        until ``end_erase`` are undone as one step. The brush is repeated in
+        every symmetry copy, so what each copy shows under it is erased
+        too; the square matches what a clipped clear of the screen removes.
+        """
+        journal = self.journal
+        entry = self._erasing
+        if entry is None or not journal.done or journal.done[-1] is not entry:
+            # Finish the current stroke first: simplifying it would renumber its segments
+            self.end_stroke()
+            entry = None
+        changed = {}
+        # The copies' inverses are copies too, so the brush's images find what they show under it
+        brushes = [(cx - radius, cy - radius, cx + radius, cy + radius) for cx, cy in self.symmetric_points(x, y)]
+        for name, grid in self.grids.items():
+            erased = self.erased[name]
+            for brush in brushes:
+                for segment_id in grid.query_bounds(*brush):
+                    before = erased.get(segment_id)
+                    if before == ERASED:
+                        continue
+                    interval = box_interval(*brush, *grid.segment(segment_id))
+                    if interval is None:
+                        continue
+                    after = erase_interval(before, *interval)
+                    if after != before:
+                        changed.setdefault(name, {}).setdefault(segment_id, before)
+                        erased[segment_id] = after
+        if not changed:
+            return False
+
+        if entry is None:
+            self._begin('erase')
+            entry = self._erasing = journal.done[-1]
+            entry.erased = {}
+            self._forget_erased()
+        for name, before in changed.items():
+            recorded = entry.erased.setdefault(name, {})
+            for segment_id, intervals in before.items():
+                recorded.setdefault(segment_id, intervals)
+        # The next point starts a new segment instead of sliding an erased one
+        self._runs.clear()
+        self._notify_erased({name: {segment_id: self.erased[name][segment_id] for segment_id in before}
+                             for name, before in changed.items()})
+        return True
+
+    def end_erase(self):
+        """Finish the erase stroke so the next erase is undone separately."""
+        self._erasing = None
+
+    def _set_erased(self, values):
+        """Apply {name: {segment id: intervals or None}} and notify the listeners."""
+        for name, segments in values.items():
+            erased = self.erased[name]
+            for segment_id, intervals in segments.items():
+                if intervals:
+                    erased[segment_id] = intervals
+                else:
+                    erased.pop(segment_id, None)
+        self._notify_erased(values)
+
+    def _notify_erased(self, values):
+        for name, segments in values.items():
+            for listener in self.listeners:
+                listener.segments_erased(name, segments)
+
+    def _forget_erased(self):
+        """Drop erased intervals of segments a bounded path has dropped."""
+        for name, grid in self.grids.items():
+            erased = self.erased[name]
+            for segment_id in [segment_id for segment_id in erased if segment_id < grid.first]:
+                del erased[segment_id]
+
+    def segments_in(self, name, x0, y0, x1, y1):
+        """Return the ids of a path's segments whose bounds overlap a rectangle, e.g. to redraw it."""
+        return self.grids[name].query_bounds(x0, y0, x1, y1)
+
+    def segment_bounds(self, name, ids):
+        """Return the (x0, y0, x1, y1) bounding box of some of a path's segments."""
+        path = self.paths[name]
+        xs, ys = [], []
+        for segment_id in ids:
+            start = 2 * segment_id - path.dropped
+            if 0 <= start <= len(path) - 4:
+                points = path.view(start, start + 4)
+                xs += (points[0], points[2])
+                ys += (points[1], points[3])
+        if not xs:
+            return None
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def visible_segments(self, name, ids):
+        """Return (rgb, flat floats) for what the eraser left of some of a path's segments.
+
+        Consecutive ids of one stroke are joined into one polyline first.
+        """
+        path = self.paths[name]
+        starts = [start // 2 for start, color in self.color_runs[name]]
+        colors = [color for start, color in self.color_runs[name]]
+        first_id = path.dropped // 2
+        end_id = first_id + len(path) // 2 - 1
+        pieces = []
+        ids = sorted(segment_id for segment_id in ids if first_id <= segment_id < end_id)
+        i = 0
+        while i < len(ids):
+            run = bisect_right(starts, ids[i]) - 1
+            stop = starts[run + 1] if run + 1 < len(starts) else None
+            j = i + 1
+            while j < len(ids) and ids[j] == ids[j - 1] + 1 and (stop is None or ids[j] < stop):
+                j += 1
+            points = path.view(2 * (ids[i] - first_id), 2 * (ids[j - 1] - first_id) + 4)
+            for piece in split_visible(points, self.erased[name], ids[i]):
+                pieces.append((colors[run], piece))
+            i = j
+        return pieces
+
+    def add_template(self, key_char):
+        """Add a predefined template at the snake's position; return False if unknown."""
+        shape = self.templates.get(key_char)
+        if not shape:
+            return False
+        self.end_stroke()
+
+        # Translate and clamp the whole shape at once
+        new_points = place_template(shape, self.snake_pos[0], self.snake_pos[1], self.width, self.height)
+        self._begin('template')
+        self._extend('snake', new_points)
+
+        # Update snake_pos to the last point of the template
+        self.snake_pos = [new_points[-2], new_points[-1]]
+        self.head = self.previous_head = tuple(self.snake_pos)
+        return True
+
+    def clear(self):
+        """Clear every path and reset the snake's position to the center.
+
+        Clearing cannot be undone, so the journal is emptied as well.
+        """
+        for path in self.paths.values():
+            path.clear()
+        self.journal.reset()
+        self._runs.clear()
+        self.crashed = False
+        self.erased = self._new_erased()
+        self._erasing = None
+        self.color_runs = {name: [(0, color)] for name, color in self.stroke_colors().items()}
+        self.snake_pos = [self.width // 2, self.height // 2]
+        self.head = self.previous_head = tuple(self.snake_pos)
+        self.paths['snake'].extend(self.snake_pos)
+        for name, grid in self.grids.items():
+            grid.clear()
+            grid.extend(self.paths[name].view())
+        for listener in self.listeners:
+            listener.paths_cleared()
+
+    def restore(self, paths, position, color=None):
+        """Replace the drawing with saved paths, e.g. from a project file.
+
+        ``paths`` yields (name, color runs, erased, chunks) per path, with
+        run offsets and segment ids counted from the path's first saved
+        point and ``chunks`` an iterable of flat float arrays, read in
+        order so a file can be streamed straight into the paths. Like
+        ``clear`` this cannot be undone, so the journal is emptied.
+        """
+        for path in self.paths.values():
+            path.clear()
+        for grid in self.grids.values():
+            grid.clear()
+        self.journal.reset()
+        self._runs.clear()
+        self.crashed = False
+        self.erased = self._new_erased()
+        self._erasing = None
+        if color is not None:
+            self._apply_color(tuple(color))
+        self.color_runs = {name: [(0, color)] for name, color in self.stroke_colors().items()}
+        for name, runs, erased, chunks in paths:
+            path = self.paths[name]
+            for chunk in chunks:
+                path.extend(chunk)
+            grid = self.grids.get(name)
+            if grid is not None:
+                # Only the points a bounded path kept are indexed, under their usual ids
+                grid.clear(path.dropped // 2)
+                for chunk in path.iter_chunks(RESTORE_CHUNK):
+                    grid.extend(chunk)
+            # Strokes a bounded path could not keep are forgotten, as when drawing
+            runs = [(start, tuple(color)) for start, color in runs] or self.color_runs[name]
+            _forget_runs(runs, path)
+            self.color_runs[name] = runs
+            self.erased[name] = dict(erased)
+        self._forget_erased()
+        self._move_head(position)
+        for listener in self.listeners:
+            listener.paths_cleared()
@@ -0,0 +1,205 @@
+# Snake Pencil V1.2
+# Image export for drawings, usable without a window.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import struct
+import threading
+import zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+IDAT_SIZE = 1 << 16  # Compressed bytes buffered before an IDAT chunk is written
+VECTOR_CHUNK = 1 << 15  # Floats formatted at a time when streaming vector output
+STROKE_WIDTH = 2  # Kivy Line width of the strokes on screen; Kivy draws it on each side of the path
+
+
+class PngWriter:
+    """Stream RGBA rows into a PNG file, so no more than a band of rows is held at once."""
+
+    def __init__(self, file, width, height, level=6):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.stride = width * 4
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(level)
+        self._pending = []
+        self._pending_size = 0
+        file.write(PNG_SIGNATURE)
+        # 8 bits per channel, color type 6 (RGBA), default compression/filter/interlace
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        """Write one length-prefixed, CRC-checked PNG chunk."""
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(kind))))
+
+    def _queue(self, data):
+        """Buffer compressed bytes and flush them as IDAT chunks."""
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size >= IDAT_SIZE:
+            self._chunk(b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def write_rows(self, pixels):
+        """Append whole rows of RGBA bytes, top row first."""
+        stride = self.stride
+        rows = len(pixels) // stride
+        view = memoryview(pixels)
+        # Each row gets filter type 0 (None) in front of it
+        filtered = b''.join(b'\x00' + view[i * stride:(i + 1) * stride] for i in range(rows))
+        self._queue(self._compressor.compress(filtered))
+        self.rows_written += rows
+
+    def close(self):
+        """Finish the image stream; every row must have been written."""
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG has {self.rows_written} of {self.height} rows")
+        self._pending.append(self._compressor.flush())
+        self._pending_size = IDAT_SIZE
+        self._queue(b'')
+        self._chunk(b'IEND', b'')
+
+
+def save_png(path, width, height, pixels):
+    """Encode top-down RGBA bytes and write them to a PNG file."""
+    with open(path, 'wb') as file:
+        writer = PngWriter(file, width, height)
+        writer.write_rows(pixels)
+        writer.close()
+
+
+def save_png_async(path, width, height, pixels, callback=None):
+    """Encode and write a PNG on a worker thread.
+
+    ``callback(path, error)`` runs on the worker thread once the file is
+    written, with ``error`` set to the exception if saving failed. zlib
+    releases the GIL while compressing, so the caller's thread keeps running.
+    """
+    def run():
+        error = None
+        try:
+            save_png(path, width, height, pixels)
+        except Exception as e:
+            error = e
+        if callback:
+            callback(path, error)
+
+    thread = threading.Thread(target=run, name='snake-png-export')
+    thread.start()
+    return thread
+
+
+def _color_255(color):
+    """Convert a 0-1 RGB tuple to 0-255 integers."""
+    return tuple(int(round(max(0, min(c, 1)) * 255)) for c in color[:3])
+
+
+def export_svg(path, strokes, width, height, scale=1, background=(0, 0, 0), stroke_width=STROKE_WIDTH):
+    """Stream (rgb, path) strokes into an SVG file.
+
+    Coordinates are written as stored and flipped by a group transform, so
+    the file is resolution independent; ``scale`` only sets its nominal size.
+    ``stroke_width`` is a Kivy Line width, so lines are twice as wide.
+    Points are formatted a chunk at a time, keeping memory flat.
+    """
+    with open(path, 'w') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width * scale:g}" '
+                   f'height="{height * scale:g}" viewBox="0 0 {width} {height}">\n')
+        if background is not None:
+            file.write('<rect width="100%%" height="100%%" fill="rgb(%d,%d,%d)"/>\n' % _color_255(background))
+        # The canvas origin is bottom-left; SVG's is top-left
+        file.write(f'<g transform="matrix(1 0 0 -1 0 {height})" fill="none" stroke-width="{2 * stroke_width:g}" '
+                   'stroke-linecap="round" stroke-linejoin="round">\n')
+        for color, points in strokes:
+            file.write('<polyline stroke="rgb(%d,%d,%d)" points="' % _color_255(color))
+            for chunk in points.iter_chunks(VECTOR_CHUNK):
+                file.write(('%.2f,%.2f ' * (len(chunk) // 2)) % tuple(chunk))
+            file.write('"/>\n')
+        file.write('</g>\n</svg>\n')
+
+
+def export_pdf(path, strokes, width, height, scale=1, background=(0, 0, 0), stroke_width=STROKE_WIDTH):
+    """Stream (rgb, path) strokes into a single-page PDF file.
+
+    The page content is deflated as it is written, and its length is stored
+    in a separate object afterwards so nothing has to be buffered. Lines
+    are ``2 * stroke_width`` wide, as on screen.
+    """
+    with open(path, 'wb') as file:
+        offsets = {}
+
+        def begin(number):
+            offsets[number] = file.tell()
+            file.write(b'%d 0 obj\n' % number)
+
+        file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        begin(1)
+        file.write(b'<< /Type /Catalog /Pages 2 0 R >>\nendobj\n')
+        begin(2)
+        file.write(b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n')
+        begin(3)
+        file.write(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %g %g] /Resources << >> '
+                   b'/Contents 4 0 R >>\nendobj\n' % (width * scale, height * scale))
+        begin(4)
+        file.write(b'<< /Length 5 0 R /Filter /FlateDecode >>\nstream\n')
+
+        compressor = zlib.compressobj(1)  # Fast level; the stream is mostly digits
+        length = 0
+
+        def emit(text):
+            nonlocal length
+            data = compressor.compress(text.encode('ascii'))
+            file.write(data)
+            length += len(data)
+
+        # PDF space is bottom-left like the canvas, so only the scale is needed
+        emit(f'{scale:g} 0 0 {scale:g} 0 0 cm\n')
+        if background is not None:
+            emit('%.3f %.3f %.3f rg 0 0 %g %g re f\n' % (tuple(background[:3]) + (width, height)))
+        emit(f'1 J 1 j {2 * stroke_width:g} w\n')
+        for color, points in strokes:
+            emit('%.3f %.3f %.3f RG\n' % tuple(color[:3]))
+            operator = 'm'
+            for chunk in points.iter_chunks(VECTOR_CHUNK):
+                pairs = len(chunk) // 2
+                if operator == 'm':
+                    # The first point moves, every later one draws a line
+                    emit('%.2f %.2f m\n' % (chunk[0], chunk[1]))
+                    chunk = chunk[2:]
+                    pairs -= 1
+                    operator = 'l'
+                emit(('%.2f %.2f l\n' * pairs) % tuple(chunk))
+            emit('S\n')
+        data = compressor.flush()
+        file.write(data)
+        length += len(data)
+        file.write(b'\nendstream\nendobj\n')
+        begin(5)
+        file.write(b'%d\nendobj\n' % length)
+
+        xref = file.tell()
+        file.write(b'xref\n0 6\n0000000000 65535 f \n')
+        for number in range(1, 6):
+            file.write(b'%010d 00000 n \n' % offsets[number])
+        file.write(b'trailer\n<< /Size 6 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % xref)
+
+
+def export_drawing(path, engine, scale=1, background=(0, 0, 0), stroke_width=STROKE_WIDTH):
+    """Write an engine's strokes to SVG or PDF, chosen by the file extension.
+
+    ``stroke_width`` is the Kivy Line width the strokes are drawn with.
+    """
+    if path.lower().endswith('.pdf'):
+        exporter = export_pdf
+    elif path.lower().endswith('.svg'):
+        exporter = export_svg
+    else:
+        raise ValueError(f"Unsupported vector format: {path}")
+    exporter(path, engine.iter_drawing(), engine.width, engine.height, scale=scale, background=background,
+             stroke_width=stroke_width)
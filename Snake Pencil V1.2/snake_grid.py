@@ -0,0 +1,358 @@
+# Snake Pencil V1.2
+# Uniform-grid spatial index over a path's segments, for collisions, region queries and erasing.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import math
+from array import array
+
+try:
+    import numpy  # Optional: files large batches of segments at once
+except ImportError:
+    numpy = None
+
+CELL_SIZE = 16  # Grid cell edge in pixels; a step or two of the snake
+COMPACT_AFTER = 1 << 14  # Forgotten segments tolerated before the grid is repacked
+BULK_SEGMENTS = 4096  # Segments added at once from which numpy files them in one pass
+NEAR = 1e-3  # Pixels within which points count as touching
+MIN_PIECE = 1e-6  # Shortest erased or visible part of a segment, as a fraction of it
+ERASED = ((0.0, 1.0),)  # Erased intervals of a segment erased from end to end
+
+
+def _on_segment(ax, ay, bx, by, px, py):
+    """Return True when a point known to be collinear with a-b lies within it."""
+    return (min(ax, bx) - NEAR <= px <= max(ax, bx) + NEAR
+            and min(ay, by) - NEAR <= py <= max(ay, by) + NEAR)
+
+
+def step_hits_segment(ax, ay, bx, by, cx, cy, dx, dy):
+    """Return True when the step a-b crosses or touches segment c-d anywhere but at a.
+
+    The step's start is where the snake already is, so touching there is
+    not a new collision; this also lets a step continue from the segment
+    that ends at a, and catches a step doubling back over it. Points
+    within NEAR of a line count as on it, so float32 rounding of stored
+    paths cannot turn a touch into a crossing or back.
+    """
+    near_ab = NEAR * math.hypot(bx - ax, by - ay)
+    near_cd = NEAR * math.hypot(dx - cx, dy - cy)
+    # Which side of each segment's line the other's end points are on; 0 is on the line
+    d1 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    d2 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+    d3 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    d4 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+    d1 = 0 if abs(d1) <= near_cd else d1
+    d2 = 0 if abs(d2) <= near_cd else d2
+    d3 = 0 if abs(d3) <= near_ab else d3
+    d4 = 0 if abs(d4) <= near_ab else d4
+    if d1 * d2 < 0 and d3 * d4 < 0:
+        return True
+    # Touching: an end point on the other segment (d1 would be the start itself)
+    return ((d2 == 0 and _on_segment(cx, cy, dx, dy, bx, by))
+            or (d3 == 0 and not _near(cx, cy, ax, ay) and _on_segment(ax, ay, bx, by, cx, cy))
+            or (d4 == 0 and not _near(dx, dy, ax, ay) and _on_segment(ax, ay, bx, by, dx, dy)))
+
+
+def _near(ax, ay, bx, by):
+    return abs(ax - bx) <= NEAR and abs(ay - by) <= NEAR
+
+
+class SegmentGrid:
+    """Uniform-grid index over the segments of one growing polyline.
+
+    Segment i joins points i and i + 1 of the path, counting points that
+    a bounded path has since dropped, so ids stay stable. Each segment is
+    listed in every cell its bounding box touches. Paths only grow, slide
+    or shrink at their end, which maps to appends and pops at the end of
+    each cell's id array; segments dropped from the front are skipped
+    until enough pile up to repack the grid.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.clear()
+
+    def clear(self, first=0):
+        """Forget every segment; the next one gets id ``first``."""
+        self.cells = {}  # (column, row) -> array of segment ids, ascending
+        self.coords = array('d')  # x0, y0, x1, y1 per segment, from id ``base`` on
+        self.base = first  # Id of the first segment in coords
+        self.first = first  # Oldest live segment id
+        self.end = first  # Id the next segment gets
+        self.last = None  # Where the next segment starts
+
+    def __len__(self):
+        """Live segments."""
+        return self.end - self.first
+
+    def segment(self, segment_id):
+        """Return (x0, y0, x1, y1) of a segment."""
+        i = (segment_id - self.base) * 4
+        return tuple(self.coords[i:i + 4])
+
+    def _cells(self, x0, y0, x1, y1):
+        """Yield the cells covering a bounding box."""
+        size = self.cell_size
+        for column in range(int(min(x0, x1) // size), int(max(x0, x1) // size) + 1):
+            for row in range(int(min(y0, y1) // size), int(max(y0, y1) // size) + 1):
+                yield column, row
+
+    def _add(self, x0, y0, x1, y1):
+        segment_id = self.end
+        self.coords.extend((x0, y0, x1, y1))
+        cells = self.cells
+        for cell in self._cells(x0, y0, x1, y1):
+            ids = cells.get(cell)
+            if ids is None:
+                ids = cells[cell] = array('l')
+            ids.append(segment_id)
+        self.end += 1
+
+    def _remove_last(self):
+        """Take the newest segment out of its cells and return its coordinates."""
+        self.end -= 1
+        segment = self.segment(self.end)
+        for cell in self._cells(*segment):
+            ids = self.cells[cell]
+            ids.pop()
+            if not ids:
+                del self.cells[cell]
+        del self.coords[-4:]
+        return segment
+
+    def extend(self, points):
+        """Add the segments continuing the path through flat (x, y) floats."""
+        if numpy is not None and len(points) >= 2 * BULK_SEGMENTS:
+            self._extend_bulk(points)
+            return
+        last = self.last
+        for i in range(0, len(points) - 1, 2):
+            point = points[i], points[i + 1]
+            if last is not None:
+                self._add(last[0], last[1], point[0], point[1])
+            last = point
+        self.last = last
+
+    def _extend_bulk(self, points):
+        """Add many segments at once, e.g. when a whole drawing is loaded."""
+        xy = numpy.asarray(points, dtype=numpy.float64)[:len(points) - len(points) % 2].reshape(-1, 2)
+        if self.last is not None:
+            xy = numpy.concatenate(([self.last], xy))
+        self.last = tuple(xy[-1].tolist())
+        count = len(xy) - 1
+        if count <= 0:
+            return
+        segments = numpy.hstack((xy[:-1], xy[1:]))
+        self.coords.frombytes(segments.astype(self.coords.typecode).tobytes())
+
+        # Cells of every point, with the same floor division as _cells
+        cell = numpy.floor_divide(xy, self.cell_size).astype(numpy.int64)
+        columns = numpy.minimum(cell[:-1, 0], cell[1:, 0])
+        rows = numpy.minimum(cell[:-1, 1], cell[1:, 1])
+        widths = numpy.maximum(cell[:-1, 0], cell[1:, 0]) - columns + 1
+        heights = numpy.maximum(cell[:-1, 1], cell[1:, 1]) - rows + 1
+        spans = widths * heights
+        ids = numpy.repeat(numpy.arange(self.end, self.end + count, dtype=numpy.int64), spans)
+        offsets = numpy.arange(len(ids)) - numpy.repeat(numpy.cumsum(spans) - spans, spans)
+        widths = numpy.repeat(widths, spans)
+        cell_columns = numpy.repeat(columns, spans) + offsets % widths
+        cell_rows = numpy.repeat(rows, spans) + offsets // widths
+        # Every (cell, segment) pair ordered by cell; ids are already ascending, so a
+        # stable sort keeps them so within each cell, the order _add files them in
+        first_column, first_row = int(cell_columns.min()), int(cell_rows.min())
+        height = int(cell_rows.max()) - first_row + 1
+        keys = (cell_columns - first_column) * height + cell_rows - first_row
+        if keys.max() < 1 << 16:
+            keys = keys.astype(numpy.uint16)  # Small keys sort by radix, in linear time
+        order = numpy.argsort(keys, kind='stable')
+        ids, keys = ids[order], keys[order]
+        starts = numpy.flatnonzero(numpy.concatenate(([True], keys[1:] != keys[:-1])))
+        filed_keys = keys[starts].astype(numpy.int64)
+        data = ids.astype(array('l').typecode).tobytes()
+        itemsize = len(data) // len(ids)
+        cells = self.cells
+        stops = starts[1:].tolist() + [len(ids)]
+        for column, row, start, stop in zip((filed_keys // height + first_column).tolist(),
+                                            (filed_keys % height + first_row).tolist(), starts.tolist(), stops):
+            filed = cells.get((column, row))
+            if filed is None:
+                filed = cells[(column, row)] = array('l')
+            filed.frombytes(data[start * itemsize:stop * itemsize])
+        self.end += count
+
+    def replace_last(self, x, y):
+        """Move the path's last point, re-filing only the segment that ends there."""
+        if self.end > self.first:
+            x0, y0, _, _ = self._remove_last()
+            self._add(x0, y0, x, y)
+        self.last = (x, y)
+
+    def pop(self, count, last_point):
+        """Forget the segments ending at the path's last ``count`` points.
+
+        ``last_point`` is the path's new last point, or None if it is empty.
+        """
+        for _ in range(min(count, self.end - self.first)):
+            self._remove_last()
+        self.last = last_point
+
+    def forget(self, first):
+        """Drop segments below id ``first``, as a bounded path drops its oldest points."""
+        if first <= self.first:
+            return
+        self.first = min(first, self.end)
+        if self.first - self.base > max(COMPACT_AFTER, self.end - self.first):
+            self._compact()
+
+    def _compact(self):
+        """Repack the cells and coordinates without the forgotten segments."""
+        del self.coords[:(self.first - self.base) * 4]
+        self.base = self.first
+        cells = {}
+        for cell, ids in self.cells.items():
+            live = array('l', (segment_id for segment_id in ids if segment_id >= self.first))
+            if live:
+                cells[cell] = live
+        self.cells = cells
+
+    def _candidates(self, x0, y0, x1, y1):
+        """Return the live segment ids filed in the cells covering a bounding box."""
+        found = set()
+        cells = self.cells
+        first = self.first
+        for cell in self._cells(x0, y0, x1, y1):
+            ids = cells.get(cell)
+            if ids:
+                found.update(segment_id for segment_id in ids if segment_id >= first)
+        return found
+
+    def crosses(self, ax, ay, bx, by):
+        """Return True when a step from a to b crosses or touches the path anywhere but at a."""
+        coords, base = self.coords, self.base
+        for segment_id in self._candidates(ax, ay, bx, by):
+            i = (segment_id - base) * 4
+            if step_hits_segment(ax, ay, bx, by, coords[i], coords[i + 1], coords[i + 2], coords[i + 3]):
+                return True
+        return False
+
+    def query_rect(self, x0, y0, x1, y1):
+        """Return the ids of live segments with an end point in, or passing through, a rectangle."""
+        left, right, bottom, top = min(x0, x1), max(x0, x1), min(y0, y1), max(y0, y1)
+        coords, base = self.coords, self.base
+        corners = ((left, bottom, right, bottom), (right, bottom, right, top),
+                   (right, top, left, top), (left, top, left, bottom))
+        found = []
+        for segment_id in sorted(self._candidates(left, bottom, right, top)):
+            i = (segment_id - base) * 4
+            sx0, sy0, sx1, sy1 = coords[i:i + 4]
+            if ((left <= sx0 <= right and bottom <= sy0 <= top) or (left <= sx1 <= right and bottom <= sy1 <= top)
+                    or any(step_hits_segment(sx0, sy0, sx1, sy1, *edge) for edge in corners)):
+                found.append(segment_id)
+        return found
+
+    def query_bounds(self, x0, y0, x1, y1):
+        """Return the ids of live segments whose bounding boxes overlap a rectangle.
+
+        A cheap superset of ``query_rect``, for redrawing a clipped region.
+        """
+        left, right, bottom, top = min(x0, x1), max(x0, x1), min(y0, y1), max(y0, y1)
+        coords, base = self.coords, self.base
+        found = []
+        for segment_id in sorted(self._candidates(left, bottom, right, top)):
+            i = (segment_id - base) * 4
+            sx0, sy0, sx1, sy1 = coords[i:i + 4]
+            if ((sx0 <= right or sx1 <= right) and (sx0 >= left or sx1 >= left)
+                    and (sy0 <= top or sy1 <= top) and (sy0 >= bottom or sy1 >= bottom)):
+                found.append(segment_id)
+        return found
+
+
+def box_interval(left, bottom, right, top, x0, y0, x1, y1):
+    """Return the (t0, t1) part of segment (x0, y0)-(x1, y1) inside a rectangle, or None."""
+    t0, t1 = 0.0, 1.0
+    # Clip against each side in turn (Liang-Barsky)
+    for delta, gap in ((x0 - x1, x0 - left), (x1 - x0, right - x0), (y0 - y1, y0 - bottom), (y1 - y0, top - y0)):
+        if not delta:
+            if gap < 0:
+                return None
+        elif delta < 0:
+            t0 = max(t0, gap / delta)
+        else:
+            t1 = min(t1, gap / delta)
+    return (t0, t1) if t1 - t0 > MIN_PIECE else None
+
+
+def erase_interval(intervals, t0, t1):
+    """Return sorted erased intervals with (t0, t1) merged in; ((0, 1),) means all of it."""
+    merged = []
+    for start, end in sorted((intervals or ()) + ((t0, t1),)):
+        if merged and start <= merged[-1][1] + MIN_PIECE:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if merged[0][0] <= MIN_PIECE and merged[0][1] >= 1 - MIN_PIECE:
+        return ERASED
+    return tuple(merged)
+
+
+def visible_intervals(intervals):
+    """Return the parts of a segment, as (t0, t1) intervals, not covered by erased ones."""
+    visible = []
+    t = 0.0
+    for start, end in intervals:
+        if start - t > MIN_PIECE:
+            visible.append((t, start))
+        t = max(t, end)
+    if 1 - t > MIN_PIECE:
+        visible.append((t, 1.0))
+    return visible
+
+
+def visible_spans(points, erased, first=0):
+    """Return the visible pieces of a polyline around its erased segments.
+
+    Segment j of ``points`` has id ``first`` + j, and ``erased`` maps ids
+    to their erased intervals. Returns (closed, (head, start)): each
+    closed piece is (head, start, end, tail), meaning the cut point floats
+    ``head``, whole points start to end - 1, then the cut point ``tail``;
+    the open piece that runs to the polyline's end is ``head`` then every
+    point from ``start`` on. Only erased segments are looked at.
+    """
+    count = len(points) // 2 - 1
+    if count < len(erased):
+        hits = [j for j in range(count) if j + first in erased]
+    else:
+        hits = sorted(i - first for i in erased if first <= i < first + count)
+    closed = []
+    head, start = [], 0
+    for j in hits:
+        x0, y0, x1, y1 = points[2 * j:2 * j + 4]
+        visible = visible_intervals(erased[j + first])
+        if not visible or visible[0][0] > 0:
+            # The open piece ends at this segment's first point
+            closed.append((head, start, j + 1, []))
+        for t0, t1 in visible:
+            if t0 <= 0:
+                closed.append((head, start, j + 1, [x0 + (x1 - x0) * t1, y0 + (y1 - y0) * t1]))
+            elif t1 < 1:
+                closed.append(([x0 + (x1 - x0) * t0, y0 + (y1 - y0) * t0], 0, 0,
+                               [x0 + (x1 - x0) * t1, y0 + (y1 - y0) * t1]))
+        # A piece reaching the segment's end stays open into the next one
+        if visible and visible[-1][1] >= 1 and visible[-1][0] > 0:
+            t0 = visible[-1][0]
+            head = [x0 + (x1 - x0) * t0, y0 + (y1 - y0) * t0]
+        else:
+            head = []
+        start = j + 1
+    # Pieces of a single point draw nothing
+    closed = [span for span in closed if len(span[0]) + 2 * (span[2] - span[1]) + len(span[3]) >= 4]
+    return closed, (head, start)
+
+
+def split_visible(points, erased, first=0):
+    """Return the visible pieces of a polyline as flat float lists."""
+    closed, (head, start) = visible_spans(points, erased, first)
+    pieces = [head + list(points[2 * start:2 * end]) + tail for head, start, end, tail in closed]
+    piece = head + list(points[2 * start:])
+    if len(piece) >= 4:
+        pieces.append(piece)
+    return pieces
@@ -0,0 +1,444 @@
+# Snake Pencil V1.2
+# Compact path storage for the snake's trails.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import mmap
+import os
+import tempfile
+import weakref
+from array import array
+
+
+class PathBuffer:
+    """Flat (x, y) float path stored in a typed array, optionally bounded like a ring.
+
+    Lengths and ``maxlen`` count floats, the same as the deques this replaces.
+    ``view`` hands out a memoryview of the live window without building a list.
+    """
+
+    def __init__(self, points=(), maxlen=None, typecode='f'):
+        self.maxlen = maxlen
+        self.typecode = typecode
+        self.dropped = 0  # Floats pushed out of the front of a bounded buffer
+        itemsize = array(typecode).itemsize
+        if maxlen is None:
+            self._data = array(typecode, bytes(itemsize * 256))
+        else:
+            # Every value is written twice, maxlen apart, so the live window
+            # [start, start + maxlen) is always one contiguous slice
+            self._data = array(typecode, bytes(itemsize * 2 * maxlen))
+        self._start = 0
+        self._len = 0
+        self.extend(points)
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return iter(self.view())
+
+    @property
+    def nbytes(self):
+        """Bytes allocated for the buffer, including unused capacity."""
+        return len(self._data) * self._data.itemsize
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def append(self, value):
+        """Append one float in O(1), dropping the oldest one when bounded and full."""
+        data = self._data
+        if self.maxlen is None:
+            if self._len == len(data):
+                self._grow(self._len + 1)
+                data = self._data
+            data[self._len] = value
+            self._len += 1
+            return
+
+        cap = self.maxlen
+        if cap == 0:
+            self.dropped += 1
+        elif self._len < cap:
+            i = self._start + self._len
+            data[i] = value
+            data[i - cap if i >= cap else i + cap] = value
+            self._len += 1
+        else:
+            # Full: overwrite the oldest slot and slide the window forward
+            data[self._start] = value
+            data[self._start + cap] = value
+            self._start = (self._start + 1) % cap
+            self.dropped += 1
+
+    def extend(self, values):
+        """Append a sequence of floats."""
+        if self.maxlen is not None:
+            if 0 < self.maxlen <= len(values):
+                # Only the newest maxlen floats survive; skip writing the rest
+                self.dropped += self._len + len(values) - self.maxlen
+                values = values[len(values) - self.maxlen:]
+                self._start = 0
+                self._len = 0
+            append = self.append
+            for value in values:
+                append(value)
+            return
+
+        if isinstance(values, memoryview) and values.format == self.typecode:
+            values = array(self.typecode, values.tobytes())
+        elif not isinstance(values, array) or values.typecode != self.typecode:
+            values = array(self.typecode, values)
+        end = self._len + len(values)
+        if end > len(self._data):
+            self._grow(end)
+        self._data[self._len:end] = values
+        self._len = end
+
+    def _grow(self, needed):
+        """Move an unbounded buffer into a larger array.
+
+        The old array is never resized in place, so memoryviews handed out
+        earlier stay valid instead of raising BufferError.
+        """
+        capacity = max(needed, len(self._data) * 2)
+        data = array(self.typecode, bytes(self._data.itemsize * capacity))
+        data[:self._len] = self._data[:self._len]
+        self._data = data
+
+    def replace_last(self, x, y):
+        """Overwrite the last (x, y) pair in place."""
+        if self._len < 2:
+            raise IndexError('no point to replace')
+        data = self._data
+        end = self._start + self._len
+        data[end - 2] = x
+        data[end - 1] = y
+        if self.maxlen is not None:
+            # Keep the second copy of each value in step
+            cap = self.maxlen
+            for i, value in ((end - 2, x), (end - 1, y)):
+                data[i - cap if i >= cap else i + cap] = value
+
+    def pop_tail(self, count):
+        """Remove the last ``count`` floats and return them as an array."""
+        count = max(0, min(count, self._len))
+        removed = array(self.typecode, self.view(self._len - count).tobytes())
+        self._len -= count
+        return removed
+
+    def clear(self):
+        """Remove every point, keeping the allocated storage."""
+        self._start = 0
+        self._len = 0
+        self.dropped = 0
+
+    def view(self, start=0, stop=None):
+        """Return a memoryview over floats [start, stop) of the live window."""
+        start, stop, _ = slice(start, stop).indices(self._len)
+        return memoryview(self._data)[self._start + start:self._start + max(start, stop)]
+
+    def iter_chunks(self, size=1 << 16):
+        """Yield memoryviews of at most ``size`` floats covering the live window."""
+        for start in range(0, self._len, size):
+            yield self.view(start, start + size)
+
+    def tolist(self):
+        """Return the live window as a list of floats."""
+        return self.view().tolist()
+
+    def last_point(self):
+        """Return the last (x, y) pair, or None when fewer than two floats are stored."""
+        if self._len < 2:
+            return None
+        end = self._start + self._len
+        return self._data[end - 2], self._data[end - 1]
+
+
+class PathHistory:
+    """Unbounded flat (x, y) float path that spills its oldest floats to disk.
+
+    Only ``working_set`` floats are kept in RAM; everything older is appended
+    to a stroke file and read back through a read-only memory map, so a long
+    session keeps its whole drawing without its memory growing. The file is
+    only created by the first spill, so short drawings never touch the disk.
+    Views handed out stay valid, with the points they were taken over, even
+    after a ``clear``.
+    """
+
+    maxlen = None  # Never drops points, unlike a bounded PathBuffer
+    dropped = 0
+
+    def __init__(self, points=(), working_set=1 << 16, path=None, typecode='f'):
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        self.working_set = max(working_set, 4)  # Floats kept in RAM before spilling
+        self.path = path  # The stroke file is anonymous unless a path is given to keep it around
+        self._file = None  # Opened by the first spill
+        self._spilled = 0  # Floats stored in the stroke file
+        self._map = None
+        self._maps = weakref.WeakSet()  # Every map of the file still alive, e.g. through old views
+        self._ram = PathBuffer(typecode=typecode)
+        self.extend(points)
+
+    def __len__(self):
+        return self._spilled + len(self._ram)
+
+    def __iter__(self):
+        for chunk in self.iter_chunks():
+            yield from chunk
+
+    @property
+    def nbytes(self):
+        """Bytes held in RAM; see ``spilled_bytes`` for the stroke file."""
+        return self._ram.nbytes
+
+    @property
+    def spilled_bytes(self):
+        return self._spilled * self.itemsize
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return self.view(start, stop)[::step]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('path index out of range')
+        if index < self._spilled:
+            return self._mapped()[index]
+        return self._ram[index - self._spilled]
+
+    def append(self, value):
+        """Append one float, spilling to disk once the working set is full."""
+        self._ram.append(value)
+        if len(self._ram) > self.working_set:
+            self._spill()
+
+    def extend(self, values):
+        """Append a sequence of floats."""
+        self._ram.extend(values)
+        if len(self._ram) > self.working_set:
+            self._spill()
+
+    def _spill(self):
+        """Write all but the newest half of the working set to the stroke file."""
+        count = len(self._ram) - self.working_set // 2
+        count -= count % 2  # Keep (x, y) pairs together
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(prefix='snake_stroke_') if self.path is None else open(self.path, 'w+b')
+        self._file.seek(self._spilled * self.itemsize)
+        self._file.write(self._ram.view(0, count))
+        self._spilled += count
+        # A fresh buffer instead of an in-place delete keeps old views valid
+        self._ram = PathBuffer(self._ram.view(count), typecode=self.typecode)
+        self._map = None
+
+    def _mapped(self):
+        """Return a float memoryview over the spilled part of the path."""
+        if self._spilled == 0:
+            return memoryview(array(self.typecode))
+        if self._map is None:
+            self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps.add(self._map)
+        return memoryview(self._map).cast(self.typecode)[:self._spilled]
+
+    def replace_last(self, x, y):
+        """Overwrite the last (x, y) pair."""
+        if len(self._ram) >= 2:
+            self._ram.replace_last(x, y)
+            return
+        if len(self) < 2:
+            raise IndexError('no point to replace')
+        # The pair is on disk; pull it back into RAM
+        self.pop_tail(2)
+        self.extend((x, y))
+
+    def pop_tail(self, count):
+        """Remove the last ``count`` floats and return them as an array.
+
+        Removing past the working set shortens the spilled part; the file
+        is simply overwritten by the next spill.
+        """
+        count = max(0, min(count, len(self)))
+        if count <= len(self._ram):
+            return self._ram.pop_tail(count)
+        total = len(self)
+        removed = array(self.typecode, self.view(total - count).tobytes())
+        self._spilled = total - count
+        self._ram.clear()
+        return removed
+
+    def clear(self):
+        """Remove every point and empty the stroke file.
+
+        A file still mapped by views handed out earlier is never truncated
+        under them, which would crash their next read: it is left to them
+        and the next spill starts a new one.
+        """
+        self._ram.clear()
+        self._spilled = 0
+        self._map = None
+        if self._file is None:
+            return
+        in_use = False
+        for mapped in list(self._maps):
+            try:
+                mapped.close()
+            except BufferError:
+                in_use = True
+        if not in_use:
+            self._file.truncate(0)
+            return
+        # The views keep their map open, and the map its own handle on the file
+        self._file.close()
+        self._file = None
+        self._maps = weakref.WeakSet()
+        if self.path is not None:
+            # A new file under the path, leaving the mapped one to the views
+            try:
+                os.remove(self.path)
+            except OSError:
+                self.path = None  # Mapped files cannot be removed on Windows
+
+    def close(self):
+        """Release the stroke file."""
+        self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def view(self, start=0, stop=None):
+        """Return a memoryview over floats [start, stop) of the whole history.
+
+        Ranges that straddle the disk and RAM parts are copied into one array.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        spilled = self._spilled
+        if stop <= spilled:
+            return self._mapped()[start:stop]
+        if start >= spilled:
+            return self._ram.view(start - spilled, stop - spilled)
+        joined = array(self.typecode, self._mapped()[start:].tobytes())
+        joined.frombytes(self._ram.view(0, stop - spilled).tobytes())
+        return memoryview(joined)
+
+    def iter_chunks(self, size=1 << 16):
+        """Yield memoryviews of at most ``size`` floats covering the whole history."""
+        mapped = self._mapped()
+        for start in range(0, self._spilled, size):
+            yield mapped[start:start + size]
+        yield from self._ram.iter_chunks(size)
+
+    def tolist(self):
+        """Return the whole history as a list of floats."""
+        return [value for chunk in self.iter_chunks() for value in chunk.tolist()]
+
+    def last_point(self):
+        """Return the last (x, y) pair, or None when fewer than two floats are stored."""
+        if len(self._ram) >= 2:
+            return self._ram.last_point()
+        if len(self) < 2:
+            return None
+        tail = self.view(len(self) - 2)
+        return tail[0], tail[1]
+
+
+class PathRange:
+    """Read-only window [start, stop) of a path, e.g. one colored stroke for export."""
+
+    def __init__(self, path, start=0, stop=None):
+        self.path = path
+        self.start, self.stop, _ = slice(start, stop).indices(len(path))
+        self.stop = max(self.start, self.stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def view(self):
+        """Return a memoryview over the range."""
+        return self.path.view(self.start, self.stop)
+
+    def iter_chunks(self, size=1 << 16):
+        """Yield memoryviews of at most ``size`` floats covering the range."""
+        for start in range(self.start, self.stop, size):
+            yield self.path.view(start, min(start + size, self.stop))
+
+    def tolist(self):
+        """Return the range as a list of floats."""
+        return [value for chunk in self.iter_chunks() for value in chunk.tolist()]
+
+
+class PathPiece:
+    """Read-only polyline joined from PathRanges and short float lists.
+
+    Used for the visible parts of a partly erased stroke: whole runs of
+    points stay ranges of the path, and only the cut points at either end
+    are new floats.
+    """
+
+    def __init__(self, parts):
+        self.parts = [part for part in parts if len(part)]
+
+    def __len__(self):
+        return sum(len(part) for part in self.parts)
+
+    def view(self):
+        """Return a memoryview over a copy of the piece."""
+        return memoryview(array('f', self.tolist()))
+
+    def iter_chunks(self, size=1 << 16):
+        """Yield float sequences of at most ``size`` floats covering the piece."""
+        for part in self.parts:
+            if isinstance(part, PathRange):
+                yield from part.iter_chunks(size)
+            else:
+                yield part
+
+    def tolist(self):
+        """Return the piece as a list of floats."""
+        return [value for chunk in self.iter_chunks() for value in chunk]
+
+
+def rdp_simplify(points, tolerance):
+    """Return flat (x, y) floats decimated with Ramer-Douglas-Peucker.
+
+    Points closer than ``tolerance`` to the line between the points kept
+    around them are dropped; the first and last points are always kept.
+    """
+    xs = list(points[0::2])
+    ys = list(points[1::2])
+    count = len(xs)
+    if count < 3:
+        return [value for pair in zip(xs, ys) for value in pair]
+    keep = bytearray(count)
+    keep[0] = keep[-1] = 1
+    limit = tolerance * tolerance
+    # An explicit stack, so long strokes cannot hit the recursion limit
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        x0, y0 = xs[first], ys[first]
+        dx, dy = xs[last] - x0, ys[last] - y0
+        norm = dx * dx + dy * dy
+        farthest, index = limit, None
+        for i in range(first + 1, last):
+            px, py = xs[i] - x0, ys[i] - y0
+            if norm:
+                cross = px * dy - py * dx
+                distance = cross * cross / norm
+            else:
+                distance = px * px + py * py
+            if distance > farthest:
+                farthest, index = distance, i
+        if index is not None:
+            keep[index] = 1
+            stack.append((first, index))
+            stack.append((index, last))
+    simplified = []
+    for i in range(count):
+        if keep[i]:
+            simplified += (xs[i], ys[i])
+    return simplified
@@ -0,0 +1,150 @@
+# Snake Pencil V1.2
+# Automatic movement patterns: a registry of parametric curves evaluated in batches.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import math
+
+try:
+    import numpy  # Optional: vectorized curve evaluation
+except ImportError:
+    numpy = None
+
+# Curve parameter advanced per tick at the reference tick rate (one degree)
+STEP = math.radians(1)
+# Ticks evaluated at once for curves that never repeat
+CHUNK_TICKS = 256
+# Longest period, in ticks, precomputed as a whole
+MAX_PERIOD_TICKS = 1 << 16
+# Spiral growth in pixels per reference tick
+SPIRAL_GROWTH = 0.1
+
+PATTERNS = {}  # Name -> pattern, in registration order
+
+
+def register_pattern(pattern):
+    """Make a pattern selectable by its name and return it."""
+    PATTERNS[pattern.name] = pattern
+    return pattern
+
+
+def get_pattern(name):
+    """Return the named pattern, falling back to the circle for unknown names."""
+    return PATTERNS.get(name) or PATTERNS['circle']
+
+
+class ParametricPattern:
+    """A curve f(t) around the pattern center, scaled by the pattern radius.
+
+    ``function(t, radius, m)`` returns (x, y) for the parameter t using the
+    math module ``m``. It is called once with arrays and numpy as ``m``
+    when numpy is installed, or once per t with ``math`` otherwise, so one
+    body of plain arithmetic and cos/sin serves both. ``period`` is the
+    length of t after which the curve repeats, or None.
+    """
+
+    def __init__(self, name, function, period=2 * math.pi):
+        self.name = name
+        self.function = function
+        self.period = period
+
+    def evaluate(self, ts, radius):
+        """Return the x and y offsets at every parameter in ``ts`` as two lists."""
+        if numpy is not None:
+            xs, ys = self.function(numpy.asarray(ts, dtype=float), radius, numpy)
+            count = len(ts)
+            # Constant terms come back as scalars; broadcast them to every t
+            return numpy.broadcast_to(xs, count).tolist(), numpy.broadcast_to(ys, count).tolist()
+        points = [self.function(t, radius, math) for t in ts]
+        return [x for x, y in points], [y for x, y in points]
+
+    def stream(self, engine):
+        return PatternStream(self, engine.pattern_radius, STEP * engine.step_scale)
+
+
+class PatternStream:
+    """One point per tick of a parametric pattern, evaluated ahead in batches.
+
+    A curve whose period is a whole number of ticks is evaluated once for
+    the whole period and indexed modulo its length; any other curve is
+    evaluated CHUNK_TICKS at a time. Either way a tick is a list lookup.
+    """
+
+    def __init__(self, pattern, radius, step):
+        self.pattern = pattern
+        self.radius = radius
+        self.step = step
+        self.period_ticks = 0
+        if pattern.period:
+            ticks = pattern.period / step
+            if abs(ticks - round(ticks)) < 1e-6 and round(ticks) <= MAX_PERIOD_TICKS:
+                self.period_ticks = round(ticks)
+        self.first = 0  # Tick of the first buffered point
+        self.xs = self.ys = ()
+
+    def point(self, tick):
+        """Return the (x, y) offset at a tick."""
+        if self.period_ticks:
+            tick %= self.period_ticks
+        index = tick - self.first
+        if not 0 <= index < len(self.xs):
+            self._fill(tick)
+            index = tick - self.first
+        return self.xs[index], self.ys[index]
+
+    def _fill(self, tick):
+        if self.period_ticks:
+            self.first, count = 0, self.period_ticks
+        else:
+            self.first, count = tick, CHUNK_TICKS
+        if numpy is not None:
+            ts = numpy.arange(self.first, self.first + count) * self.step
+        else:
+            ts = [(self.first + i) * self.step for i in range(count)]
+        self.xs, self.ys = self.pattern.evaluate(ts, self.radius)
+
+
+class RandomPattern:
+    """Jitter around the center: each tick moves -1, 0 or +1 speed steps per axis.
+
+    Draws come from the engine's seeded generator one tick at a time, so
+    seeded runs and replays stay reproducible.
+    """
+
+    name = 'random'
+
+    def stream(self, engine):
+        return RandomStream(engine.random, engine.snake_speed * engine.step_scale)
+
+
+class RandomStream:
+    def __init__(self, generator, speed):
+        self.choices = (-speed, 0, speed)
+        self.choice = generator.choice
+
+    def point(self, tick):
+        return self.choice(self.choices), self.choice(self.choices)
+
+
+def _spiral(t, radius, m):
+    grown = radius + SPIRAL_GROWTH * t / STEP
+    return grown * m.cos(t), grown * m.sin(t)
+
+
+# Hypotrochoid: a circle of radius 3 rolling inside one of radius 5, pen 5 from its center
+_OUTER, _INNER, _PEN = 5, 3, 5
+
+
+def _hypotrochoid(t, radius, m):
+    scale = radius / (_OUTER - _INNER + _PEN)
+    turn = (_OUTER - _INNER) / _INNER * t
+    return (scale * ((_OUTER - _INNER) * m.cos(t) + _PEN * m.cos(turn)),
+            scale * ((_OUTER - _INNER) * m.sin(t) - _PEN * m.sin(turn)))
+
+
+register_pattern(ParametricPattern('circle', lambda t, r, m: (r * m.cos(t), r * m.sin(t))))
+register_pattern(ParametricPattern('figure_eight', lambda t, r, m: (r * m.sin(t), r * m.sin(t) * m.cos(t))))
+register_pattern(ParametricPattern('spiral', _spiral, period=None))
+register_pattern(RandomPattern())
+register_pattern(ParametricPattern('lissajous', lambda t, r, m: (r * m.sin(3 * t + math.pi / 2), r * m.sin(2 * t))))
+register_pattern(ParametricPattern('rose', lambda t, r, m: (r * m.cos(5 * t) * m.cos(t), r * m.cos(5 * t) * m.sin(t))))
+register_pattern(ParametricPattern('hypotrochoid', _hypotrochoid, period=2 * math.pi * _INNER))
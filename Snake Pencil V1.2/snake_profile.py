@@ -0,0 +1,155 @@
+# Snake Pencil V1.2
+# Frame-time instrumentation: per-phase timers, rolling histograms and profiling dumps.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import cProfile
+import csv
+import io
+import json
+import pstats
+import time
+from collections import deque
+
+PHASES = ('input', 'pattern', 'append', 'upload')  # Timed inside SnakeEngine.step
+WINDOW = 600  # Frames kept in the rolling histograms (10 s at 60 FPS)
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16.7, 33.3, 50, 100)  # Upper bounds for dumps
+
+
+class RollingHistogram:
+    """The last ``window`` samples of one measurement, in seconds."""
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def add(self, value):
+        self.samples.append(value)
+
+    def percentile(self, fraction):
+        """Return the sample at ``fraction`` (0-1) of the sorted window, or 0 when empty."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def buckets(self):
+        """Count samples per BUCKETS_MS bound; the last count is everything slower."""
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for value in self.samples:
+            ms = value * 1000
+            for i, bound in enumerate(BUCKETS_MS):
+                if ms <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return counts
+
+    def summary(self):
+        return {
+            'count': len(self.samples),
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': max(self.samples, default=0) * 1000,
+            'buckets_ms': dict(zip([str(bound) for bound in BUCKETS_MS] + ['slower'], self.buckets()))
+        }
+
+
+class FrameProfiler:
+    """Collect per-frame phase times from an engine and its view.
+
+    The engine calls ``lap`` around each phase when its ``profiler`` is
+    set; the view brackets every update with ``begin_frame``/``end_frame``.
+    Phase times add up over the ticks of a frame and are kept, together
+    with the frame interval and update time, in rolling histograms.
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, window=WINDOW):
+        self.histograms = {name: RollingHistogram(window) for name in ('frame', 'update') + PHASES}
+        self.rows = deque(maxlen=window)  # Raw per-frame times, for CSV dumps
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frame_start = 0.0
+        self.frames = 0
+        self.cprofile = None
+        self.cprofile_frames = 0  # Frames left before cProfile stops
+        self.cprofile_path = None
+        self.on_cprofile_done = None
+
+    def lap(self, phase, start):
+        """Add the time since ``start`` to a phase and return the current clock."""
+        now = self.clock()
+        self.current[phase] += now - start
+        return now
+
+    def begin_frame(self):
+        self.frame_start = self.clock()
+        if self.cprofile:
+            self.cprofile.enable()
+
+    def end_frame(self, dt):
+        """Close a frame; ``dt`` is the interval since the previous one, from the Clock."""
+        if self.cprofile:
+            self.cprofile.disable()
+        update = self.clock() - self.frame_start
+        self.histograms['frame'].add(dt)
+        self.histograms['update'].add(update)
+        for phase in PHASES:
+            self.histograms[phase].add(self.current[phase])
+        self.rows.append((self.frames, dt, update) + tuple(self.current[phase] for phase in PHASES))
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frames += 1
+        if self.cprofile:
+            self.cprofile_frames -= 1
+            if self.cprofile_frames <= 0:
+                self._finish_cprofile()
+
+    @property
+    def fps(self):
+        """Frames per second over the rolling window."""
+        frames = self.histograms['frame'].samples
+        total = sum(frames)
+        return len(frames) / total if total else 0.0
+
+    def overlay_text(self, engine):
+        """Return the few lines shown by the on-screen overlay."""
+        frame, update = self.histograms['frame'], self.histograms['update']
+        points = sum(len(path) for path in engine.paths.values()) // 2
+        ram = sum(path.nbytes for path in engine.paths.values())
+        disk = sum(getattr(path, 'spilled_bytes', 0) for path in engine.paths.values())
+        phases = '  '.join(f'{phase} {self.histograms[phase].percentile(0.5) * 1e6:.0f}' for phase in PHASES)
+        return (f'{self.fps:.0f} FPS  frame p50 {frame.percentile(0.5) * 1000:.1f} / '
+                f'p99 {frame.percentile(0.99) * 1000:.1f} ms  update p99 {update.percentile(0.99) * 1000:.2f} ms\n'
+                f'phases p50 us: {phases}\n'
+                f'{points} points  paths {ram / 1024:.0f} KiB RAM, {disk / 1024:.0f} KiB on disk')
+
+    def dump(self, base_path):
+        """Write ``base_path``.json with the histograms and ``base_path``.csv with raw frames."""
+        with open(base_path + '.json', 'w') as file:
+            json.dump({'frames': self.frames, 'fps': self.fps,
+                       'histograms': {name: h.summary() for name, h in self.histograms.items()}},
+                      file, indent=1)
+        with open(base_path + '.csv', 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(('frame', 'dt_s', 'update_s') + tuple(f'{phase}_s' for phase in PHASES))
+            writer.writerows(self.rows)
+        return base_path + '.json', base_path + '.csv'
+
+    def start_cprofile(self, frames, path, callback=None):
+        """Run cProfile over the next ``frames`` updates, then save its stats to ``path``.
+
+        ``callback(path, report)`` gets the file name and the top functions
+        by cumulative time once profiling ends.
+        """
+        self.cprofile = cProfile.Profile()
+        self.cprofile_frames = frames
+        self.cprofile_path = path
+        self.on_cprofile_done = callback
+
+    def _finish_cprofile(self):
+        profile, self.cprofile = self.cprofile, None
+        profile.dump_stats(self.cprofile_path)
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(15)
+        if self.on_cprofile_done:
+            self.on_cprofile_done(self.cprofile_path, report.getvalue())
@@ -0,0 +1,255 @@
+# Snake Pencil V1.2
+# Project files: whole drawings saved losslessly, compressed, and streamed back in chunk by chunk.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+try:
+    import numpy  # Optional: encodes and decodes whole chunks at once
+except ImportError:
+    numpy = None
+
+from snake_codec import read_text, read_varint, write_text, write_varint
+
+MAGIC = b'SNKP'
+VERSION = 1
+# Header: version, width, height, snake position, color, automatic color, flags,
+# pattern angle, pattern radius, symmetry folds
+_HEADER = struct.Struct('<Bff2d3f3fBddH')
+AUTOMATIC = 1  # Flag bits
+GAME = 2
+
+CHUNK_FLOATS = 1 << 18  # Floats per compressed chunk (1 MB raw)
+LEVEL = 6  # zlib level; higher levels barely help on shuffled deltas
+
+# Chunk kinds: how a chunk's floats were turned into 32-bit integers before delta coding
+INTEGERS = 0  # Every value was a whole number: the values themselves
+FLOAT_BITS = 1  # The float32 bit patterns, so any value round-trips exactly
+
+_RUN = struct.Struct('<3f')
+_INTERVAL = struct.Struct('<2d')
+
+
+def _encode_chunk(chunk):
+    """Return (kind, compressed bytes) for a chunk of floats.
+
+    Each coordinate is stored as its difference from the same coordinate
+    of the previous point, zigzagged so small steps either way give small
+    numbers, and the bytes are split into four planes (all low bytes, then
+    the next ones...) so zlib sees long runs of zeros. Chunks start from
+    zero, so each one decodes on its own.
+    """
+    if numpy is not None:
+        values = numpy.asarray(chunk, dtype=numpy.float32)
+        if numpy.all(numpy.abs(values) < 1 << 30) and numpy.array_equal(values, numpy.floor(values)):
+            kind, ints = INTEGERS, values.astype(numpy.int32)
+        else:
+            kind, ints = FLOAT_BITS, values.view(numpy.int32)
+        deltas = ints.copy()
+        deltas[2:] -= ints[:-2]  # Wraps around like the decoder's sums
+        zigzag = ((deltas << 1) ^ (deltas >> 31)).view(numpy.uint32)
+        planes = zigzag.astype('<u4').view(numpy.uint8).reshape(-1, 4).T.tobytes()
+        return kind, zlib.compress(planes, LEVEL)
+
+    values = array('f', chunk)
+    if all(value.is_integer() and abs(value) < 1 << 30 for value in values):
+        kind, ints = INTEGERS, [int(value) for value in values]
+    else:
+        kind, ints = FLOAT_BITS, array('i', values.tobytes())
+    zigzag = array('I', bytes(4 * len(ints)))
+    for i, value in enumerate(ints):
+        if i >= 2:
+            value = (value - ints[i - 2] + (1 << 31)) % (1 << 32) - (1 << 31)
+        zigzag[i] = ((value << 1) ^ (value >> 31)) & 0xffffffff
+    if sys.byteorder == 'big':
+        zigzag.byteswap()
+    data = zigzag.tobytes()
+    return kind, zlib.compress(b''.join(data[k::4] for k in range(4)), LEVEL)
+
+
+def _decode_chunk(kind, data, count):
+    """Return the ``count`` floats of an encoded chunk as an array('f')."""
+    planes = zlib.decompress(data)
+    if len(planes) != 4 * count:
+        raise ValueError('corrupt project chunk')
+    if numpy is not None:
+        planes = numpy.frombuffer(planes, dtype=numpy.uint8).reshape(4, count).astype(numpy.uint32)
+        zigzag = planes[0] | planes[1] << 8 | planes[2] << 16 | planes[3] << 24
+        deltas = (zigzag >> 1).astype(numpy.int32) ^ -(zigzag & 1).astype(numpy.int32)
+        ints = numpy.empty_like(deltas)
+        # x and y are summed separately; int32 sums wrap like the encoder's differences
+        numpy.cumsum(deltas[0::2], dtype=numpy.int32, out=ints[0::2])
+        numpy.cumsum(deltas[1::2], dtype=numpy.int32, out=ints[1::2])
+        values = ints.astype(numpy.float32) if kind == INTEGERS else ints.view(numpy.float32)
+        return array('f', values.tobytes())
+
+    raw = bytearray(4 * count)
+    for k in range(4):
+        raw[k::4] = planes[k * count:(k + 1) * count]
+    zigzag = array('I', bytes(raw))
+    if sys.byteorder == 'big':
+        zigzag.byteswap()
+    ints = array('i', bytes(4 * count))
+    for i, value in enumerate(zigzag):
+        value = (value >> 1) ^ -(value & 1)
+        if i >= 2:
+            value = (value + ints[i - 2] + (1 << 31)) % (1 << 32) - (1 << 31)
+        ints[i] = value
+    if kind == INTEGERS:
+        return array('f', ints)
+    return array('f', ints.tobytes())
+
+
+def save_project(path, engine, chunk_floats=CHUNK_FLOATS):
+    """Save an engine's drawing, colors, symmetry and automatic pattern state.
+
+    Points are written as they are read from the paths, one compressed
+    chunk at a time, so saving never copies a whole path. The undo
+    history is not saved. Returns the number of bytes written.
+    """
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        flags = AUTOMATIC * bool(engine.automatic_mode) | GAME * bool(engine.game_mode)
+        file.write(_HEADER.pack(
+            VERSION, engine.width, engine.height, *engine.snake_pos, *engine.current_color[:3],
+            *engine.auto_color[:3], flags, engine.pattern_angle, engine.pattern_radius,
+            engine.symmetry_folds))
+        write_text(file, engine.selected_pattern)
+        write_text(file, engine.symmetry)
+        for name, points in engine.paths.items():
+            write_text(file, name)
+            # Offsets and ids are stored from the first point kept, not the first ever drawn
+            dropped = points.dropped
+            runs = engine.color_runs[name]
+            write_varint(file, len(runs))
+            for start, color in runs:
+                write_varint(file, max(start - dropped, 0))
+                file.write(_RUN.pack(*color[:3]))
+            erased = engine.erased[name]
+            write_varint(file, len(erased))
+            previous = dropped // 2
+            for segment_id in sorted(erased):
+                intervals = erased[segment_id]
+                write_varint(file, segment_id - previous)
+                write_varint(file, len(intervals))
+                for interval in intervals:
+                    file.write(_INTERVAL.pack(*interval))
+                previous = segment_id
+            for chunk in points.iter_chunks(chunk_floats):
+                if not len(chunk):
+                    continue
+                kind, data = _encode_chunk(chunk)
+                write_varint(file, len(chunk))
+                file.write(bytes((kind,)))
+                write_varint(file, len(data))
+                file.write(data)
+            write_varint(file, 0)
+        write_text(file, '')
+        return file.tell()
+
+
+def read_project(path):
+    """Return a project's header as a dict and a generator of its paths.
+
+    The generator yields (name, runs, erased, chunks) as ``restore`` takes
+    them; each ``chunks`` generator must be read to its end before the
+    next path, and the file is closed once the last path was read.
+    """
+    file = open(path, 'rb')
+    if file.read(len(MAGIC)) != MAGIC:
+        file.close()
+        raise ValueError(f"{path} is not a Snake Pencil project")
+    values = _HEADER.unpack(file.read(_HEADER.size))
+    if values[0] != VERSION:
+        file.close()
+        raise ValueError(f"Unsupported project version {values[0]}")
+    header = {
+        'width': values[1], 'height': values[2], 'position': values[3:5],
+        'color': tuple(values[5:8]), 'auto_color': tuple(values[8:11]),
+        'automatic_mode': bool(values[11] & AUTOMATIC), 'game_mode': bool(values[11] & GAME),
+        'pattern_angle': values[12], 'pattern_radius': values[13], 'folds': values[14],
+        'selected_pattern': read_text(file), 'symmetry': read_text(file)
+    }
+
+    def chunks():
+        while True:
+            count = read_varint(file)
+            if not count:
+                return
+            kind = file.read(1)[0]
+            yield _decode_chunk(kind, file.read(read_varint(file)), count)
+
+    def paths():
+        with file:
+            while True:
+                name = read_text(file)
+                if not name:
+                    return
+                runs = []
+                for _ in range(read_varint(file)):
+                    start = read_varint(file)
+                    runs.append((start, _RUN.unpack(file.read(_RUN.size))))
+                erased = {}
+                segment_id = 0
+                for _ in range(read_varint(file)):
+                    segment_id += read_varint(file)
+                    erased[segment_id] = tuple(_INTERVAL.unpack(file.read(_INTERVAL.size))
+                                               for _ in range(read_varint(file)))
+                yield name, runs, erased, chunks()
+
+    return header, paths()
+
+
+def load_project(path, engine):
+    """Replace an engine's drawing and settings with a saved project's.
+
+    The drawing keeps its saved coordinates; the engine keeps its own size.
+    Raises ValueError for files that are not Snake Pencil projects.
+    """
+    header, paths = read_project(path)
+    engine.auto_color = header['auto_color']
+    engine.restore(paths, header['position'], header['color'])
+    engine.automatic_mode = header['automatic_mode']
+    engine.game_mode = header['game_mode']
+    engine.selected_pattern = header['selected_pattern']
+    engine.pattern_angle = header['pattern_angle']
+    engine.pattern_radius = header['pattern_radius']
+    engine.set_symmetry(header['symmetry'], header['folds'])
+    return header
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Open a Snake Pencil project without a window.')
+    parser.add_argument('project', help='project file saved with the J key')
+    parser.add_argument('--png', help='render the drawing to this PNG')
+    parser.add_argument('--svg', help='export the drawing to this SVG or PDF')
+    parser.add_argument('--scale', type=float, default=1, help='output size relative to the window')
+    args = parser.parse_args(argv)
+
+    from snake_engine import SnakeEngine
+    engine = SnakeEngine(1, 1, history_mode=True)
+    start = time.perf_counter()
+    header = load_project(args.project, engine)
+    elapsed = time.perf_counter() - start
+    engine.resize(header['width'], header['height'])
+    points = sum(len(path) for path in engine.paths.values()) // 2
+    print(f"Loaded {points} points from {os.path.getsize(args.project)} bytes in {elapsed:.2f}s")
+    if args.png:
+        from snake_raster import render_png
+        render_png(args.png, engine.iter_drawing, engine.width, engine.height,
+                   int(engine.width * args.scale), int(engine.height * args.scale))
+        print(f"Drawing rendered to {args.png}")
+    if args.svg:
+        from snake_export import export_drawing
+        export_drawing(args.svg, engine, scale=args.scale)
+        print(f"Drawing exported to {args.svg}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+# Snake Pencil V1.2
+# Tiled software rendering of drawings to large PNG images, without a window.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import math
+import os
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy  # Optional: picks a band's segments out of a whole chunk at once
+except ImportError:
+    numpy = None
+
+from snake_export import STROKE_WIDTH, PngWriter
+
+TILE_SIZE = 512  # Tile edge in output pixels
+
+
+def _rgba(color):
+    """Convert a 0-1 RGB(A) tuple to 4 bytes."""
+    rgba = tuple(color) + (1,) * (4 - len(color))
+    return bytes(int(round(max(0, min(c, 1)) * 255)) for c in rgba[:4])
+
+
+def _span(y, x0, y0, x1, y1, radius):
+    """Return the x interval where row y crosses the capsule around segment (x0, y0)-(x1, y1)."""
+    xs = []
+    # Round end caps
+    for cx, cy in ((x0, y0), (x1, y1)):
+        dy = y - cy
+        if -radius <= dy <= radius:
+            half = math.sqrt(radius * radius - dy * dy)
+            xs += (cx - half, cx + half)
+
+    # The thick body: a rectangle around the segment
+    dx, dy = x1 - x0, y1 - y0
+    length = math.hypot(dx, dy)
+    if length > 0:
+        nx, ny = -dy / length * radius, dx / length * radius
+        corners = ((x0 + nx, y0 + ny), (x1 + nx, y1 + ny), (x1 - nx, y1 - ny), (x0 - nx, y0 - ny))
+        for i in range(4):
+            ax, ay = corners[i]
+            bx, by = corners[(i + 1) % 4]
+            if ay != by and (ay - y) * (by - y) <= 0:
+                xs.append(ax + (y - ay) * (bx - ax) / (by - ay))
+    if not xs:
+        return None
+    return min(xs), max(xs)
+
+
+def render_tile(left, top, width, height, segments, colors, radius, background):
+    """Rasterize segments into one RGBA tile and return its bytes, top row first.
+
+    ``segments`` is a flat array of (x0, y0, x1, y1, color_index) in output
+    pixel space with y pointing down, already in drawing order.
+    """
+    stride = width * 4
+    tile = bytearray(background * (width * height))
+    for i in range(0, len(segments), 5):
+        x0, y0, x1, y1 = segments[i] - left, segments[i + 1] - top, segments[i + 2] - left, segments[i + 3] - top
+        color = colors[int(segments[i + 4])]
+        first = max(0, int(math.floor(min(y0, y1) - radius)))
+        last = min(height - 1, int(math.ceil(max(y0, y1) + radius)))
+        for row in range(first, last + 1):
+            # Sample at pixel centres
+            span = _span(row + 0.5, x0, y0, x1, y1, radius)
+            if span is None:
+                continue
+            start = max(0, int(math.ceil(span[0] - 0.5)))
+            stop = min(width, int(math.floor(span[1] - 0.5)) + 1)
+            if start < stop:
+                offset = row * stride
+                tile[offset + start * 4:offset + stop * 4] = color * (stop - start)
+    return bytes(tile)
+
+
+def _band_chunk(bins, chunk, previous, index, band, rows, scale_x, scale_y, height, tile_size, radius):
+    """File a chunk's segments reaching tile row ``band`` in per-column bins; return its last point.
+
+    A segment reaches every tile its bounding box, grown by ``radius``,
+    touches; tiles past the image's edges are clamped to the outer ones.
+    """
+    columns = len(bins)
+    if numpy is not None:
+        xy = numpy.asarray(chunk, dtype=numpy.float64)[:len(chunk) - len(chunk) % 2].reshape(-1, 2)
+        if not len(xy):
+            return previous
+        # Canvas y points up; image rows count down from the top
+        out = numpy.empty((len(xy) + 1, 2))
+        out[1:, 0] = xy[:, 0] * scale_x
+        out[1:, 1] = (height - xy[:, 1]) * scale_y
+        last = tuple(out[-1].tolist())
+        if previous is None:
+            out = out[1:]
+        else:
+            out[0] = previous
+        segments = numpy.hstack((out[:-1], out[1:]))
+        ys = segments[:, 1::2]
+        first_row = numpy.maximum(numpy.floor_divide(ys.min(axis=1) - radius, tile_size), 0)
+        last_row = numpy.minimum(numpy.floor_divide(ys.max(axis=1) + radius, tile_size), rows - 1)
+        segments = segments[(first_row <= band) & (last_row >= band)]
+        if len(segments):
+            xs = segments[:, 0::2]
+            first_column = numpy.maximum(numpy.floor_divide(xs.min(axis=1) - radius, tile_size), 0)
+            last_column = numpy.minimum(numpy.floor_divide(xs.max(axis=1) + radius, tile_size), columns - 1)
+            filed = numpy.empty((len(segments), 5), dtype=numpy.float32)
+            filed[:, :4] = segments
+            filed[:, 4] = index
+            for column in range(int(first_column.min()), int(last_column.max()) + 1):
+                picked = filed[(first_column <= column) & (last_column >= column)]
+                if len(picked):
+                    bins[column].frombytes(picked.tobytes())
+        return last
+
+    for j in range(0, len(chunk) - 1, 2):
+        point = (chunk[j] * scale_x, (height - chunk[j + 1]) * scale_y)
+        if previous is not None:
+            (x0, y0), (x1, y1) = previous, point
+            first_row = max(0, int((min(y0, y1) - radius) // tile_size))
+            last_row = min(rows - 1, int((max(y0, y1) + radius) // tile_size))
+            if first_row <= band <= last_row:
+                first_column = max(0, int((min(x0, x1) - radius) // tile_size))
+                last_column = min(columns - 1, int((max(x0, x1) + radius) // tile_size))
+                for column in range(first_column, last_column + 1):
+                    bins[column].extend((x0, y0, x1, y1, index))
+        previous = point
+    return previous
+
+
+def _band_segments(strokes, band, columns, rows, scale_x, scale_y, height, tile_size, radius):
+    """Return per-column segment bins and their colors for one band (tile row) of the image.
+
+    The strokes are walked afresh for every band and only segments that
+    reach it are kept, in output pixels, so memory follows the band's
+    share of the drawing rather than the whole drawing.
+    """
+    bins = [array('f') for _ in range(columns)]
+    palette = {}  # RGBA bytes -> color index, in the order first seen
+    for color, points in strokes():
+        index = palette.setdefault(_rgba(color), len(palette))
+        previous = None
+        for chunk in points.iter_chunks():
+            previous = _band_chunk(bins, chunk, previous, index, band, rows,
+                                   scale_x, scale_y, height, tile_size, radius)
+    return bins, list(palette)
+
+
+def render_png(path, strokes, width, height, out_width, out_height, tile_size=TILE_SIZE,
+               stroke_width=STROKE_WIDTH, background=(0, 0, 0), workers=None):
+    """Render strokes into a PNG of any size, one band of tiles at a time.
+
+    ``strokes`` returns a fresh iterable of (rgb, path) strokes each time
+    it is called, like ``engine.iter_drawing``: it is walked once per band,
+    keeping only that band's segments. The drawing area (width x height) is
+    stretched to out_width x out_height and line widths scale with it;
+    ``stroke_width`` is a Kivy Line width, so it reaches that far on each
+    side of a path.
+
+    Tiles are rasterized in worker processes (``workers=0`` renders in this
+    process). Later bands are binned and queued while earlier ones render
+    and are stitched, enough of them to keep every worker busy, so memory
+    is bounded by a few bands of tiles, never the drawing or the image.
+    """
+    radius = stroke_width * max(out_width / width, out_height / height)
+    scale_x, scale_y = out_width / width, out_height / height
+    columns = -(-out_width // tile_size)
+    rows = -(-out_height // tile_size)
+    background = _rgba(background)
+    pool = ProcessPoolExecutor(workers) if workers != 0 else None
+    # Bands queued beyond the one being stitched
+    ahead = -(-(workers or os.cpu_count() or 1) // columns) if pool else 0
+
+    def submit(band):
+        top = band * tile_size
+        band_height = min(tile_size, out_height - top)
+        bins, colors = _band_segments(strokes, band, columns, rows, scale_x, scale_y, height, tile_size, radius)
+        jobs = []
+        for column, segments in enumerate(bins):
+            left = column * tile_size
+            args = (left, top, min(tile_size, out_width - left), band_height, segments, colors, radius, background)
+            jobs.append(pool.submit(render_tile, *args) if pool else args)
+        return band_height, jobs
+
+    try:
+        with open(path, 'wb') as file:
+            writer = PngWriter(file, out_width, out_height)
+            queued = deque()
+            next_band = 0
+            strides = [min(tile_size, out_width - column * tile_size) * 4 for column in range(columns)]
+            for _ in range(rows):
+                while next_band < rows and len(queued) <= ahead:
+                    queued.append(submit(next_band))
+                    next_band += 1
+                band_height, jobs = queued.popleft()
+                tiles = [job.result() if pool else render_tile(*job) for job in jobs]
+                # Stitch the band's tiles together row by row
+                band = bytearray()
+                for row in range(band_height):
+                    for tile, stride in zip(tiles, strides):
+                        band += tile[row * stride:(row + 1) * stride]
+                writer.write_rows(band)
+            writer.close()
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
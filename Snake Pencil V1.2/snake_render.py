@@ -0,0 +1,939 @@
+# Snake Pencil V1.2
+# Canvas helpers for drawing the snake's trails.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import math
+from array import array
+from bisect import bisect_right
+from contextlib import contextmanager
+
+from kivy.graphics import (ClearBuffers, ClearColor, Color, Fbo, InstructionGroup, Line, Mesh, PopMatrix,
+                           PushMatrix, Rectangle, RenderContext, Rotate, Scale, ScissorPop, ScissorPush)
+
+from snake_export import STROKE_WIDTH  # Shared with the exporters so files match the screen
+from snake_grid import visible_spans  # Pieces left of partly erased chunks
+
+CHUNK_POINTS = 256  # Points per frozen Line chunk
+MAX_CHUNKS = 32  # Frozen chunks kept as Line instructions before baking
+BATCH_BAKES = 64  # Chunks baked per texture draw while a backing batches, e.g. on load
+MESH_CHUNK_POINTS = 4096  # Points per frozen Mesh chunk of a MeshStroke (at most 32767)
+MITER_LIMIT = 4  # Longest MeshStroke corner, in line widths
+VERTEX_FLOATS = 4  # x, y, u, v: Kivy's default Mesh vertex format
+# Triangle strips index their vertices in order, so every Mesh shares one index buffer
+_STRIP_INDICES = array('H', range(65535))
+# Kivy's default fragment shader with the color inverted, as get_contrasting_color does
+CONTRAST_SHADER = '''
+$HEADER$
+void main(void) {
+    vec4 color = frag_color * texture2D(texture0, tex_coord0);
+    gl_FragColor = vec4(1.0 - color.rgb, color.a);
+}
+'''
+
+
+class StrokeBacking:
+    """Offscreen texture that old stroke chunks are baked into.
+
+    Baked chunks are drawn once into the texture and their Line instructions
+    are dropped, so the canvas keeps showing a long drawing without holding
+    every point in memory.
+    """
+
+    def __init__(self, size):
+        self.fbo = Fbo(size=size)
+        self.fbo.clear_buffer()
+        # Draw the texture under every live stroke
+        self.group = InstructionGroup()
+        self.group.add(Color(1, 1, 1, 1))
+        self.rectangle = Rectangle(texture=self.fbo.texture, pos=(0, 0), size=size)
+        self.group.add(self.rectangle)
+        self.pending = None  # Baked groups waiting for one draw, while batching
+
+    def resize(self, size):
+        """Start a new, empty texture of another size; the caller bakes the drawing again."""
+        if self.pending:
+            self.pending[:] = []
+        self.fbo = Fbo(size=size)
+        self.fbo.clear_buffer()
+        self.rectangle.texture = self.fbo.texture
+        self.rectangle.size = size
+
+    def bake(self, color, line):
+        """Draw one Line into the texture."""
+        group = InstructionGroup()
+        group.add(Color(*color))
+        group.add(line)
+        self.fbo.add(group)
+        if self.pending is None:
+            self.fbo.draw()
+            self.fbo.remove(group)
+            return
+        self.pending.append(group)
+        if len(self.pending) >= BATCH_BAKES:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        """Draw the chunks baked inside the block a few dozen at a time instead of one by one.
+
+        Rebuilding a long drawing bakes thousands of chunks; each texture
+        draw has a fixed cost, so sharing one between many saves most of it.
+        """
+        if self.pending is not None:
+            yield
+            return
+        self.pending = []
+        try:
+            yield
+        finally:
+            self.flush()
+            self.pending = None
+
+    def flush(self):
+        """Draw the chunks baked while batching into the texture."""
+        if self.pending:
+            self.fbo.draw()
+            for group in self.pending:
+                self.fbo.remove(group)
+            self.pending[:] = []
+
+    def repaint(self, box, lines):
+        """Clear a rectangle of the texture and draw (rgba, Line) pairs into it again.
+
+        Used when erased baked segments come back or change on undo: only
+        that region is redrawn, from the segments that cross it.
+        """
+        self.flush()
+        group = InstructionGroup()
+        _push_cleared(group, box)
+        for color, line in lines:
+            group.add(Color(*color))
+            group.add(line)
+        group.add(ScissorPop())
+        self.fbo.add(group)
+        self.fbo.draw()
+        self.fbo.remove(group)
+
+    def clear_boxes(self, boxes):
+        """Clear (x0, y0, x1, y1) rectangles of the texture, e.g. under the eraser's brush."""
+        self.flush()
+        group = InstructionGroup()
+        for box in boxes:
+            _push_cleared(group, box)
+            group.add(ScissorPop())
+        self.fbo.add(group)
+        self.fbo.draw()
+        self.fbo.remove(group)
+
+    def clear(self):
+        """Erase everything baked so far."""
+        # Chunks still waiting to be drawn were baked before the clear too
+        for group in self.pending or ():
+            self.fbo.remove(group)
+        if self.pending:
+            self.pending[:] = []
+        self.fbo.clear_buffer()
+
+
+class SymmetricDrawing:
+    """Draw one group of instructions once per symmetry copy.
+
+    The same ``content`` group is added for every copy, each time between
+    PushMatrix and PopMatrix with the copy's Rotate, and a Scale of -1
+    across the vertical center line for mirrored copies. Copies share the
+    content's vertices, so they cost no memory and no upload, only fill.
+
+    Mirrored copies are drawn in the contrasting colors, like the mirror
+    they replace: they sit in a RenderContext whose shader inverts what
+    the content's own Color instructions and baked texture give.
+    """
+
+    def __init__(self, content=None):
+        self.content = content if content is not None else InstructionGroup()
+        self.group = InstructionGroup()
+        self.group.add(self.content)
+        # One shader for every mirrored copy, compiled once
+        self.contrast = RenderContext(use_parent_projection=True, use_parent_modelview=True,
+                                      use_parent_frag_modelview=True, fs=CONTRAST_SHADER)
+
+    def set_copies(self, copies, center):
+        """Show the content as (angle in degrees, flipped) copies about a center."""
+        # Clear first: the content then ends up with its newest wrapper as parent
+        self.group.clear()
+        self.contrast.clear()
+        for angle, flipped in copies:
+            if not angle and not flipped:
+                self.group.add(self.content)
+                continue
+            target = self.contrast if flipped else self.group
+            target.add(PushMatrix())
+            target.add(Rotate(angle=angle, origin=center))
+            if flipped:
+                target.add(Scale(x=-1, y=1, z=1, origin=center))
+            target.add(self.content)
+            target.add(PopMatrix())
+        if any(flipped for _, flipped in copies):
+            self.group.add(self.contrast)
+
+
+def _push_cleared(group, box):
+    """Add instructions clipping drawing to a box and clearing it; close with a ScissorPop."""
+    x0, y0, x1, y1 = (int(math.floor(box[0])), int(math.floor(box[1])),
+                      int(math.ceil(box[2])), int(math.ceil(box[3])))
+    group.add(ScissorPush(x=x0, y=y0, width=x1 - x0, height=y1 - y0))
+    group.add(ClearColor(0, 0, 0, 0))
+    group.add(ClearBuffers())
+
+
+def _mark_erased(erased, segments, span, dropped):
+    """Record {segment of a stroke: intervals or None} in per-chunk erased maps.
+
+    ``span`` is the segments per chunk and ``dropped`` the chunks no longer
+    drawn. Returns the chunk numbers touched and the segments that fell
+    in dropped chunks.
+    """
+    touched = set()
+    missed = []
+    for segment, intervals in segments.items():
+        number = segment // span
+        if number < dropped:
+            missed.append(segment)
+            continue
+        chunk = erased.setdefault(number, {})
+        if intervals:
+            chunk[segment - number * span] = intervals
+        else:
+            chunk.pop(segment - number * span, None)
+        if not chunk:
+            del erased[number]
+        touched.add(number)
+    return touched, missed
+
+
+def _joined_slice(tail, points, start, stop):
+    """Return floats [start, stop) of a tail list followed by new points, as a list."""
+    held = len(tail)
+    if start >= held:
+        return list(points[start - held:stop - held])
+    return tail[start:stop] + list(points[:max(stop - held, 0)])
+
+
+class ChunkedStroke:
+    """Draw a growing path as frozen Line chunks plus one small active tail.
+
+    Given a shared ``group`` (a StrokeSet color batch) the Lines go into it
+    and the stroke has no Color of its own.
+
+    Erased segments are cut out chunk by chunk: a chunk with gaps draws
+    the piece running to its end in its own Line and every other visible
+    piece in an extra Line, so erasing never touches other chunks.
+    """
+
+    def __init__(self, color, width=STROKE_WIDTH, chunk_points=CHUNK_POINTS, max_points=None,
+                 backing=None, max_chunks=MAX_CHUNKS, group=None):
+        self.width = width
+        self.chunk_size = chunk_points * 2  # Floats per chunk (flat x, y pairs)
+        self.max_points = max_points  # Floats kept on screen, None for unbounded
+        # With a backing, chunks beyond max_chunks are baked instead of kept
+        self.backing = backing
+        self.max_chunks = max_chunks
+        self.rgba = tuple(color) + (1,) * (4 - len(color))
+        if group is None:
+            # Everything lives in one group so new chunks keep the stroke's color
+            self.group = InstructionGroup()
+            self.color = Color(*color)
+            self.group.add(self.color)
+        else:
+            self.group = group
+            self.color = None
+        self.chunks = []  # Frozen Line instructions, oldest first
+        self.trimmed = False  # Set once chunks were dropped or baked away
+        self.dropped = 0  # Chunks dropped or baked away, so chunk numbers stay stable
+        self.erased = {}  # Chunk number -> {segment in chunk: erased intervals}
+        self.cuts = {}  # Line -> (cut point, first whole point) of the piece it draws
+        self.pieces = {}  # Line -> extra Lines drawing the rest of its chunk
+        self.originals = {}  # Frozen Line -> its chunk's points, while it is cut
+        self.recut = False  # Set when the tail's pieces must be found again
+        self.tail_points = []
+        self.tail = self._new_line()
+
+    def _new_line(self):
+        """Create an empty Line at the end of the group."""
+        line = Line(points=[], width=self.width)
+        self.group.add(line)
+        return line
+
+    def extend(self, points):
+        """Append flat (x, y) floats, only re-uploading the active tail chunk.
+
+        Whole chunks are frozen straight from ``points`` and only the last,
+        partial one is kept as the tail, so rebuilding a long path is linear.
+        """
+        tail = self.tail_points
+        total = len(tail) + len(points)
+        start = 0  # Where the next chunk starts, counted over the tail and then points
+        while total - start >= self.chunk_size + 2:
+            stop = start + self.chunk_size
+            # The next chunk starts at this one's last point so the line stays joined
+            self._freeze(_joined_slice(tail, points, start, stop), total - stop + 2)
+            start = stop - 2
+        if start:
+            self.tail_points = _joined_slice(tail, points, start, total)
+        else:
+            tail.extend(points)
+        self._upload()
+
+    def _upload(self):
+        """Hand the tail's points to its Line, from its open piece on if it was cut."""
+        if self.recut:
+            self.recut = False
+            self._cut(self.tail, self.tail_points, self.dropped + len(self.chunks))
+            return
+        cut = self.cuts.get(self.tail)
+        if cut is None:
+            self.tail.points = self.tail_points
+        else:
+            head, start = cut
+            self.tail.points = head + self.tail_points[2 * start:]
+
+    def _cut(self, line, points, number):
+        """Draw a chunk's points in its Line and extra Lines, around its erased segments."""
+        for extra in self.pieces.pop(line, ()):
+            self.group.remove(extra)
+        erased = self.erased.get(number)
+        if not erased:
+            self.cuts.pop(line, None)
+            line.points = points
+            return
+        closed, (head, start) = visible_spans(points, erased)
+        self.cuts[line] = (head, start)
+        extras = self.pieces[line] = []
+        for piece_head, first, end, tail in closed:
+            extra = Line(points=piece_head + list(points[2 * first:2 * end]) + tail, width=self.width)
+            self.group.add(extra)
+            extras.append(extra)
+        line.points = head + list(points[2 * start:])
+
+    def _discard(self, line):
+        """Forget the cut state of a Line leaving the stroke and return its extra Lines."""
+        self.cuts.pop(line, None)
+        self.originals.pop(line, None)
+        extras = self.pieces.pop(line, [])
+        for extra in extras:
+            self.group.remove(extra)
+        return extras
+
+    def _freeze(self, points, remaining):
+        """Draw a full chunk's points in the tail's Line, freeze it and start a new tail.
+
+        ``remaining`` counts the floats still to come after the chunk,
+        from its last point on.
+        """
+        number = self.dropped + len(self.chunks)
+        if number in self.erased:
+            self.originals[self.tail] = points
+        self._cut(self.tail, points, number)
+        self.chunks.append(self.tail)
+        self.tail = self._new_line()
+        self.recut = number + 1 in self.erased
+
+        # Drop whole chunks from the front once the stroke is over its limit
+        if self.max_points is not None:
+            while self.chunks and len(self.chunks) * self.chunk_size + remaining > self.max_points:
+                line = self.chunks.pop(0)
+                self.group.remove(line)
+                self._discard(line)
+                self.erased.pop(self.dropped, None)
+                self.dropped += 1
+                self.trimmed = True
+        elif self.backing is not None:
+            while len(self.chunks) > self.max_chunks:
+                line = self.chunks.pop(0)
+                self.group.remove(line)
+                self.backing.bake(self.rgba, line)
+                for extra in self._discard(line):
+                    self.backing.bake(self.rgba, extra)
+                self.erased.pop(self.dropped, None)
+                self.dropped += 1
+                self.trimmed = True
+
+    def erase_segments(self, segments):
+        """Cut or restore segments, given as {segment of the stroke: intervals or None}.
+
+        Only the chunks holding those segments are re-uploaded. Returns the
+        segments that could not be shown because their chunks were
+        dropped or baked away.
+        """
+        touched, missed = _mark_erased(self.erased, segments, self.chunk_size // 2 - 1, self.dropped)
+        for number in touched:
+            index = number - self.dropped
+            if index >= len(self.chunks):
+                self.recut_tail()
+                continue
+            line = self.chunks[index]
+            points = self.originals.get(line)
+            if points is None:
+                points = list(line.points)
+            if number in self.erased:
+                self.originals[line] = points
+            else:
+                self.originals.pop(line, None)
+            self._cut(line, points, number)
+        return missed
+
+    def recut_tail(self):
+        """Find the tail's visible pieces again, e.g. after marking segments before adding points."""
+        self.recut = True
+        self._upload()
+
+    def replace_last(self, x, y):
+        """Move the stroke's last point, re-uploading only the tail."""
+        if len(self.tail_points) > 2 or not self.chunks:
+            self.tail_points[-2:] = (x, y)
+            self._upload()
+        else:
+            # The tail only holds the join point; reopen the frozen chunk it ends
+            self.pop_tail(2)
+            self.extend((x, y))
+
+    def pop_tail(self, count):
+        """Remove the last ``count`` floats, reopening frozen chunks as needed.
+
+        Returns False when the removal reaches points whose chunks were
+        already dropped or baked, in which case the caller must redraw.
+        """
+        while count > 0:
+            keep = len(self.tail_points) - count
+            if keep >= 2 or not self.chunks:
+                del self.tail_points[max(keep, 0):]
+                if keep < 0 and self.trimmed:
+                    self._prune()
+                    return False
+                break
+            # The tail's first point repeats the last frozen one; reopen that chunk
+            count -= len(self.tail_points) - 2
+            self.group.remove(self.tail)
+            self._discard(self.tail)
+            line = self.chunks.pop()
+            self.tail_points = list(self.originals.get(line) or line.points)
+            self._discard(line)
+            self.tail = line
+        self._prune()
+        return True
+
+    def _prune(self):
+        """Forget erased segments past the end of a shortened tail and re-upload it."""
+        number = self.dropped + len(self.chunks)
+        for later in [later for later in self.erased if later > number]:
+            del self.erased[later]
+        erased = self.erased.get(number)
+        if erased:
+            segments = len(self.tail_points) // 2 - 1
+            for segment in [segment for segment in erased if segment >= segments]:
+                del erased[segment]
+            if not erased:
+                del self.erased[number]
+        self.recut = number in self.erased or self.tail in self.cuts
+        self._upload()
+
+    def __len__(self):
+        """Floats drawn, counting each join point once."""
+        return len(self.chunks) * (self.chunk_size - 2) + len(self.tail_points)
+
+    def set_points(self, points):
+        """Replace the whole stroke with the given flat (x, y) floats."""
+        self.clear()
+        self.extend(points)
+
+    def clear(self):
+        """Remove every chunk and start again with an empty tail."""
+        for line in self.chunks:
+            self.group.remove(line)
+            self._discard(line)
+        self._discard(self.tail)
+        self.chunks = []
+        self.trimmed = False
+        self.dropped = 0
+        self.erased = {}
+        self.recut = False
+        self.tail_points = []
+        self.tail.points = []
+
+    def remove(self):
+        """Take every Line of the stroke out of its group."""
+        self.clear()
+        self.group.remove(self.tail)
+
+
+def _strip_vertices(vertices, points, first, before, after, width, last=None):
+    """Write the two strip vertices of every point from index ``first`` on (up to ``last``).
+
+    Each point is offset by ``width`` on both sides (as Kivy's Line does)
+    along the bisector of its segments, so corners get a miter join.
+    ``before`` and ``after`` are the neighbors past either end, if any.
+    """
+    count = len(points) // 2
+    for i in range(first, count if last is None else min(last, count)):
+        x, y = points[2 * i], points[2 * i + 1]
+        if i:
+            previous = points[2 * i - 2], points[2 * i - 1]
+        else:
+            previous = before
+        if i + 1 < count:
+            following = points[2 * i + 2], points[2 * i + 3]
+        else:
+            following = after
+
+        # Unit directions of the incoming and outgoing segments; repeated points have none
+        dx_in = dy_in = dx_out = dy_out = 0.0
+        if previous:
+            dx_in, dy_in = x - previous[0], y - previous[1]
+            length = math.hypot(dx_in, dy_in)
+            if length:
+                dx_in, dy_in = dx_in / length, dy_in / length
+        if following:
+            dx_out, dy_out = following[0] - x, following[1] - y
+            length = math.hypot(dx_out, dy_out)
+            if length:
+                dx_out, dy_out = dx_out / length, dy_out / length
+
+        tx, ty = dx_in + dx_out, dy_in + dy_out
+        length = math.hypot(tx, ty)
+        if length < 1e-6:
+            # An end point or a full reversal: square off along whichever segment exists
+            tx, ty = (dx_in, dy_in) if dx_in or dy_in else (dx_out, dy_out)
+            length = math.hypot(tx, ty) or 1.0
+        tx, ty = tx / length, ty / length
+        offset = width
+        if (dx_in or dy_in) and (dx_out or dy_out):
+            # Stretch the corner so both segments keep their width, up to the miter limit
+            offset = width / max(tx * dx_in + ty * dy_in, 1 / MITER_LIMIT)
+        nx, ny = -ty * offset, tx * offset
+        v = i * 2 * VERTEX_FLOATS
+        vertices[v] = x + nx
+        vertices[v + 1] = y + ny
+        vertices[v + 4] = x - nx
+        vertices[v + 5] = y - ny
+
+
+def _piece_vertices(points, vertices, head, start, end, tail, width):
+    """Return strip vertices for a piece of a chunk: ``head``, points start to end - 1, ``tail``.
+
+    Whole points keep the vertices ``vertices`` already holds for the
+    chunk; only those next to a cut, whose neighbors changed, are written.
+    """
+    piece = head + list(points[2 * start:2 * end]) + tail
+    count = len(piece) // 2
+    size = 2 * VERTEX_FLOATS  # Floats per point
+    result = array('f', bytes(4 * size * count))
+    offset = len(head) // 2
+    result[offset * size:(offset + end - start) * size] = vertices[start * size:end * size]
+    if head or start:
+        _strip_vertices(result, piece, 0, None, None, width, offset + 1)
+    if tail or end < len(points) // 2:
+        _strip_vertices(result, piece, max(offset + end - start - 1, 0), None, None, width)
+    return result
+
+
+class MeshStroke:
+    """Draw a growing path as triangle strips in Mesh vertex buffers.
+
+    A drop-in alternative to ChunkedStroke for very large drawings: Kivy
+    re-tessellates a wide Line whenever its points change, while here each
+    new point only writes its own two vertices (and re-joins the one
+    before it) into a preallocated buffer. Full chunks are frozen as
+    Meshes that are never touched again, except to cut erased segments
+    out like ChunkedStroke does, with extra Meshes for the cut-off pieces.
+    """
+
+    def __init__(self, color, width=STROKE_WIDTH, chunk_points=MESH_CHUNK_POINTS, max_points=None,
+                 backing=None, max_chunks=MAX_CHUNKS, group=None):
+        self.width = width
+        self.chunk_points = chunk_points
+        self.chunk_size = chunk_points * 2  # Floats per chunk (flat x, y pairs)
+        self.max_points = max_points  # Floats kept on screen, None for unbounded
+        self.backing = backing
+        self.max_chunks = max_chunks
+        self.rgba = tuple(color) + (1,) * (4 - len(color))
+        if group is None:
+            self.group = InstructionGroup()
+            self.color = Color(*color)
+            self.group.add(self.color)
+        else:
+            self.group = group
+            self.color = None
+        self.chunks = []  # Frozen (mesh, points, vertices, point before), oldest first
+        self.trimmed = False  # Set once chunks were dropped or baked away
+        self.dropped = 0  # Chunks dropped or baked away, so chunk numbers stay stable
+        self.erased = {}  # Chunk number -> {segment in chunk: erased intervals}
+        self.cuts = {}  # Mesh -> (cut point, first whole point) of the piece it draws
+        self.pieces = {}  # Mesh -> extra Meshes drawing the rest of its chunk
+        self.recut = False  # Set when the tail's pieces must be found again
+        self.tail_points = []
+        self.before = None  # The point before the tail's first one, for its join
+        self.tail, self.vertices = self._new_mesh()
+
+    def _new_mesh(self):
+        """Create an empty Mesh with room for a whole chunk at the end of the group."""
+        vertices = array('f', bytes(4 * VERTEX_FLOATS * 2 * self.chunk_points))
+        mesh = Mesh(mode='triangle_strip', vertices=[], indices=[])
+        self.group.add(mesh)
+        return mesh, vertices
+
+    def _upload(self, first):
+        """Rewrite the tail's vertices from point ``first`` on and hand them to its Mesh."""
+        _strip_vertices(self.vertices, self.tail_points, max(first, 0), self.before, None, self.width)
+        if self.recut:
+            self.recut = False
+            self._cut(self.tail, self.tail_points, self.vertices, self.dropped + len(self.chunks))
+        self._show(self.tail, self.tail_points, self.vertices)
+
+    def _show(self, mesh, points, vertices):
+        """Hand a chunk's vertices to its Mesh, from its open piece on if it was cut."""
+        cut = self.cuts.get(mesh)
+        if cut is not None:
+            head, start = cut
+            vertices = _piece_vertices(points, vertices, head, start, len(points) // 2, [], self.width)
+            count = len(vertices) // VERTEX_FLOATS
+        else:
+            count = len(points)  # Two vertices per point, one per float
+        if count < 4:
+            mesh.vertices, mesh.indices = [], []
+            return
+        mesh.vertices = memoryview(vertices)[:count * VERTEX_FLOATS]
+        mesh.indices = memoryview(_STRIP_INDICES)[:count]
+
+    def _cut(self, mesh, points, vertices, number):
+        """Find a chunk's visible pieces and draw all but its open one in extra Meshes."""
+        self._discard(mesh)
+        erased = self.erased.get(number)
+        if not erased:
+            return
+        closed, cut = visible_spans(points, erased)
+        self.cuts[mesh] = cut
+        extras = self.pieces[mesh] = []
+        for head, start, end, tail in closed:
+            piece = _piece_vertices(points, vertices, head, start, end, tail, self.width)
+            extra = Mesh(mode='triangle_strip', vertices=piece,
+                         indices=memoryview(_STRIP_INDICES)[:len(piece) // VERTEX_FLOATS])
+            self.group.add(extra)
+            extras.append(extra)
+
+    def _discard(self, mesh):
+        """Forget the cut state of a Mesh and return its extra Meshes, taken out of the group."""
+        self.cuts.pop(mesh, None)
+        extras = self.pieces.pop(mesh, [])
+        for extra in extras:
+            self.group.remove(extra)
+        return extras
+
+    def extend(self, points):
+        """Append flat (x, y) floats, writing only the new vertices and the join before them.
+
+        As in ChunkedStroke, whole chunks are frozen straight from ``points``.
+        """
+        tail = self.tail_points
+        first = len(tail) // 2 - 1
+        total = len(tail) + len(points)
+        start = 0  # Where the next chunk starts, counted over the tail and then points
+        while total - start >= self.chunk_size + 2:
+            stop = start + self.chunk_size
+            self._freeze(_joined_slice(tail, points, start, stop), _joined_slice(tail, points, stop, stop + 2),
+                         first, total - stop + 2)
+            start = stop - 2
+            first = 0
+        if start:
+            self.tail_points = _joined_slice(tail, points, start, total)
+        else:
+            tail.extend(points)
+        self._upload(first)
+
+    def _freeze(self, points, after, first, remaining):
+        """Write a full chunk's vertices from point ``first`` on, freeze it and start a new tail.
+
+        ``after`` is the point following the chunk, for its last join, and
+        ``remaining`` counts the floats still to come from the chunk's last point on.
+        """
+        _strip_vertices(self.vertices, points, max(first, 0), self.before, after, self.width)
+        number = self.dropped + len(self.chunks)
+        if number in self.erased or self.tail in self.cuts:
+            self._cut(self.tail, points, self.vertices, number)
+        self._show(self.tail, points, self.vertices)
+        self.chunks.append((self.tail, array('f', points), self.vertices, self.before))
+        # The new tail starts at the frozen chunk's last point so the strip stays joined
+        self.before = tuple(points[-4:-2])
+        self.tail, self.vertices = self._new_mesh()
+        self.recut = number + 1 in self.erased
+
+        if self.max_points is not None:
+            while self.chunks and len(self.chunks) * self.chunk_size + remaining > self.max_points:
+                mesh = self.chunks.pop(0)[0]
+                self.group.remove(mesh)
+                self._discard(mesh)
+                self.erased.pop(self.dropped, None)
+                self.dropped += 1
+                self.trimmed = True
+        elif self.backing is not None:
+            while len(self.chunks) > self.max_chunks:
+                mesh = self.chunks.pop(0)[0]
+                self.group.remove(mesh)
+                self.backing.bake(self.rgba, mesh)
+                for extra in self._discard(mesh):
+                    self.backing.bake(self.rgba, extra)
+                self.erased.pop(self.dropped, None)
+                self.dropped += 1
+                self.trimmed = True
+
+    def erase_segments(self, segments):
+        """Cut or restore segments, given as {segment of the stroke: intervals or None}.
+
+        Only the chunks holding those segments are re-uploaded; see
+        ChunkedStroke.erase_segments.
+        """
+        touched, missed = _mark_erased(self.erased, segments, self.chunk_points - 1, self.dropped)
+        for number in touched:
+            index = number - self.dropped
+            if index >= len(self.chunks):
+                self.recut_tail()
+                continue
+            mesh, points, vertices, before = self.chunks[index]
+            self._cut(mesh, points, vertices, number)
+            self._show(mesh, points, vertices)
+        return missed
+
+    def recut_tail(self):
+        """Find the tail's visible pieces again, e.g. after marking segments before adding points."""
+        self.recut = True
+        self._upload(len(self.tail_points) // 2)
+
+    def replace_last(self, x, y):
+        """Move the stroke's last point, rewriting only its vertices and its neighbor's."""
+        if len(self.tail_points) > 2 or not self.chunks:
+            self.tail_points[-2:] = (x, y)
+            self._upload(len(self.tail_points) // 2 - 2)
+        else:
+            # The tail only holds the join point; reopen the frozen chunk it ends
+            self.pop_tail(2)
+            self.extend((x, y))
+
+    def pop_tail(self, count):
+        """Remove the last ``count`` floats, reopening frozen chunks as needed.
+
+        Returns False when the removal reaches points whose chunks were
+        already dropped or baked, in which case the caller must redraw.
+        """
+        while count > 0:
+            keep = len(self.tail_points) - count
+            if keep >= 2 or not self.chunks:
+                del self.tail_points[max(keep, 0):]
+                if keep < 0 and self.trimmed:
+                    self._prune()
+                    return False
+                break
+            # The tail's first point repeats the last frozen one; reopen that chunk
+            count -= len(self.tail_points) - 2
+            self.group.remove(self.tail)
+            self._discard(self.tail)
+            self.tail, points, self.vertices, self.before = self.chunks.pop()
+            self._discard(self.tail)
+            self.tail_points = points.tolist()
+        self._prune()
+        return True
+
+    def _prune(self):
+        """Forget erased segments past the end of a shortened tail and re-upload it."""
+        number = self.dropped + len(self.chunks)
+        for later in [later for later in self.erased if later > number]:
+            del self.erased[later]
+        erased = self.erased.get(number)
+        if erased:
+            segments = len(self.tail_points) // 2 - 1
+            for segment in [segment for segment in erased if segment >= segments]:
+                del erased[segment]
+            if not erased:
+                del self.erased[number]
+        self.recut = number in self.erased or self.tail in self.cuts
+        self._upload(len(self.tail_points) // 2 - 1)
+
+    def __len__(self):
+        """Floats drawn, counting each join point once."""
+        return len(self.chunks) * (self.chunk_size - 2) + len(self.tail_points)
+
+    def set_points(self, points):
+        """Replace the whole stroke with the given flat (x, y) floats."""
+        self.clear()
+        self.extend(points)
+
+    def clear(self):
+        """Remove every chunk and start again with an empty tail."""
+        for mesh, points, vertices, before in self.chunks:
+            self.group.remove(mesh)
+            self._discard(mesh)
+        self._discard(self.tail)
+        self.chunks = []
+        self.trimmed = False
+        self.dropped = 0
+        self.erased = {}
+        self.recut = False
+        self.tail_points = []
+        self.before = None
+        self._upload(0)
+
+    def remove(self):
+        """Take every Mesh of the stroke out of its group."""
+        self.clear()
+        self.group.remove(self.tail)
+
+
+class StrokeSet:
+    """One path drawn as a stroke per color run, batched into one group per color.
+
+    Each color gets a single InstructionGroup holding its Color and the Lines
+    of every stroke in that color, so the number of Color changes while
+    drawing grows with the colors used, not with the strokes.
+    """
+
+    def __init__(self, color, stroke=ChunkedStroke, **options):
+        self.stroke = stroke  # ChunkedStroke, or MeshStroke for very large drawings
+        self.options = options  # Passed on to every stroke
+        self.max_points = options.get('max_points')
+        self.group = InstructionGroup()
+        self.batches = {}  # RGB tuple -> InstructionGroup
+        self.strokes = []  # Oldest first; the last one is being drawn
+        self.start_stroke(color)
+
+    def _batch(self, color):
+        """Return the group for a color, creating it on first use."""
+        color = tuple(color)
+        batch = self.batches.get(color)
+        if batch is None:
+            batch = self.batches[color] = InstructionGroup()
+            batch.add(Color(*color))
+            self.group.add(batch)
+        return batch
+
+    def start_stroke(self, color):
+        """Start a stroke in a new color, joined to the end of the current one."""
+        join = self.strokes[-1].tail_points[-2:] if self.strokes else []
+        stroke = self.stroke(color, group=self._batch(color), **self.options)
+        stroke.extend(join)
+        self.strokes.append(stroke)
+
+    def remove_stroke(self):
+        """Drop the newest stroke, e.g. when its color change was undone.
+
+        Returns False when it is the only one left, in which case the
+        caller must redraw from the path's color runs.
+        """
+        if len(self.strokes) > 1:
+            self.strokes.pop().remove()
+            return True
+        return False
+
+    def extend(self, points):
+        """Append flat (x, y) floats to the current stroke."""
+        self.strokes[-1].extend(points)
+        if self.max_points is not None:
+            # Forget whole old strokes once the path is over its limit
+            while len(self.strokes) > 1 and sum(map(len, self.strokes)) > self.max_points:
+                self.strokes.pop(0).remove()
+
+    def replace_last(self, x, y):
+        """Move the last point of the current stroke."""
+        self.strokes[-1].replace_last(x, y)
+
+    def pop_tail(self, count):
+        """Remove floats from the current stroke; False means a redraw is needed."""
+        return self.strokes[-1].pop_tail(count)
+
+    def set_runs(self, runs, erased=None, starts=None):
+        """Rebuild every stroke from (rgb, points) runs, oldest first.
+
+        ``erased`` and ``starts`` are as for ``erase_segments``; the gaps are
+        marked before the points arrive so chunks are cut before any is baked.
+        """
+        for stroke in self.strokes:
+            stroke.remove()
+        self.strokes = []
+        runs = list(runs)
+        located = self._locate(erased, starts, len(runs)) if erased else {}
+        for index, (color, points) in enumerate(runs):
+            stroke = self.stroke(color, group=self._batch(color), **self.options)
+            segments = located.get(index)
+            if segments:
+                stroke.erase_segments({segment: erased[segment_id] for segment, segment_id in segments.items()})
+            stroke.extend(points)
+            if segments:
+                stroke.recut_tail()
+            self.strokes.append(stroke)
+
+    def _locate(self, ids, starts, count=None):
+        """Return {stroke index: {segment of the stroke: segment id}} for path segment ids.
+
+        ``starts`` are the float offsets the path's color runs begin at, the
+        last ``count`` of which (all strokes by default) line up with strokes.
+        """
+        if count is None:
+            count = len(self.strokes)
+        offset = count - len(starts)
+        located = {}
+        for segment_id in ids:
+            run = bisect_right(starts, 2 * segment_id) - 1
+            if run >= 0 and run + offset >= 0:
+                located.setdefault(run + offset, {})[segment_id - starts[run] // 2] = segment_id
+        return located
+
+    def erase_segments(self, erased, starts):
+        """Cut or restore segments of the path, given as {segment id: intervals or None}.
+
+        Only the chunks holding them are re-uploaded. Returns the ids whose
+        chunks were already baked or dropped, so the caller can repaint them.
+        """
+        missed = []
+        for index, segments in self._locate(erased, starts).items():
+            cut = {segment: erased[segment_id] for segment, segment_id in segments.items()}
+            missed.extend(segments[segment] for segment in self.strokes[index].erase_segments(cut))
+        return missed
+
+    def baked_segments(self, ids, starts):
+        """Return the ids among ``ids`` whose chunks are no longer drawn as instructions."""
+        baked = []
+        for index, segments in self._locate(ids, starts).items():
+            stroke = self.strokes[index]
+            span = stroke.chunk_size // 2 - 1
+            baked.extend(segment_id for segment, segment_id in segments.items() if segment // span < stroke.dropped)
+        return baked
+
+
+class SwarmMesh:
+    """Draw a Swarm's shared vertex buffer as one line Mesh per color batch.
+
+    The Meshes read the swarm's float32 buffer directly, so a frame's
+    upload is one buffer hand-off per batch however many snakes there are.
+    """
+
+    def __init__(self, swarm):
+        self.swarm = swarm
+        self.group = InstructionGroup()
+        self.meshes = []
+        self.rebuild()
+
+    def rebuild(self):
+        """Recreate the Meshes, e.g. after snakes were added."""
+        self.group.clear()
+        self.meshes = []
+        color = None
+        for rgb, first, end in self.swarm.batches:
+            if rgb != color:
+                self.group.add(Color(*rgb))
+                color = rgb
+            # Every segment owns its two vertices, so the indices never change
+            mesh = Mesh(mode='lines', indices=array('H', range((end - first) * 2 * self.swarm.segments)),
+                        vertices=self.swarm.batch_vertices(first, end))
+            self.group.add(mesh)
+            self.meshes.append((mesh, first, end))
+
+    def update(self):
+        """Upload the swarm's latest segments."""
+        for mesh, first, end in self.meshes:
+            mesh.vertices = self.swarm.batch_vertices(first, end)
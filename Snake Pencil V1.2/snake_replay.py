@@ -0,0 +1,275 @@
+# Snake Pencil V1.2
+# Session recording to a compact binary log, and deterministic replay without a window.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import argparse
+import os
+import random
+import struct
+import time
+
+from snake_codec import read_text, read_varint, write_text, write_varint
+from snake_engine import SnakeEngine
+from snake_symmetry import DEFAULT_FOLDS, DEFAULT_SYMMETRY
+
+MAGIC = b'SNKR'
+VERSION = 2
+# Header: version, seed, width, height, tick rate, history mode, automatic mode,
+# color, pattern angle, pattern radius, simplify tolerance
+_HEADER = struct.Struct('<BQffdBB3fddf')
+
+# Event opcodes; every event is a varint tick delta, the opcode, then its payload
+END = 0
+KEY_DOWN = 1
+KEY_UP = 2
+FAST = 3
+AUTO = 4
+PATTERN = 5
+TEMPLATE = 6
+COLOR = 7
+UNDO = 8
+REDO = 9
+CLEAR = 10
+RESIZE = 11
+GAME = 12
+ERASE = 13
+ERASE_END = 14
+SYMMETRY = 15
+
+_COLOR = struct.Struct('<3f')
+_SIZE = struct.Struct('<2f')
+_BRUSH = struct.Struct('<3d')  # x, y, radius; doubles so replays erase exactly the same
+
+
+class SessionRecorder:
+    """Append a pad's input to a binary session log, stamped with engine ticks.
+
+    Starting a recording clears the drawing and reseeds the engine's random
+    generator, so the log plus its header reproduce the session exactly.
+    Events are a few bytes each: a varint tick delta, an opcode and a
+    payload, with held keys recorded only when they change.
+    """
+
+    def __init__(self, engine, path, seed=None):
+        self.engine = engine
+        self.path = path
+        self.seed = random.randrange(1 << 63) if seed is None else seed
+        engine.clear()
+        engine.random.seed(self.seed)
+        self.base_tick = self.last_tick = engine.tick_count
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.file.write(_HEADER.pack(
+            VERSION, self.seed, engine.width, engine.height, engine.timestep.tick_rate,
+            engine.history_mode, engine.automatic_mode, *engine.current_color,
+            engine.pattern_angle, engine.pattern_radius, engine.simplify_tolerance))
+        write_text(self.file, engine.selected_pattern)
+        if engine.game_mode:
+            self.game(True)
+        if (engine.symmetry, engine.symmetry_folds) != (DEFAULT_SYMMETRY, DEFAULT_FOLDS):
+            self.symmetry(engine.symmetry, engine.symmetry_folds)
+
+    def _event(self, opcode):
+        """Write an event's tick delta and opcode."""
+        tick = self.engine.tick_count
+        write_varint(self.file, tick - self.last_tick)
+        self.file.write(bytes((opcode,)))
+        self.last_tick = tick
+
+    def key_down(self, key_char):
+        self._event(KEY_DOWN)
+        write_text(self.file, key_char)
+
+    def key_up(self, key_char):
+        self._event(KEY_UP)
+        write_text(self.file, key_char)
+
+    def fast(self, value):
+        self._event(FAST)
+        self.file.write(bytes((bool(value),)))
+
+    def automatic(self, value):
+        self._event(AUTO)
+        self.file.write(bytes((bool(value),)))
+
+    def pattern(self, name):
+        self._event(PATTERN)
+        write_text(self.file, name)
+
+    def template(self, key_char):
+        self._event(TEMPLATE)
+        write_text(self.file, key_char)
+
+    def color(self, color):
+        self._event(COLOR)
+        self.file.write(_COLOR.pack(*color[:3]))
+
+    def undo(self):
+        self._event(UNDO)
+
+    def redo(self):
+        self._event(REDO)
+
+    def clear(self):
+        self._event(CLEAR)
+
+    def resize(self, width, height):
+        self._event(RESIZE)
+        self.file.write(_SIZE.pack(width, height))
+
+    def game(self, value):
+        self._event(GAME)
+        self.file.write(bytes((bool(value),)))
+
+    def erase(self, x, y, radius):
+        self._event(ERASE)
+        self.file.write(_BRUSH.pack(x, y, radius))
+
+    def end_erase(self):
+        self._event(ERASE_END)
+
+    def symmetry(self, mode, folds):
+        self._event(SYMMETRY)
+        write_text(self.file, mode)
+        write_varint(self.file, folds)
+
+    def close(self):
+        """Mark the final tick and close the log."""
+        if not self.file.closed:
+            self._event(END)
+            self.file.close()
+
+
+def read_session(path):
+    """Return a session log's header as a dict and a generator of (tick, opcode, payload)."""
+    file = open(path, 'rb')
+    if file.read(len(MAGIC)) != MAGIC:
+        file.close()
+        raise ValueError(f"{path} is not a Snake Pencil session log")
+    values = _HEADER.unpack(file.read(_HEADER.size))
+    if values[0] != VERSION:
+        file.close()
+        raise ValueError(f"Unsupported session log version {values[0]}")
+    header = {
+        'seed': values[1], 'width': values[2], 'height': values[3], 'tick_rate': values[4],
+        'history_mode': bool(values[5]), 'automatic_mode': bool(values[6]),
+        'color': tuple(values[7:10]), 'pattern_angle': values[10], 'pattern_radius': values[11],
+        'simplify_tolerance': values[12], 'selected_pattern': read_text(file)
+    }
+
+    def events():
+        tick = 0
+        with file:
+            while True:
+                tick += read_varint(file)
+                opcode = file.read(1)[0]
+                if opcode in (KEY_DOWN, KEY_UP, PATTERN, TEMPLATE):
+                    payload = read_text(file)
+                elif opcode in (FAST, AUTO, GAME):
+                    payload = bool(file.read(1)[0])
+                elif opcode == COLOR:
+                    payload = _COLOR.unpack(file.read(_COLOR.size))
+                elif opcode == RESIZE:
+                    payload = _SIZE.unpack(file.read(_SIZE.size))
+                elif opcode == ERASE:
+                    payload = _BRUSH.unpack(file.read(_BRUSH.size))
+                elif opcode == SYMMETRY:
+                    payload = (read_text(file), read_varint(file))
+                else:
+                    payload = None
+                yield tick, opcode, payload
+                if opcode == END:
+                    return
+
+    return header, events()
+
+
+def replay(path, templates=None, listener=None):
+    """Run a recorded session through a fresh engine as fast as possible and return it.
+
+    No time is simulated: each tick is a plain ``step``, so thousands run
+    per second. ``templates`` must match the recording's key bindings if
+    they were changed; ``listener`` can watch the drawing being rebuilt.
+    """
+    header, events = read_session(path)
+    engine = SnakeEngine(header['width'], header['height'], history_mode=header['history_mode'],
+                         seed=header['seed'], tick_rate=header['tick_rate'], color=header['color'])
+    engine.automatic_mode = header['automatic_mode']
+    engine.selected_pattern = header['selected_pattern']
+    engine.pattern_angle = header['pattern_angle']
+    engine.pattern_radius = header['pattern_radius']
+    engine.simplify_tolerance = header['simplify_tolerance']
+    if templates is not None:
+        engine.templates = templates
+    if listener is not None:
+        engine.add_listener(listener)
+
+    key_pressed = {}
+    fast_mode = False
+    for tick, opcode, payload in events:
+        while engine.tick_count < tick:
+            engine.step(key_pressed, fast_mode)
+        if opcode == KEY_DOWN:
+            key_pressed[payload] = True
+        elif opcode == KEY_UP:
+            key_pressed.pop(payload, None)
+            engine.end_stroke()
+        elif opcode == FAST:
+            fast_mode = payload
+        elif opcode == AUTO:
+            engine.automatic_mode = payload
+        elif opcode == PATTERN:
+            engine.selected_pattern = payload
+        elif opcode == TEMPLATE:
+            engine.add_template(payload)
+        elif opcode == COLOR:
+            engine.set_color(payload)
+        elif opcode == UNDO:
+            engine.undo()
+        elif opcode == REDO:
+            engine.redo()
+        elif opcode == CLEAR:
+            engine.clear()
+        elif opcode == RESIZE:
+            engine.resize(*payload)
+        elif opcode == GAME:
+            engine.game_mode = payload
+        elif opcode == ERASE:
+            engine.erase(*payload)
+        elif opcode == ERASE_END:
+            engine.end_erase()
+        elif opcode == SYMMETRY:
+            engine.set_symmetry(*payload)
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a Snake Pencil session log without a window.')
+    parser.add_argument('log', help='session log written by the R key')
+    parser.add_argument('--png', help='render the final frame to this PNG')
+    parser.add_argument('--svg', help='export the final drawing to this SVG or PDF')
+    parser.add_argument('--scale', type=float, default=1, help='output size relative to the window')
+    parser.add_argument('--templates', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates'),
+                        help='template folder the session was recorded with')
+    args = parser.parse_args(argv)
+
+    from snake_catalog import TemplateCatalog
+    templates = TemplateCatalog(args.templates).bindings()
+    start = time.perf_counter()
+    engine = replay(args.log, templates=templates)
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {engine.tick_count} ticks in {elapsed:.2f}s "
+          f"({engine.tick_count / max(elapsed, 1e-9):.0f} ticks/s)")
+    if args.png:
+        from snake_raster import render_png
+        render_png(args.png, engine.iter_drawing, engine.width, engine.height,
+                   int(engine.width * args.scale), int(engine.height * args.scale))
+        print(f"Final frame rendered to {args.png}")
+    if args.svg:
+        from snake_export import export_drawing
+        export_drawing(args.svg, engine, scale=args.scale)
+        print(f"Final drawing exported to {args.svg}")
+
+
+if __name__ == '__main__':
+    main()
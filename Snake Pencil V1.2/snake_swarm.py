@@ -0,0 +1,157 @@
+# Snake Pencil V1.2
+# Swarms of automatic snakes advanced together in vectorized steps.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import math
+
+try:
+    import numpy  # Required here: the whole swarm moves in array operations
+except ImportError:
+    numpy = None
+
+from snake_patterns import PATTERNS, STEP, ParametricPattern, get_pattern
+
+TRAIL_SEGMENTS = 127  # Segments kept per snake; older ones are overwritten
+MESH_VERTICES = 65535  # Most vertices one Kivy Mesh can index (16-bit indices)
+VERTEX_FLOATS = 4  # x, y, u, v: Kivy's default Mesh vertex format
+JITTER = 5  # Pixels per reference tick moved by snakes on the random pattern
+DEFAULT_PALETTE = ((1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0), (1, 0.5, 0), (0, 1, 1), (1, 0, 1), (1, 1, 1))
+
+
+class Swarm:
+    """Many automatic snakes, each with its own pattern, phase, speed, size and color.
+
+    State is kept as parallel arrays (snake i is row i of each), and ``step``
+    advances every snake at once: each pattern in use is evaluated once over
+    all of its snakes. Trails go straight into ``vertices``, one shared
+    float32 buffer of line segments shaped (snakes, segments, 2, 4) in
+    Kivy's Mesh vertex format; a tick overwrites each trail's oldest segment,
+    so the buffer never grows and never needs repacking.
+    """
+
+    def __init__(self, width, height, segments=TRAIL_SEGMENTS, step_scale=1, seed=None):
+        if numpy is None:
+            raise RuntimeError("Swarms need numpy")
+        self.width = width
+        self.height = height
+        self.segments = segments
+        self.step_scale = step_scale
+        self.random = numpy.random.default_rng(seed)
+        self.names = list(PATTERNS)  # Pattern index -> name, fixed when the swarm is made
+        self.tick = 0
+        self.segment = 0  # Segment slot written last
+        self.pattern = numpy.zeros(0, numpy.int32)
+        self.phase = numpy.zeros(0)
+        self.speed = numpy.zeros(0)
+        self.radius = numpy.zeros(0)
+        self.center = numpy.zeros((0, 2))
+        self.color = numpy.zeros((0, 3), numpy.float32)
+        self.head = numpy.zeros((0, 2), numpy.float32)
+        self.vertices = numpy.zeros((0, segments, 2, VERTEX_FLOATS), numpy.float32)
+        self.groups = []  # (pattern, row indices) for every pattern in use
+        self.batches = []  # (rgb, first row, end row): same-colored rows that fit one Mesh
+
+    def __len__(self):
+        return len(self.pattern)
+
+    @property
+    def rows_per_mesh(self):
+        return MESH_VERTICES // (2 * self.segments)
+
+    def add(self, patterns, centers, radii, phases, speeds, colors):
+        """Add snakes from parallel sequences: pattern names, (x, y) centers, sizes,
+        phases in radians, speeds relative to one pattern step per tick, and RGB colors.
+
+        New snakes are sorted by color so every color is drawn in as few Meshes as possible.
+        """
+        colors = numpy.asarray(colors, numpy.float32).reshape(-1, 3)
+        order = numpy.lexsort(colors.T[::-1])
+        count = len(order)
+        indices = numpy.array([self.names.index(name if name in PATTERNS else 'circle') for name in patterns],
+                              numpy.int32)
+        first = len(self)
+        self.pattern = numpy.concatenate((self.pattern, indices[order]))
+        self.phase = numpy.concatenate((self.phase, numpy.asarray(phases, float)[order]))
+        self.speed = numpy.concatenate((self.speed, numpy.asarray(speeds, float)[order]))
+        self.radius = numpy.concatenate((self.radius, numpy.asarray(radii, float)[order]))
+        self.center = numpy.concatenate((self.center, numpy.asarray(centers, float).reshape(-1, 2)[order]))
+        self.color = numpy.concatenate((self.color, colors[order]))
+        self._index()
+
+        # New trails start collapsed onto their snake's current position
+        x, y = self._positions(self.tick)
+        self.head = numpy.concatenate((self.head, numpy.zeros((count, 2), numpy.float32)))
+        self.head[first:, 0] = x[first:]
+        self.head[first:, 1] = y[first:]
+        trails = numpy.zeros((count, self.segments, 2, VERTEX_FLOATS), numpy.float32)
+        trails[..., :2] = self.head[first:, None, None, :]
+        self.vertices = numpy.concatenate((self.vertices, trails))
+
+    def add_random(self, count, palette=DEFAULT_PALETTE, patterns=None):
+        """Add ``count`` snakes with random patterns, places, sizes, phases, speeds and palette colors."""
+        patterns = list(patterns or self.names)
+        margin = 0.1
+        centers = self.random.uniform((self.width * margin, self.height * margin),
+                                      (self.width * (1 - margin), self.height * (1 - margin)), (count, 2))
+        self.add([patterns[i] for i in self.random.integers(len(patterns), size=count)],
+                 centers,
+                 self.random.uniform(10, min(self.width, self.height) / 6, count),
+                 self.random.uniform(0, 2 * math.pi, count),
+                 self.random.uniform(0.5, 2, count) * self.random.choice((-1, 1), count),
+                 [palette[i] for i in self.random.integers(len(palette), size=count)])
+
+    def _index(self):
+        """Rebuild the per-pattern row groups and the per-color Mesh batches."""
+        self.groups = [(get_pattern(self.names[index]), numpy.flatnonzero(self.pattern == index))
+                       for index in numpy.unique(self.pattern)]
+        self.batches = []
+        first = 0
+        for row in range(1, len(self) + 1):
+            if (row == len(self) or (self.color[row] != self.color[first]).any()
+                    or row - first == self.rows_per_mesh):
+                self.batches.append((tuple(self.color[first].tolist()), first, row))
+                first = row
+
+    def _positions(self, tick):
+        """Return every snake's x and y at a tick."""
+        t = self.phase + self.speed * (tick * STEP * self.step_scale)
+        x, y = self.center[:, 0].copy(), self.center[:, 1].copy()
+        for pattern, rows in self.groups:
+            if isinstance(pattern, ParametricPattern):
+                dx, dy = pattern.function(t[rows], self.radius[rows], numpy)
+            else:
+                # Patterns that are not curves (random) jitter around the center
+                jitter = self.random.integers(-1, 2, (len(rows), 2)) * (JITTER * self.step_scale)
+                dx, dy = jitter[:, 0] * abs(self.speed[rows]), jitter[:, 1] * abs(self.speed[rows])
+            x[rows] += dx
+            y[rows] += dy
+        return x, y
+
+    def step(self):
+        """Advance every snake one tick and draw its newest segment over its oldest one."""
+        self.tick += 1
+        x, y = self._positions(self.tick)
+        self.segment = (self.segment + 1) % self.segments
+        segment = self.vertices[:, self.segment]
+        segment[:, 0, :2] = self.head
+        self.head[:, 0] = x
+        self.head[:, 1] = y
+        segment[:, 1, :2] = self.head
+
+    def clear(self):
+        """Collapse every trail onto its snake's head."""
+        self.vertices[..., :2] = self.head[:, None, None, :]
+
+    def resize(self, width, height):
+        """Keep snakes at the same relative places in a resized window."""
+        if len(self):
+            scale = numpy.array((width / self.width, height / self.height))
+            self.center *= scale
+            self.head *= scale.astype(numpy.float32)
+            self.vertices[..., :2] *= scale.astype(numpy.float32)
+        self.width = width
+        self.height = height
+
+    def batch_vertices(self, first, end):
+        """Return the flat float32 vertex data of rows first to end, sharing memory with ``vertices``."""
+        return self.vertices[first:end].reshape(-1)
@@ -0,0 +1,92 @@
+# Snake Pencil V1.2
+# Symmetry modes: the rotated and mirrored copies a drawing is shown in, as transforms.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import math
+
+try:
+    import numpy  # Optional: transforms whole chunks at once
+except ImportError:
+    numpy = None
+
+# Modes in the order the H key cycles through them
+SYMMETRY_MODES = ('off', 'vertical', 'horizontal', 'four-way', 'radial', 'kaleidoscope')
+DEFAULT_SYMMETRY = 'vertical'  # V1.2's mirror across the vertical center line
+DEFAULT_FOLDS = 6  # Copies around the center in the radial and kaleidoscope modes
+
+
+def symmetry_copies(mode, folds=DEFAULT_FOLDS):
+    """Return (angle in degrees, flipped) for every copy a mode shows, the drawing itself first.
+
+    A flipped copy is mirrored across the vertical center line before it
+    is rotated about the center, and drawn in the contrasting colors of
+    the strokes, as the mirror always was. Every mode's copies form a
+    group, so the copies' inverses are the copies themselves.
+    """
+    if mode == 'off':
+        return [(0, False)]
+    if mode == 'vertical':
+        return [(0, False), (0, True)]
+    if mode == 'horizontal':
+        return [(0, False), (180, True)]
+    if mode == 'four-way':
+        return [(0, False), (0, True), (180, True), (180, False)]
+    if mode in ('radial', 'kaleidoscope'):
+        folds = max(1, int(folds))
+        copies = [(360 * k / folds, False) for k in range(folds)]
+        if mode == 'kaleidoscope':
+            copies += [(360 * k / folds, True) for k in range(folds)]
+        return copies
+    raise ValueError(f"Unknown symmetry mode: {mode}")
+
+
+def get_contrasting_color(color):
+    """Calculate a contrasting color by inverting the original color."""
+    return tuple(1 - c for c in color)
+
+
+def copy_matrix(angle, flipped, cx, cy):
+    """Return the (a, b, c, d, e, f) affine matrix of a copy about center (cx, cy).
+
+    Points map to (a * x + c * y + e, b * x + d * y + f), as in SVG and PDF.
+    """
+    radians = math.radians(angle)
+    # Rounded so quarter turns map whole pixels to whole pixels
+    cos, sin = round(math.cos(radians), 12), round(math.sin(radians), 12)
+    flip = -1 if flipped else 1
+    a, b, c, d = cos * flip, sin * flip, -sin, cos
+    return a, b, c, d, cx - a * cx - c * cy, cy - b * cx - d * cy
+
+
+def transform_point(matrix, x, y):
+    a, b, c, d, e, f = matrix
+    return a * x + c * y + e, b * x + d * y + f
+
+
+class TransformedPath:
+    """Read-only view of a path's points under a copy's matrix, for exporters.
+
+    Points are transformed a chunk at a time as they are read, so a copy
+    holds no points of its own.
+    """
+
+    def __init__(self, points, matrix):
+        self.points = points
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.points)
+
+    def iter_chunks(self, size=1 << 16):
+        """Yield float sequences of at most ``size`` floats covering the copy."""
+        a, b, c, d, e, f = self.matrix
+        for chunk in self.points.iter_chunks(size):
+            if numpy is not None:
+                xy = numpy.asarray(chunk, dtype=numpy.float64).reshape(-1, 2)
+                out = numpy.empty_like(xy)
+                out[:, 0] = a * xy[:, 0] + c * xy[:, 1] + e
+                out[:, 1] = b * xy[:, 0] + d * xy[:, 1] + f
+                yield out.reshape(-1).tolist()
+            else:
+                xs, ys = chunk[0::2], chunk[1::2]
+                yield [value for x, y in zip(xs, ys) for value in (a * x + c * y + e, b * x + d * y + f)]
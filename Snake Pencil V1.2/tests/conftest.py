@@ -0,0 +1,8 @@
+# Snake Pencil V1.2
+# Test setup: the modules live next to the pad script, not in a package.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
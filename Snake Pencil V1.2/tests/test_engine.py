@@ -0,0 +1,112 @@
+# Snake Pencil V1.2
+# Tests for the headless engine: stroke simplification, color runs, undo, the eraser and symmetry.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+from snake_engine import SIMPLIFY_WINDOW, SnakeEngine
+from snake_paths import rdp_simplify
+
+GREEN = (0, 1, 0)
+RED = (1, 0, 0)
+
+
+def drive(engine, key, ticks):
+    for _ in range(ticks):
+        engine.step({key: True})
+    engine.end_stroke()
+
+
+def staircase(tolerance):
+    """Draw one stroke of 20 right-up steps and return its points."""
+    engine = SnakeEngine(400, 400)
+    engine.simplify_tolerance = tolerance
+    for _ in range(20):
+        engine.step({'d': True})
+        engine.step({'w': True})
+    engine.end_stroke()
+    return list(engine.paths['snake'].view())
+
+
+def test_rdp_drops_only_points_within_the_tolerance():
+    points = [0, 0, 5, 0.4, 10, 0, 15, 3, 20, 0]
+    assert rdp_simplify(points, 0.5) == [0, 0, 10, 0, 15, 3, 20, 0]
+    assert rdp_simplify(points, 0.3) == points
+    assert rdp_simplify(points, 4) == [0, 0, 20, 0]
+
+
+def test_finished_strokes_are_simplified_to_the_tolerance():
+    # Each corner is 5 / sqrt(2) = 3.5 px off the diagonal
+    assert len(staircase(0)) == 2 * 41
+    assert staircase(4) == [200, 200, 300, 300]
+
+
+def test_long_strokes_are_simplified_a_window_at_a_time():
+    engine = SnakeEngine(8000, 400)
+    engine.merge_collinear = False
+    engine.simplify_tolerance = 1
+    path = engine.paths['snake']
+    longest = 0
+    for _ in range(700):
+        engine.step({'d': True})
+        longest = max(longest, len(path))
+    assert longest < 2 * (SIMPLIFY_WINDOW + 2)
+    engine.end_stroke()
+    points = list(path.view())
+    # The start, the fixed end of each window and the head
+    assert len(points) == 2 * (2 + 700 // SIMPLIFY_WINDOW)
+    assert points[:2] == [4000, 200] and points[-2:] == [7500, 200]
+    assert points[1::2] == [200] * (len(points) // 2)
+    engine.undo()
+    assert list(path.view()) == [4000, 200]
+
+
+def test_undoing_a_color_change_restores_the_original_run():
+    # Nothing is drawn yet, so both runs start at the first point
+    engine = SnakeEngine(200, 200)
+    engine.set_color(RED)
+    assert engine.color_runs['snake'] == [(0, GREEN), (0, RED)]
+    engine.undo()
+    assert engine.current_color == GREEN
+    assert engine.color_runs['snake'] == [(0, GREEN)]
+    assert [color for color, _ in engine.iter_runs('snake')] == [GREEN]
+    engine.redo()
+    drive(engine, 'd', 2)
+    assert [color for color, _ in engine.iter_strokes()] == [RED]
+
+
+def test_color_change_starts_a_stroke_and_undo_drops_it():
+    engine = SnakeEngine(200, 200)
+    drive(engine, 'd', 5)
+    engine.set_color(RED)
+    drive(engine, 'w', 3)
+    assert engine.color_runs['snake'] == [(0, GREEN), (2, RED)]
+    assert [(color, len(points)) for color, points in engine.iter_strokes()] == [(GREEN, 4), (RED, 4)]
+    engine.undo()
+    engine.undo()
+    assert engine.color_runs['snake'] == [(0, GREEN)]
+    assert engine.current_color == GREEN
+    engine.redo()
+    engine.redo()
+    assert engine.color_runs['snake'] == [(0, GREEN), (2, RED)]
+    assert len(engine.snake_path) == 6
+
+
+def test_erase_cuts_a_stroke_and_undo_heals_it():
+    engine = SnakeEngine(400, 400, history_mode=True)
+    drive(engine, 'd', 20)
+    y = engine.snake_pos[1]
+    assert engine.erase(200 + 60, y, 10)
+    engine.end_erase()
+    pieces = [points.tolist() for _, points in engine.iter_strokes()]
+    assert len(pieces) == 2
+    assert pieces[0][-2:] == [250, y] and pieces[1][:2] == [270, y]
+    engine.undo()
+    assert not engine.erased['snake']
+    assert len(list(engine.iter_strokes())) == 1
+
+
+def test_symmetry_copies_are_exported_with_flipped_contrast():
+    engine = SnakeEngine(200, 200)
+    drive(engine, 'd', 3)
+    engine.set_symmetry('four-way')
+    colors = [color for color, _ in engine.iter_drawing()]
+    assert colors == [GREEN, (1, 0, 1), (1, 0, 1), GREEN]
@@ -0,0 +1,120 @@
+# Snake Pencil V1.2
+# Tests for the vector exporters and the tiled PNG renderer.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import random
+import struct
+import zlib
+
+import pytest
+
+import snake_raster
+from snake_engine import SnakeEngine
+from snake_export import export_pdf, export_svg
+from snake_paths import PathBuffer
+from snake_raster import _band_segments, render_png
+
+WHITE = (1, 1, 1)
+
+
+def horizontal_line(y=20):
+    return [(WHITE, PathBuffer([5, y, 35, y]))]
+
+
+def read_png(path):
+    """Return (width, height, rows of RGBA bytes) of a PNG written by PngWriter."""
+    with open(path, 'rb') as file:
+        data = file.read()
+    position, idat = 8, b''
+    while position < len(data):
+        length, kind = struct.unpack('>I4s', data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        if kind == b'IHDR':
+            width, height = struct.unpack('>II', body[:8])
+        elif kind == b'IDAT':
+            idat += body
+        position += 12 + length
+    raw = zlib.decompress(idat)
+    stride = 4 * width + 1  # Filter type 0 in front of every row
+    return width, height, [raw[row * stride + 1:(row + 1) * stride] for row in range(height)]
+
+
+def test_svg_strokes_are_as_wide_as_on_screen(tmp_path):
+    path = str(tmp_path / 'line.svg')
+    export_svg(path, horizontal_line(), 40, 40)
+    with open(path) as file:
+        assert 'stroke-width="4"' in file.read()
+    export_svg(path, horizontal_line(), 40, 40, stroke_width=3)
+    with open(path) as file:
+        assert 'stroke-width="6"' in file.read()
+
+
+def test_pdf_strokes_are_as_wide_as_on_screen(tmp_path):
+    path = str(tmp_path / 'line.pdf')
+    export_pdf(path, horizontal_line(), 40, 40)
+    with open(path, 'rb') as file:
+        data = file.read()
+    start = data.index(b'stream\n') + len(b'stream\n')
+    content = zlib.decompress(data[start:data.index(b'\nendstream')]).decode('ascii')
+    assert '1 J 1 j 4 w\n' in content
+
+
+def test_png_strokes_are_as_wide_as_on_screen(tmp_path):
+    path = str(tmp_path / 'line.png')
+    render_png(path, horizontal_line, 40, 40, 40, 40, tile_size=16, workers=0)
+    width, height, rows = read_png(path)
+    assert (width, height) == (40, 40)
+    covered = [row for row in range(height) if rows[row][4 * 20:4 * 21] != b'\x00\x00\x00\xff']
+    # Image rows count down from the top; the line is 2 px to each side of y = 20
+    assert covered == [18, 19, 20, 21]
+
+
+def scribble():
+    engine = SnakeEngine(120, 90, seed=2)
+    rng = random.Random(3)
+    for i in range(60):
+        for _ in range(rng.randint(1, 5)):
+            engine.step({rng.choice('wasd'): True})
+        engine.end_stroke()
+        if i == 30:
+            engine.set_color((1, 0.5, 0))
+    engine.set_symmetry('four-way')
+    return engine
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_tiles_stitch_into_the_same_image(tmp_path, monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(snake_raster, 'numpy', None)
+    engine = scribble()
+    whole, tiled = str(tmp_path / 'whole.png'), str(tmp_path / 'tiled.png')
+    render_png(whole, engine.iter_drawing, 120, 90, 250, 180, tile_size=1000, workers=0)
+    render_png(tiled, engine.iter_drawing, 120, 90, 250, 180, tile_size=37, workers=0)
+    assert read_png(tiled) == read_png(whole)
+    assert any(row != read_png(whole)[2][0] for row in read_png(whole)[2])
+
+
+def test_worker_processes_render_the_same_image(tmp_path):
+    engine = scribble()
+    alone, pooled = str(tmp_path / 'alone.png'), str(tmp_path / 'pooled.png')
+    render_png(alone, engine.iter_drawing, 120, 90, 240, 180, tile_size=50, workers=0)
+    render_png(pooled, engine.iter_drawing, 120, 90, 240, 180, tile_size=50, workers=2)
+    assert read_png(pooled) == read_png(alone)
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_bands_keep_only_their_own_segments(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(snake_raster, 'numpy', None)
+    # Canvas y points up, so y = 90 is the image's top row and y = 10 its bottom one
+    strokes = [(WHITE, PathBuffer([10, 90, 90, 90])), ((1, 0, 0), PathBuffer([10, 10, 90, 10]))]
+    args = 2, 2, 1, 1, 100, 50, 2  # Columns, rows, scale x and y, height, tile size, radius
+    (left, right), colors = _band_segments(lambda: strokes, 0, *args)
+    assert list(left) == list(right) == [10, 10, 90, 10, 0]
+    (left, right), colors = _band_segments(lambda: strokes, 1, *args)
+    assert list(left) == list(right) == [10, 90, 90, 90, 1]
+    assert colors == [bytes((255, 255, 255, 255)), bytes((255, 0, 0, 255))]
@@ -0,0 +1,77 @@
+# Snake Pencil V1.2
+# Tests for the segment grid and the eraser's interval helpers.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import random
+from array import array
+
+import pytest
+
+import snake_grid
+from snake_grid import ERASED, SegmentGrid, box_interval, erase_interval, visible_intervals
+
+
+def walk(count, seed=0):
+    rng = random.Random(seed)
+    x = y = 500.0
+    points = array('f')
+    for _ in range(count):
+        x += rng.choice((-7, 0, 7))
+        y += rng.choice((-7, 0, 7))
+        points.extend((x, y))
+    return points
+
+
+def test_bulk_extend_files_segments_like_the_loop():
+    pytest.importorskip('numpy')
+    points = walk(3 * snake_grid.BULK_SEGMENTS)
+    looped = SegmentGrid()
+    for i in range(0, len(points), 2):
+        looped.extend(points[i:i + 2])
+    bulk = SegmentGrid()
+    bulk.extend(points[:2])
+    bulk.extend(points[2:])
+    assert bulk.coords == looped.coords
+    assert bulk.cells == looped.cells
+    assert (bulk.end, bulk.last) == (looped.end, looped.last)
+
+
+def test_crosses_and_queries():
+    grid = SegmentGrid()
+    grid.extend([0, 0, 100, 0, 100, 100])
+    assert grid.crosses(50, -10, 50, 10)
+    assert not grid.crosses(50, 10, 50, 20)
+    # A step leaving the path's end does not collide with it
+    assert not grid.crosses(100, 100, 110, 100)
+    assert sorted(grid.query_rect(90, 40, 110, 60)) == [1]
+    grid.pop(1, (100, 0))
+    assert len(grid) == 1
+    assert not grid.crosses(90, 50, 110, 50)
+
+
+def test_bounds_are_a_superset_of_the_rectangle_query():
+    grid = SegmentGrid()
+    grid.extend([0, 0, 100, 100, 200, 100])
+    # The box is inside the diagonal's bounding box but off the segment itself
+    assert grid.query_rect(70, 0, 90, 20) == []
+    assert grid.query_bounds(70, 0, 90, 20) == [0]
+    assert grid.query_bounds(90, 90, 110, 110) == grid.query_rect(90, 90, 110, 110) == [0, 1]
+    assert grid.query_bounds(120, 0, 140, 20) == []
+
+
+def test_box_interval_clips_segments():
+    assert box_interval(2, -1, 4, 1, 0, 0, 10, 0) == pytest.approx((0.2, 0.4))
+    assert box_interval(2, -1, 4, 1, 10, 0, 0, 0) == pytest.approx((0.6, 0.8))
+    assert box_interval(-5, -5, 15, 5, 0, 0, 10, 0) == (0.0, 1.0)
+    assert box_interval(2, 1, 4, 3, 0, 0, 10, 0) is None
+
+
+def test_erase_interval_merges_and_covers():
+    intervals = erase_interval(None, 0.2, 0.4)
+    assert intervals == ((0.2, 0.4),)
+    intervals = erase_interval(intervals, 0.6, 0.7)
+    assert intervals == ((0.2, 0.4), (0.6, 0.7))
+    intervals = erase_interval(intervals, 0.35, 0.65)
+    assert intervals == ((0.2, 0.7),)
+    assert visible_intervals(intervals) == [(0.0, 0.2), (0.7, 1.0)]
+    assert erase_interval(intervals, 0.0, 1.0) == ERASED
@@ -0,0 +1,79 @@
+# Snake Pencil V1.2
+# Tests for the typed-array path buffers and the disk-backed history.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+from array import array
+
+import pytest
+
+from snake_paths import PathBuffer, PathHistory
+
+
+@pytest.mark.parametrize('maxlen', [None, 0, 6, 64])
+@pytest.mark.parametrize('count', [0, 5, 6, 7, 200])
+def test_extend_matches_append(maxlen, count):
+    values = [float(i) for i in range(count)]
+    appended = PathBuffer(maxlen=maxlen)
+    for value in values:
+        appended.append(value)
+    extended = PathBuffer([-1.0, -2.0], maxlen=maxlen)
+    extended.clear()
+    extended.extend(values)
+    assert extended.tolist() == appended.tolist()
+    assert extended.dropped == appended.dropped
+
+
+def test_bounded_buffer_keeps_newest_window():
+    path = PathBuffer(maxlen=8)
+    path.extend(array('f', range(20)))
+    path.append(20)
+    assert path.tolist() == list(range(13, 21))
+    assert path.dropped == 13
+    path.replace_last(-1, -2)
+    assert path.last_point() == (-1, -2)
+    assert path.view(6).tolist() == [-1, -2]
+
+
+def test_views_survive_growth():
+    path = PathBuffer([1, 2])
+    view = path.view()
+    path.extend(range(10000))
+    assert view.tolist() == [1, 2]
+
+
+def test_history_spills_and_reads_back():
+    history = PathHistory(working_set=64)
+    history.extend(array('f', range(1000)))
+    assert history.spilled_bytes > 0
+    assert history.tolist() == list(range(1000))
+    assert history.view(10, 70).tolist() == list(range(10, 70))
+    assert history[-1] == 999
+    assert history.pop_tail(100).tolist() == list(range(900, 1000))
+    assert len(history) == 900
+    history.close()
+
+
+@pytest.mark.parametrize('named', [False, True])
+def test_history_clear_leaves_live_views_intact(tmp_path, named):
+    history = PathHistory(working_set=64, path=str(tmp_path / 'strokes.bin') if named else None)
+    history.extend(array('f', range(1000)))
+    old = history.view(0, 10)
+    history.extend(array('f', range(1000, 2000)))  # Spills again, remapping the file
+    older = history.view(0, 10)
+    history.clear()
+    assert old.tolist() == older.tolist() == list(range(10))
+    history.extend(array('f', range(500, 1500)))
+    assert history.tolist() == list(range(500, 1500))
+    assert old.tolist() == list(range(10))
+    history.close()
+
+
+def test_history_clear_truncates_unused_file():
+    history = PathHistory(working_set=64)
+    history.extend(array('f', range(1000)))
+    history.tolist()  # Maps the file, without keeping a view
+    history.clear()
+    assert len(history) == 0 and history.tolist() == []
+    history.extend((1, 2))
+    assert history.tolist() == [1, 2]
+    history.close()
@@ -0,0 +1,83 @@
+# Snake Pencil V1.2
+# Tests for project files and the binary codec they are written with.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import io
+import random
+
+import pytest
+
+import snake_project
+from snake_codec import read_text, read_varint, write_text, write_varint
+from snake_engine import SnakeEngine
+from snake_project import load_project, save_project
+
+
+def state(engine):
+    """Everything a replay or a project must reproduce."""
+    return ({name: path.tolist() for name, path in engine.paths.items()}, engine.color_runs, engine.erased,
+            tuple(engine.snake_pos), tuple(engine.current_color), engine.symmetry, engine.symmetry_folds)
+
+
+def drawn_engine():
+    engine = SnakeEngine(400, 300, history_mode=True, seed=5)
+    rng = random.Random(1)
+    for i in range(300):
+        for _ in range(3):
+            engine.step({rng.choice('wasd'): True})
+        engine.end_stroke()
+        if i == 150:
+            engine.set_color((0.25, 0.5, 1))
+    engine.automatic_mode = True
+    engine.selected_pattern = 'spiral'
+    for _ in range(100):
+        engine.step({})
+    engine.pattern_angle += 0.1  # Not a whole number, so the automatic path stores float bits
+    for _ in range(10):
+        engine.step({})
+    engine.erase(200, 150, 12)
+    engine.end_erase()
+    engine.set_symmetry('kaleidoscope', 4)
+    return engine
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_project_round_trip(tmp_path, monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(snake_project, 'numpy', None)
+    engine = drawn_engine()
+    path = str(tmp_path / 'drawing.snkp')
+    # Small chunks so every path spans several
+    save_project(path, engine, chunk_floats=256)
+    loaded = SnakeEngine(10, 10, history_mode=True)
+    header = load_project(path, loaded)
+    assert (header['width'], header['height']) == (400, 300)
+    assert state(loaded) == state(engine)
+    assert loaded.selected_pattern == 'spiral' and loaded.automatic_mode
+    assert loaded.pattern_angle == engine.pattern_angle
+
+
+def test_project_files_decode_either_way(tmp_path, monkeypatch):
+    pytest.importorskip('numpy')
+    engine = drawn_engine()
+    path = str(tmp_path / 'drawing.snkp')
+    save_project(path, engine)
+    monkeypatch.setattr(snake_project, 'numpy', None)
+    loaded = SnakeEngine(10, 10, history_mode=True)
+    load_project(path, loaded)
+    assert state(loaded) == state(engine)
+
+
+def test_codec_round_trip():
+    file = io.BytesIO()
+    values = [0, 1, 127, 128, 300, 1 << 40]
+    for value in values:
+        write_varint(file, value)
+    write_text(file, 'kaléidoscope')
+    file.seek(0)
+    assert [read_varint(file) for _ in values] == values
+    assert read_text(file) == 'kaléidoscope'
+    with pytest.raises(EOFError):
+        read_varint(io.BytesIO(b'\x80'))
@@ -0,0 +1,122 @@
+# Snake Pencil V1.2
+# Tests for the MeshStroke triangle strips: vertex counts, miter joins and cuts.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import math
+import os
+import random
+from array import array
+
+import pytest
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')  # Kivy would otherwise parse pytest's arguments
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+pytest.importorskip('kivy.graphics')
+
+import snake_render  # noqa: E402
+from snake_render import MITER_LIMIT, VERTEX_FLOATS, MeshStroke, _piece_vertices, _strip_vertices  # noqa: E402
+
+
+class RecordingMesh:
+    """Holds what a stroke hands its Mesh; a real one needs a GL context."""
+
+    def __init__(self, mode=None, vertices=(), indices=()):
+        self.mode = mode
+        self.vertices = vertices
+        self.indices = indices
+
+
+class RecordingGroup:
+    def __init__(self):
+        self.children = []
+
+    def add(self, instruction):
+        self.children.append(instruction)
+
+    def remove(self, instruction):
+        self.children.remove(instruction)
+
+
+@pytest.fixture
+def group(monkeypatch):
+    monkeypatch.setattr(snake_render, 'Mesh', RecordingMesh)
+    return RecordingGroup()
+
+
+def strip(points, width=2):
+    vertices = array('f', bytes(4 * VERTEX_FLOATS * len(points)))
+    _strip_vertices(vertices, points, 0, None, None, width)
+    return vertices
+
+
+def pairs(vertices):
+    """Return the (x, y) of each strip vertex, dropping the texture coordinates."""
+    values = list(vertices)
+    return [(values[i], values[i + 1]) for i in range(0, len(values), VERTEX_FLOATS)]
+
+
+def test_straight_strip_is_offset_by_the_width():
+    assert pairs(strip([0, 0, 10, 0, 20, 0])) == [(0, 2), (0, -2), (10, 2), (10, -2), (20, 2), (20, -2)]
+
+
+def test_corners_get_a_miter_join():
+    vertices = pairs(strip([0, 0, 10, 0, 10, 10]))
+    assert vertices[2:4] == [(8, 2), (12, -2)]
+    assert math.hypot(vertices[2][0] - 10, vertices[2][1]) == pytest.approx(2 * math.sqrt(2))
+
+
+def test_sharp_corners_stop_at_the_miter_limit():
+    vertices = pairs(strip([0, 0, 100, 0, 0, 1], width=2))
+    reach = math.hypot(vertices[2][0] - 100, vertices[2][1])
+    assert reach == pytest.approx(2 * MITER_LIMIT, rel=1e-5)
+
+
+def test_frozen_chunks_match_one_strip(group):
+    rng = random.Random(4)
+    points = [500.0, 500.0]
+    for _ in range(60):
+        points += [points[-2] + rng.choice((-5, 0, 5)), points[-1] + rng.choice((-5, 5))]
+    stroke = MeshStroke((1, 0, 0), chunk_points=8, group=group)
+    start = 0
+    while start < len(points):
+        size = 2 * rng.randint(1, 11)
+        stroke.extend(points[start:start + size])
+        start += size
+
+    assert len(stroke) == len(points)
+    whole = strip(points)
+    size = 2 * VERTEX_FLOATS  # Floats per point
+    for number, (mesh, chunk, vertices, before) in enumerate(stroke.chunks):
+        assert len(chunk) == 16
+        assert len(mesh.vertices) == 8 * size and len(mesh.indices) == 16
+        first = number * 7  # Chunks share their last point with the next one
+        assert list(mesh.vertices) == list(whole[first * size:(first + 8) * size])
+    first = len(stroke.chunks) * 7
+    tail = list(stroke.tail.vertices)
+    assert len(tail) == len(stroke.tail_points) * VERTEX_FLOATS
+    assert tail == list(whole[first * size:])
+
+
+def test_erased_segment_splits_the_strip(group):
+    stroke = MeshStroke((1, 0, 0), group=group)
+    stroke.extend([float(v) for i in range(10) for v in (10 * i, 0)])
+    stroke.erase_segments({3: ((0.25, 0.75),)})
+    tail, piece = group.children
+    # Points 0-3 then the cut at x = 32.5, squared off
+    assert len(piece.vertices) == 5 * 2 * VERTEX_FLOATS
+    assert pairs(piece.vertices)[-2:] == [(32.5, 2), (32.5, -2)]
+    # The cut at x = 37.5 then points 4-9
+    assert len(tail.vertices) == 7 * 2 * VERTEX_FLOATS
+    assert pairs(tail.vertices)[:2] == [(37.5, 2), (37.5, -2)]
+    stroke.erase_segments({3: None})
+    assert group.children == [tail]
+    assert len(tail.vertices) == 10 * 2 * VERTEX_FLOATS
+
+
+def test_piece_vertices_keep_whole_points():
+    points = array('f', [0, 0, 10, 0, 20, 10, 30, 10])
+    vertices = strip(points)
+    piece = pairs(_piece_vertices(points, vertices, [5, 0], 1, 4, [], 2))
+    assert piece[:2] == [(5, 2), (5, -2)]
+    # Points past the one next to the cut keep their vertices as they were
+    assert piece[4:] == pairs(vertices)[4:]
@@ -0,0 +1,69 @@
+# Snake Pencil V1.2
+# Tests for session logs: recording and replaying a session.
+# Copyright (C) 2024, Sourceduty - All Rights Reserved.
+
+import random
+
+from snake_engine import SnakeEngine
+from snake_replay import SessionRecorder, replay
+
+
+def state(engine):
+    """Everything a replay or a project must reproduce."""
+    return ({name: path.tolist() for name, path in engine.paths.items()}, engine.color_runs, engine.erased,
+            tuple(engine.snake_pos), tuple(engine.current_color), engine.symmetry, engine.symmetry_folds)
+
+
+def session(engine, recorder, seed=3):
+    """Drive an engine through moves, colors, templates, undo, erasing and a pattern."""
+    rng = random.Random(seed)
+    keys = {}
+    for i in range(60):
+        key = rng.choice('wasd')
+        recorder.key_down(key)
+        keys[key] = True
+        for _ in range(rng.randint(1, 8)):
+            engine.step(keys)
+        recorder.key_up(key)
+        keys.pop(key)
+        engine.end_stroke()
+        if i % 15 == 7:
+            color = rng.choice(((1, 0, 0), (0.5, 0, 0.5), (1, 0.5, 0)))  # Pad colors, exact as float32
+            recorder.color(color)
+            engine.set_color(color)
+        if i == 20:
+            recorder.template('1')
+            engine.add_template('1')
+        if i == 30:
+            recorder.undo()
+            engine.undo()
+        if i == 40:
+            x, y = engine.snake_pos
+            recorder.erase(x, y, 8)
+            engine.erase(x, y, 8)
+            recorder.end_erase()
+            engine.end_erase()
+    recorder.symmetry('radial', 5)
+    engine.set_symmetry('radial', 5)
+    recorder.automatic(True)
+    engine.automatic_mode = True
+    for _ in range(200):
+        engine.step({})
+    recorder.close()
+
+
+def test_replay_reproduces_the_session(tmp_path):
+    log = str(tmp_path / 'session.snkr')
+    engine = SnakeEngine(400, 400, history_mode=True)
+    session(engine, SessionRecorder(engine, log, seed=11))
+    assert state(replay(log)) == state(engine)
+    assert state(replay(log)) == state(replay(log))
+
+
+def test_replay_keeps_fractional_tick_rates(tmp_path):
+    log = str(tmp_path / 'ntsc.snkr')
+    engine = SnakeEngine(400, 400, tick_rate=59.94)
+    session(engine, SessionRecorder(engine, log, seed=11))
+    replayed = replay(log)
+    assert replayed.timestep.tick_rate == 59.94
+    assert state(replayed) == state(engine)